@@ -2,101 +2,430 @@
 Реализация загрузки аудио из YouTube
 """
 import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
 import yt_dlp
-from typing import Optional
+from yt_dlp.networking import Request
+from yt_dlp.postprocessor import FFmpegExtractAudioPP
+from typing import Callable, Dict, Any, List, Optional, Tuple
 from interfaces import IAudioDownloader, ILogger
+from naming import sanitize_filename
+from video_state import is_permanent_error
+from metrics import MetricsRecorder, STAGE_METADATA, STAGE_DOWNLOAD, STAGE_TRANSCODE
+from profiles import yt_dlp_options
+from resilience import ResilientCaller, YOUTUBE_HOST
+from throttle import AdaptiveThrottle
+from ytdlp_cache import YtDlpCache
+
+# Строка результата мультиплексора hash ffmpeg
+CONTENT_HASH_PATTERN = re.compile(rb"SHA256=([0-9a-f]{64})")
+# Аргументы ffmpeg для хеша декодированного звука (PCM первой звуковой дорожки)
+CONTENT_HASH_ARGS = ['-map', '0:a:0', '-f', 'hash', '-hash', 'sha256']
+
+
+class HashingExtractAudioPP(FFmpegExtractAudioPP):
+    """
+    Конвертация в аудио (FFmpegExtractAudio) с хешем декодированного звука
+    
+    Хеш записывается вторым выходом того же запуска ffmpeg, поэтому звук
+    декодируется один раз.
+    """
+    
+    def __init__(self, downloader=None, on_hash: Optional[Callable[[Optional[str]], None]] = None, **kwargs):
+        """
+        Args:
+            downloader: Экземпляр YoutubeDL
+            on_hash: Получает хеш звука после конвертации (None - ffmpeg его не записал)
+            **kwargs: Параметры FFmpegExtractAudio (preferredcodec, preferredquality, ...)
+        """
+        super().__init__(downloader, **kwargs)
+        self.on_hash = on_hash
+    
+    @classmethod
+    def pp_key(cls):
+        # Имя как у FFmpegExtractAudio: аргументы postprocessor_args и метрики не меняются
+        return 'ExtractAudio'
+    
+    def run_ffmpeg_multiple_files(self, input_paths, out_path, opts, **kwargs):
+        hash_path = f"{out_path}.sha256"
+        try:
+            result = self.real_run_ffmpeg(
+                [(path, []) for path in input_paths], [(out_path, opts), (hash_path, CONTENT_HASH_ARGS)], **kwargs
+            )
+            with open(hash_path, 'rb') as f:
+                match = CONTENT_HASH_PATTERN.search(f.read())
+            if self.on_hash is not None:
+                self.on_hash(match.group(1).decode() if match else None)
+            return result
+        finally:
+            if os.path.exists(hash_path):
+                os.remove(hash_path)
 
 
 class YouTubeAudioDownloader(IAudioDownloader):
     """Загрузка аудио из YouTube с помощью yt-dlp"""
     
-    def __init__(self, download_options: dict, logger: ILogger):
+    def __init__(
+        self,
+        download_options: dict,
+        logger: ILogger,
+        metrics: Optional[MetricsRecorder] = None,
+        resilience: Optional[ResilientCaller] = None,
+        throttle: Optional[AdaptiveThrottle] = None,
+        ffmpeg_path: Optional[str] = None,
+        cache: Optional[YtDlpCache] = None,
+        hash_audio: bool = False
+    ):
+        """
+        Args:
+            download_options: Опции yt-dlp (config.YT_DLP_OPTIONS)
+            logger: Логгер
+            metrics: Сборщик метрик
+            resilience: Повторы и предохранители хостов
+            throttle: Ограничение частоты запросов к YouTube
+            ffmpeg_path: Путь к ffmpeg для конвертации в памяти (None - только на диске)
+            cache: Постоянный кеш yt-dlp (None - кеш по умолчанию yt-dlp, без учета попаданий)
+            hash_audio: Считать хеш декодированного звука при конвертации (нужен ffmpeg_path)
+        """
         self.logger = logger
         self.download_options = download_options.copy()
+        self.metrics = metrics or MetricsRecorder()
+        self.resilience = resilience or ResilientCaller(logger, metrics=self.metrics)
+        self.throttle = throttle or AdaptiveThrottle(logger, metrics=self.metrics)
+        self.ffmpeg_path = ffmpeg_path
+        self.cache = cache
+        self.hash_audio = hash_audio and bool(ffmpeg_path)
+        # Экземпляры YoutubeDL по профилям, обработчики и результат (ошибка, хеш звука)
+        # текущей загрузки - свои в каждом потоке
+        self._local = threading.local()
+    
+    def _create_ydl(self, ydl_opts: dict):
+        """Создать экземпляр YoutubeDL с постоянным кешем"""
+        ydl_opts = dict(ydl_opts)
+        # Ошибки YouTube должны выбрасываться, а не превращаться в None: по ним
+        # ResilientCaller повторяет запросы и отключает хост, а загрузка сохраняет
+        # текст ошибки yt-dlp (см. video_state.is_permanent_error)
+        ydl_opts['ignoreerrors'] = False
+        # Экземпляр переиспользуется, поэтому обработчики текущей загрузки подставляются через поток
+        ydl_opts['progress_hooks'] = list(ydl_opts.get('progress_hooks', [])) + [self._on_progress]
+        ydl_opts['postprocessor_hooks'] = list(ydl_opts.get('postprocessor_hooks', [])) + [self._on_postprocess]
+        # С хешем звука конвертацию выполняет HashingExtractAudioPP вместо FFmpegExtractAudio
+        postprocessors = ydl_opts.get('postprocessors', [])
+        extract_audio = next(
+            (pp for pp in postprocessors if pp.get('key') == 'FFmpegExtractAudio'), None
+        ) if self.hash_audio else None
+        if extract_audio is not None:
+            ydl_opts['postprocessors'] = [pp for pp in postprocessors if pp is not extract_audio]
+        if self.cache is None:
+            ydl = yt_dlp.YoutubeDL(ydl_opts)
+        else:
+            ydl = self.cache.instrument(yt_dlp.YoutubeDL(self.cache.options(ydl_opts)))
+        if extract_audio is not None:
+            pp = HashingExtractAudioPP(
+                ydl, on_hash=self._on_content_hash,
+                **{name: value for name, value in extract_audio.items() if name not in ('key', 'when')}
+            )
+            # Обработчики из параметров получают только постпроцессоры, созданные самим YoutubeDL
+            pp.add_progress_hook(self._on_postprocess)
+            ydl.add_post_processor(pp, when=extract_audio.get('when', 'post_process'))
+        return ydl
+    
+    def _ydl(self, ydl_opts: dict):
+        """
+        Экземпляр YoutubeDL для профиля (формат и конвертация)
+        
+        Переиспользуется между видео для метаданных и загрузки (не
+        закрывается), поэтому экстрактор YouTube и его данные о плеере
+        в памяти остаются прогретыми.
+        """
+        instances = getattr(self._local, "instances", None)
+        if instances is None:
+            instances = self._local.instances = {}
+        key = repr((ydl_opts.get('format'), ydl_opts.get('postprocessors')))
+        if key not in instances:
+            instances[key] = self._create_ydl(ydl_opts)
+        return instances[key]
+    
+    def _on_progress(self, status: dict) -> None:
+        hook = getattr(self._local, "progress_hook", None)
+        if hook is not None:
+            hook(status)
+    
+    def _on_postprocess(self, status: dict) -> None:
+        hook = getattr(self._local, "postprocess_hook", None)
+        if hook is not None:
+            hook(status)
+    
+    def _on_content_hash(self, content_hash: Optional[str]) -> None:
+        self._local.content_hash = content_hash
+    
+    def warm_up(self, performances: Optional[List[Optional[Dict[str, Any]]]] = None) -> None:
+        """Заранее создать экземпляры YoutubeDL для форматов профилей и подготовить кеш"""
+        if self.cache is None:
+            return
+        self.cache.warm_up(*{
+            id(ydl): ydl for ydl in (
+                self._ydl(yt_dlp_options(self.download_options, performance))
+                for performance in performances or [None]
+            )
+        }.values())
     
-    def download_audio(self, video_url: str, output_path: str) -> Optional[str]:
+    def download_audio(
+        self, video_url: str, output_path: str, performance: Optional[Dict[str, Any]] = None
+    ) -> Optional[str]:
         """
         Загрузить аудио файл
         
         Args:
             video_url: URL видео для загрузки
             output_path: Путь для сохранения файла
+            performance: Профиль производительности плейлиста (формат и качество)
             
         Returns:
             Путь к загруженному файлу или None в случае ошибки
         """
+        self._local.last_error = None
+        self._local.content_hash = None
         try:
             # Создаем директорию если она не существует
             os.makedirs(os.path.dirname(output_path), exist_ok=True)
             
-            # Настраиваем опции для конкретной загрузки
-            ydl_opts = self.download_options.copy()
+            # Настраиваем опции для конкретной загрузки (с учетом профиля плейлиста)
+            ydl_opts = yt_dlp_options(self.download_options, performance)
+            # Прогретый экземпляр профиля: метаданные и загрузка без повторной инициализации
+            ydl = self._ydl(ydl_opts)
             
             self.logger.info(f"Начинаем загрузку: {video_url}")
             
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                # Получаем информацию о видео
-                info = ydl.extract_info(video_url, download=False)
-                if not info:
-                    self.logger.error(f"Не удалось получить информацию о видео: {video_url}")
-                    return None
-                
-                # Формируем безопасное имя файла
-                safe_title = self._sanitize_filename(info.get('title', 'unknown'))
-                
-                # Проверяем, есть ли постпроцессор FFmpeg
-                has_ffmpeg_processor = any(
-                    pp.get('key') == 'FFmpegExtractAudio' 
-                    for pp in ydl_opts.get('postprocessors', [])
-                )
-                
-                if has_ffmpeg_processor:
-                    # С FFmpeg - убираем .mp3 из пути, FFmpeg сам добавит
-                    if output_path.endswith('.mp3'):
-                        final_output_path = output_path[:-4]  # Убираем .mp3
-                    else:
-                        final_output_path = output_path
-                    
-                    # Заменяем %(title)s на безопасное имя
-                    final_output_path = final_output_path.replace('%(title)s', safe_title)
-                    final_output_path = final_output_path.replace('%(ext)s', '')
-                    
-                    # Ожидаемый путь после обработки FFmpeg
-                    expected_output = final_output_path + '.mp3'
+            # Получаем информацию о видео
+            info = self._extract_info(ydl, video_url)
+            
+            # Формируем безопасное имя файла
+            safe_title = self._sanitize_filename(info.get('title', 'unknown'))
+            
+            # Проверяем, есть ли постпроцессор FFmpeg
+            has_ffmpeg_processor = any(
+                pp.get('key') == 'FFmpegExtractAudio' 
+                for pp in ydl_opts.get('postprocessors', [])
+            )
+            
+            if has_ffmpeg_processor:
+                # С FFmpeg - убираем .mp3 из пути, FFmpeg сам добавит
+                if output_path.endswith('.mp3'):
+                    final_output_path = output_path[:-4]  # Убираем .mp3
                 else:
-                    # Без FFmpeg - используем путь как есть
-                    final_output_path = output_path.replace('%(title)s', safe_title)
-                    final_output_path = final_output_path.replace('%(ext)s', 'mp3')
-                    expected_output = final_output_path
+                    final_output_path = output_path
                 
-                # Обновляем путь в опциях
-                ydl_opts['outtmpl'] = final_output_path
+                # Заменяем %(title)s на безопасное имя
+                final_output_path = final_output_path.replace('%(title)s', safe_title)
+                final_output_path = final_output_path.replace('%(ext)s', '')
                 
-                # Загружаем файл
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl_download:
-                    ydl_download.download([video_url])
+                # Ожидаемый путь после обработки FFmpeg
+                expected_output = final_output_path + '.mp3'
+            else:
+                # Без FFmpeg - используем путь как есть
+                final_output_path = output_path.replace('%(title)s', safe_title)
+                final_output_path = final_output_path.replace('%(ext)s', 'mp3')
+                expected_output = final_output_path
+            
+            # Путь файла этой загрузки (шаблон экземпляра yt-dlp приведен к словарю)
+            ydl.params['outtmpl']['default'] = final_output_path
+            
+            # Время постобработки (конвертация FFmpeg) учитывается отдельно от загрузки
+            transcode_started = {}
+            transcode_seconds = [0.0]
+            
+            def on_postprocess(status: dict) -> None:
+                name = status.get('postprocessor')
+                if status.get('status') == 'started':
+                    transcode_started[name] = time.perf_counter()
+                elif status.get('status') == 'finished' and name in transcode_started:
+                    started, ended = transcode_started.pop(name), time.perf_counter()
+                    transcode_seconds[0] += ended - started
+                    self.metrics.trace_span(STAGE_TRANSCODE, started, ended, postprocessor=name)
+            
+            # Прогресс загрузки передается в сводный прогресс (байты и размер)
+            progress = self.metrics.progress
+            transfer_id = progress.start_transfer("download", safe_title)
+            
+            def on_progress(status: dict) -> None:
+                if status.get('status') in ('downloading', 'finished'):
+                    progress.update_transfer(
+                        transfer_id,
+                        status.get('downloaded_bytes') or 0,
+                        status.get('total_bytes') or status.get('total_bytes_estimate')
+                    )
+            
+            self._local.postprocess_hook = on_postprocess
+            self._local.progress_hook = on_progress if progress.enabled else None
+            
+            # Загружаем по уже полученной информации, без повторного извлечения
+            with self.metrics.stage(STAGE_DOWNLOAD) as timer:
+                try:
+                    self.resilience.call(
+                        "youtube_download", YOUTUBE_HOST, self.throttle.call, ydl.process_ie_result, info, download=True
+                    )
+                finally:
+                    self._local.postprocess_hook = None
+                    self._local.progress_hook = None
+                    timer.excluded_seconds = transcode_seconds[0]
+                    progress.finish_transfer(transfer_id)
+            if transcode_seconds[0]:
+                self.metrics.observe_stage(STAGE_TRANSCODE, transcode_seconds[0])
+            
+            # Проверяем, что файл был создан
+            if os.path.exists(expected_output):
+                self.logger.info(f"Файл успешно загружен: {expected_output}")
+                return expected_output
+            else:
+                self.logger.error(f"Файл не был создан: {expected_output}")
+                self._set_last_error(f"Файл не был создан: {expected_output}")
+                return None
                 
-                # Проверяем, что файл был создан
-                if os.path.exists(expected_output):
-                    self.logger.info(f"Файл успешно загружен: {expected_output}")
-                    return expected_output
-                else:
-                    self.logger.error(f"Файл не был создан: {expected_output}")
-                    return None
-                    
         except Exception as e:
             self.logger.error(f"Ошибка при загрузке аудио: {e}")
+            self._set_last_error(str(e))
             return None
     
-    def _sanitize_filename(self, filename: str) -> str:
-        """Очистить имя файла от недопустимых символов"""
-        # Заменяем недопустимые символы
-        invalid_chars = '<>:"/\\|?*'
-        for char in invalid_chars:
-            filename = filename.replace(char, '_')
+    def download_audio_data(
+        self,
+        video_url: str,
+        max_bytes: int,
+        performance: Optional[Dict[str, Any]] = None,
+        duration: Optional[float] = None,
+        spool_dir: Optional[str] = None
+    ) -> Optional[Tuple[bytes, str]]:
+        """
+        Загрузить небольшой трек в память, без временных файлов
+        
+        Аудиопоток читается в буфер (на диск в spool_dir он попадает, только
+        если окажется больше max_bytes), конвертация в MP3 выполняется
+        ffmpeg через stdin/stdout.
         
-        # Ограничиваем длину
-        if len(filename) > 100:
-            filename = filename[:100]
+        Args:
+            video_url: URL видео
+            max_bytes: Максимальный размер трека для загрузки в память
+            performance: Профиль производительности плейлиста
+            duration: Длительность из списка плейлиста (длинные треки отсеиваются без запроса к YouTube)
+            spool_dir: Папка для буфера, если поток окажется больше max_bytes
+            
+        Returns:
+            (данные, расширение) или None. None без ошибки (get_last_error)
+            означает, что трек нужно загрузить на диск через download_audio
+        """
+        self._local.last_error = None
+        self._local.content_hash = None
+        ydl_opts = yt_dlp_options(self.download_options, performance)
+        postprocessor = next(
+            (pp for pp in ydl_opts.get('postprocessors', []) if pp.get('key') == 'FFmpegExtractAudio'), None
+        )
+        if postprocessor and not self.ffmpeg_path:
+            return None
+        quality = float(postprocessor.get('preferredquality') or 0) if postprocessor else 0
+        # Исходный поток обычно не больше 160 кбит/с, MP3 - битрейт профиля
+        kbps = max(quality, 160)
+        if duration and duration * kbps * 1000 / 8 > max_bytes:
+            return None
         
-        return filename.strip()
+        try:
+            # Прогретый экземпляр профиля (см. _ydl)
+            ydl = self._ydl(ydl_opts)
+            info = self._extract_info(ydl, video_url)
+            
+            # В память загружаются только форматы, доступные одним HTTP запросом
+            formats = info.get('requested_formats') or [info]
+            audio_format = formats[0]
+            size = audio_format.get('filesize') or audio_format.get('filesize_approx')
+            if (len(formats) != 1 or audio_format.get('protocol', 'https') not in ('http', 'https')
+                    or not audio_format.get('url') or not size or size > max_bytes):
+                # Загрузка на диск (download_audio) возьмет уже полученную информацию
+                self._local.extracted = (ydl, video_url, info)
+                return None
+            
+            self.logger.info(f"Начинаем загрузку в память: {video_url}")
+            with self.metrics.stage(STAGE_DOWNLOAD), \
+                    tempfile.SpooledTemporaryFile(max_size=max_bytes, dir=spool_dir) as spool:
+                def fetch() -> int:
+                    spool.seek(0)
+                    spool.truncate()
+                    request = Request(audio_format['url'], headers=audio_format.get('http_headers') or {})
+                    with ydl.urlopen(request) as response:
+                        shutil.copyfileobj(response, spool, 1024 * 1024)
+                    # Размер потока: результат None throttle.call считает ошибкой
+                    return spool.tell()
+                
+                self.resilience.call("youtube_download", YOUTUBE_HOST, self.throttle.call, fetch)
+                spool.seek(0)
+                data = spool.read()
+        except Exception as e:
+            self.logger.error(f"Ошибка при загрузке аудио: {e}")
+            self._set_last_error(str(e))
+            return None
+        
+        if not postprocessor:
+            # Имя как у файла, загруженного на диск без ffmpeg (см. download_audio)
+            return data, ".mp3"
+        
+        # Конвертация через каналы: исходный поток в stdin, MP3 из stdout
+        quality_args = ['-q:a', str(int(quality))] if quality < 10 else ['-b:a', f"{int(quality)}k"]
+        # Хеш звука - второй выход того же запуска ffmpeg (в stderr), без повторного декодирования
+        hash_args = CONTENT_HASH_ARGS + ['pipe:2'] if self.hash_audio else []
+        with self.metrics.stage(STAGE_TRANSCODE):
+            try:
+                result = subprocess.run(
+                    [self.ffmpeg_path, '-hide_banner', '-loglevel', 'error', '-i', 'pipe:0', '-vn',
+                     '-codec:a', 'libmp3lame'] + quality_args + ['-f', 'mp3', 'pipe:1'] + hash_args,
+                    input=data, capture_output=True, timeout=600
+                )
+            except (OSError, subprocess.TimeoutExpired) as e:
+                result = None
+                self.logger.warning(f"Конвертация в памяти не удалась, загружаем через диск: {e}")
+        if result is None:
+            return None
+        if result.returncode != 0 or not result.stdout:
+            self.logger.warning(
+                f"Конвертация в памяти не удалась, загружаем через диск: {result.stderr.decode(errors='replace').strip()}"
+            )
+            return None
+        if self.hash_audio:
+            match = CONTENT_HASH_PATTERN.search(result.stderr)
+            self._local.content_hash = match.group(1).decode() if match else None
+        self.logger.info(f"Трек загружен в память: {video_url} ({len(result.stdout)} байт)")
+        return result.stdout, ".mp3"
+    
+    def _extract_info(self, ydl, video_url: str) -> Dict[str, Any]:
+        """
+        Получить информацию о видео
+        
+        Информация, которую download_audio_data получил для трека, не
+        подошедшего для загрузки в память, используется повторно: загрузка
+        на диск в том же потоке не запрашивает YouTube второй раз.
+        """
+        extracted, self._local.extracted = getattr(self._local, "extracted", None), None
+        if extracted is not None and extracted[0] is ydl and extracted[1] == video_url:
+            return extracted[2]
+        with self.metrics.stage(STAGE_METADATA):
+            return self.resilience.call(
+                "youtube_metadata", YOUTUBE_HOST,
+                self.throttle.call, ydl.extract_info, video_url, download=False
+            )
+    
+    def get_last_error(self) -> Optional[Dict[str, Any]]:
+        """Получить ошибку последней загрузки в этом потоке: {error, permanent} или None"""
+        return getattr(self._local, "last_error", None)
+    
+    def get_content_hash(self) -> Optional[str]:
+        """Получить хеш декодированного звука последней загрузки в этом потоке или None"""
+        return getattr(self._local, "content_hash", None)
+    
+    def _set_last_error(self, message: str) -> None:
+        """Запомнить ошибку загрузки и определить, постоянная ли она"""
+        self._local.last_error = {"error": message, "permanent": is_permanent_error(message)}
+    
+    def _sanitize_filename(self, filename: str) -> str:
+        """Очистить имя файла от недопустимых символов"""
+        return sanitize_filename(filename)
@@ -0,0 +1,262 @@
+"""
+Fake backends for offline benchmarks
+
+Implementations of the interfaces.py ABCs that never touch YouTube or SMB:
+a synthetic playlist extractor, a downloader that writes files of a given
+size after a given latency, and a mirrored uploader that writes to local
+directories behind a latency shim. The synchronizer, tracker, manifest and
+metrics under test are the real ones.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from destinations import destination_key
+from interfaces import IAudioDownloader, ILogger, IMirroredFileUploader, IPlaylistExtractor
+
+
+class SilentLogger(ILogger):
+    """Logger that drops all messages"""
+
+    def info(self, message: str) -> None:
+        pass
+
+    def error(self, message: str) -> None:
+        pass
+
+    def warning(self, message: str) -> None:
+        pass
+
+
+def memory_key(data: bytes) -> str:
+    """Latency key of a track downloaded to memory"""
+    return f"memory:{id(data)}"
+
+
+class LatencyRecorder:
+    """Per-track latency: from the start of the download to the last mirror"""
+
+    def __init__(self):
+        self._started: Dict[str, float] = {}
+        self.latencies: List[float] = []
+        self._lock = threading.Lock()
+
+    def start(self, key: str, started: Optional[float] = None) -> None:
+        with self._lock:
+            self._started[key] = started if started is not None else time.perf_counter()
+
+    def finish(self, key: str) -> None:
+        with self._lock:
+            started = self._started.pop(key, None)
+            if started is not None:
+                self.latencies.append(time.perf_counter() - started)
+
+
+class FakePlaylistExtractor(IPlaylistExtractor):
+    """Synthetic playlist of `size` entries (the same for every URL)"""
+
+    def __init__(self, size: int, latency: float = 0.0):
+        self.size = size
+        self.latency = latency
+
+    def get_video_list(self, playlist_url: str) -> List[Dict[str, Any]]:
+        time.sleep(self.latency)
+        return [
+            {
+                'id': f"v{index:010d}",
+                'title': f"Synthetic track {index:06d}",
+                'url': f"https://www.youtube.com/watch?v=v{index:010d}",
+                'duration': 180,
+                'uploader': "Benchmark",
+            }
+            for index in range(self.size)
+        ]
+
+
+class FakeAudioDownloader(IAudioDownloader):
+    """Writes a file of `file_size` bytes to output_path after `latency` seconds"""
+
+    def __init__(self, file_size: int, latency: float, recorder: LatencyRecorder):
+        self.file_size = file_size
+        self.latency = latency
+        self.recorder = recorder
+        # Random-looking payload, made unique per track by its URL prefix
+        self._payload = os.urandom(file_size)
+
+    def download_audio(
+        self, video_url: str, output_path: str, performance: Optional[Dict[str, Any]] = None
+    ) -> Optional[str]:
+        self.recorder.start(output_path)
+        time.sleep(self.latency)
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        prefix = video_url.encode("utf-8")
+        with open(output_path, "wb") as f:
+            f.write(prefix)
+            f.write(self._payload[len(prefix):])
+        return output_path
+
+    def download_audio_data(
+        self,
+        video_url: str,
+        max_bytes: int,
+        performance: Optional[Dict[str, Any]] = None,
+        duration: Optional[float] = None,
+        spool_dir: Optional[str] = None
+    ) -> Optional[Tuple[bytes, str]]:
+        if self.file_size > max_bytes:
+            return None
+        started = time.perf_counter()
+        time.sleep(self.latency)
+        prefix = video_url.encode("utf-8")
+        data = prefix + self._payload[len(prefix):]
+        # In-memory tracks are keyed by the buffer itself (see LocalMirrorUploader)
+        self.recorder.start(memory_key(data), started)
+        return data, ".mp3"
+
+
+class LatencyShim:
+    """Simulated network link: fixed latency per file plus bandwidth limit"""
+
+    def __init__(self, latency: float = 0.0, bandwidth: float = 0.0):
+        """
+        Args:
+            latency: Seconds per file (connection round trips, open/close)
+            bandwidth: Bytes per second (0 - unlimited)
+        """
+        self.latency = latency
+        self.bandwidth = bandwidth
+
+    def transfer(self, size: int) -> None:
+        delay = self.latency + (size / self.bandwidth if self.bandwidth else 0.0)
+        if delay:
+            time.sleep(delay)
+
+
+class LocalMirrorUploader(IMirroredFileUploader):
+    """
+    Mirrored uploader over local directories
+
+    Mirrors the threading model of smb_uploader.MirroredSMBUploader: the file
+    is read once, then written by one worker per mirror. When a mirror's
+    backlog is full the caller waits instead of skipping the file, so the
+    benchmark measures sustained throughput.
+    """
+
+    def __init__(self, root: str, shim: LatencyShim, recorder: LatencyRecorder, max_backlog: int = 4):
+        self.root = root
+        self.shim = shim
+        self.recorder = recorder
+        self.max_backlog = max_backlog
+        self._folders: Dict[str, str] = {}
+        self._executors: Dict[str, ThreadPoolExecutor] = {}
+        self._slots: Dict[str, threading.Semaphore] = {}
+        self._futures = []
+        self._remaining: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def connect(self, smb_configs: Optional[List[Dict[str, Any]]] = None, target_folder: str = "") -> bool:
+        for smb_config in smb_configs or []:
+            key = destination_key(smb_config, target_folder)
+            folder = os.path.join(self.root, smb_config['server'], smb_config['share'], target_folder)
+            os.makedirs(folder, exist_ok=True)
+            self._folders[key] = folder
+            self._executors[key] = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"mirror-{key}")
+            self._slots[key] = threading.Semaphore(self.max_backlog)
+        return bool(self._folders)
+
+    def get_destinations(self) -> List[str]:
+        return list(self._folders)
+
+    def upload_file(self, local_path: str, remote_path: str) -> bool:
+        destinations = self.get_destinations()
+        self.upload_to_destinations(local_path, remote_path, destinations)
+        self.wait_for_uploads()
+        return True
+
+    def upload_to_destinations(
+        self,
+        local_path: str,
+        remote_filename: str,
+        destinations: List[str],
+        on_result: Optional[Callable[[str, bool, int], None]] = None
+    ) -> int:
+        with open(local_path, "rb") as f:
+            data = f.read()
+        return self._submit(local_path, data, remote_filename, destinations, on_result)
+
+    def upload_data_to_destinations(
+        self,
+        data: bytes,
+        remote_filename: str,
+        destinations: List[str],
+        on_result: Optional[Callable[[str, bool, int], None]] = None
+    ) -> int:
+        return self._submit(memory_key(data), data, remote_filename, destinations, on_result)
+
+    def _submit(self, local_path, data, remote_filename, destinations, on_result) -> int:
+        targets = [destination for destination in destinations if destination in self._folders]
+        if not targets:
+            self.recorder.finish(local_path)
+            return 0
+        with self._lock:
+            self._remaining[local_path] = len(targets)
+        for destination in targets:
+            self._slots[destination].acquire()
+            self._futures.append(self._executors[destination].submit(
+                self._write, destination, local_path, remote_filename, data, on_result
+            ))
+        return len(targets)
+
+    def _write(self, destination, local_path, remote_filename, data, on_result) -> None:
+        try:
+            self.shim.transfer(len(data))
+            with open(os.path.join(self._folders[destination], remote_filename), "wb") as f:
+                f.write(data)
+            if on_result:
+                on_result(destination, True, len(data))
+        finally:
+            self._slots[destination].release()
+            with self._lock:
+                self._remaining[local_path] -= 1
+                done = self._remaining[local_path] == 0
+                if done:
+                    del self._remaining[local_path]
+            if done:
+                self.recorder.finish(local_path)
+
+    def wait_for_uploads(self) -> None:
+        futures, self._futures = self._futures, []
+        for future in futures:
+            future.result()
+
+    def rename_file(self, destination: str, old_name: str, new_name: str) -> bool:
+        folder = self._folders.get(destination)
+        if folder is None:
+            return False
+        self.shim.transfer(0)
+        os.rename(os.path.join(folder, old_name), os.path.join(folder, new_name))
+        return True
+
+    def remove_files(self, destination: str, names: List[str], trash_folder: Optional[str] = None) -> List[str]:
+        folder = self._folders.get(destination)
+        if folder is None:
+            return []
+        if trash_folder:
+            os.makedirs(os.path.join(folder, trash_folder), exist_ok=True)
+        for name in names:
+            self.shim.transfer(0)
+            if trash_folder:
+                os.replace(os.path.join(folder, name), os.path.join(folder, trash_folder, name))
+            else:
+                os.remove(os.path.join(folder, name))
+        return list(names)
+
+    def disconnect(self) -> None:
+        self.wait_for_uploads()
+        for executor in self._executors.values():
+            executor.shutdown(wait=True)
+        self._folders.clear()
+        self._executors.clear()
+        self._slots.clear()
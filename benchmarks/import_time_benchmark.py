@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark of startup time: module imports, CLI commands and the ffmpeg probe
+
+Each case runs in a fresh interpreter several times and the median wall
+time is reported. With --importtime, the slowest imports of `import main`
+(python -X importtime) are listed as well.
+
+Usage:
+    python benchmarks/import_time_benchmark.py [--runs 5] [--importtime]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# name -> code run by the child interpreter
+CASES = {
+    "python (baseline)": "pass",
+    "import config": "import config",
+    "import main": "import main",
+    "main.py --help": "import sys, main; sys.argv = ['main.py', '--help']; main.parse_arguments()",
+    "main.py status": "import sys, main; sys.exit(main.main(['status']))",
+    "import yt_dlp": "import yt_dlp",
+    "import smbclient": "import smbclient",
+}
+
+PROBE_CODE = """
+import time
+from capabilities import probe_ffmpeg
+started = time.perf_counter()
+probe_ffmpeg({cache!r})
+print(time.perf_counter() - started)
+"""
+
+
+def child_env() -> dict:
+    """Environment for child interpreters with the project on sys.path"""
+    return dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+
+
+def run_child(code: str, cwd: str) -> Optional[float]:
+    """Run code in a new interpreter and return its wall time (None on failure)"""
+    env = child_env()
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=cwd, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    elapsed = time.perf_counter() - started
+    return elapsed if result.returncode in (0, 2) else None
+
+
+def bench_cases(runs: int, cwd: str) -> None:
+    print(f"{'case':<22} {'median ms':>10} {'min ms':>8}")
+    for name, code in CASES.items():
+        times = [run_child(code, cwd) for _ in range(runs)]
+        if any(t is None for t in times):
+            print(f"{name:<22} {'failed (module not installed?)':>20}")
+            continue
+        print(f"{name:<22} {statistics.median(times) * 1000:>10.1f} {min(times) * 1000:>8.1f}")
+
+
+def bench_probe(cwd: str) -> None:
+    """Compare the ffmpeg probe without cache, on a cold cache and on a warm cache"""
+    cache = os.path.join(cwd, "capabilities.json")
+    env = child_env()
+    print()
+    for name, cache_file in (("probe, no cache", None), ("probe, cold cache", cache), ("probe, warm cache", cache)):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE_CODE.format(cache=cache_file)],
+            cwd=cwd, env=env, capture_output=True, text=True
+        ).stdout.strip()
+        print(f"{name:<22} {float(output) * 1000:>10.1f} ms" if output else f"{name:<22} failed")
+
+
+def bench_importtime(cwd: str, top: int = 15) -> None:
+    """List the slowest imports (cumulative) of `import main`"""
+    env = child_env()
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=cwd, env=env, capture_output=True, text=True
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, module = line[len("import time:"):].split("|", 2)
+        rows.append((int(cumulative_us), module.rstrip()))
+    print("\nSlowest imports of `import main` (cumulative):")
+    for cumulative_us, module in sorted(rows, reverse=True)[:top]:
+        print(f"  {cumulative_us / 1000:>8.1f} ms  {module}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--importtime", action="store_true", help="Also list the slowest imports")
+    args = parser.parse_args()
+
+    # Run in an empty directory so the tracker, caches and status files are fresh
+    with tempfile.TemporaryDirectory() as workdir:
+        bench_cases(args.runs, workdir)
+        bench_probe(workdir)
+        if args.importtime:
+            bench_importtime(workdir)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
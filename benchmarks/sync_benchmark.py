@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark of the synchronization pipeline with fake backends
+
+Runs the real YouTubeMP3Synchronizer, SQLite tracker, M3U manifest and
+metrics over synthetic playlists of 10/1,000/10,000 entries. YouTube is
+replaced by a fake extractor and downloader (configurable file size and
+latency) and SMB by local directories behind a latency shim, so nothing
+touches the network. Each size runs in a separate process and reports:
+
+    tracks/s      - tracks delivered to every mirror per second of sync()
+    p50/p95, ms   - per-track latency from download start to the last mirror
+    peak RSS, MB  - peak resident memory of the process
+
+Results can be saved with --save and compared to a saved baseline with
+--baseline, so each performance change can be checked against it.
+
+--spool BYTES runs the in-memory path for tracks up to BYTES (download,
+transcode and upload without temp files) instead of the temp folder.
+
+Usage:
+    python benchmarks/sync_benchmark.py [--sizes 10 1000 10000] [--save base.json]
+    python benchmarks/sync_benchmark.py --baseline base.json
+    python benchmarks/sync_benchmark.py --file-size 5000000 --spool 16777216 --baseline base.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fakes import (
+    FakeAudioDownloader, FakePlaylistExtractor, LatencyRecorder, LatencyShim, LocalMirrorUploader, SilentLogger
+)
+
+
+def percentile(values: list, fraction: float) -> float:
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+def peak_rss() -> int:
+    """Peak resident set size of this process in bytes"""
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_child(size: int, workdir: str, args: argparse.Namespace) -> dict:
+    """Synchronize one synthetic playlist (runs in a child process)"""
+    from m3u_manifest import M3UManifest
+    from metrics import MetricsRecorder
+    from sqlite_tracker import SqliteDownloadTracker
+    from youtube_mp3_sync import YouTubeMP3Synchronizer
+
+    logger = SilentLogger()
+    recorder = LatencyRecorder()
+    tracker = SqliteDownloadTracker(os.path.join(workdir, "downloaded.db"), logger)
+    uploader = LocalMirrorUploader(
+        os.path.join(workdir, "mirrors"),
+        LatencyShim(args.upload_latency, args.bandwidth * 1024 * 1024),
+        recorder,
+        args.max_backlog
+    )
+    playlist = {
+        "url": "https://www.youtube.com/playlist?list=BENCHMARK",
+        "folder": "Music/Benchmark",
+        "description": f"Synthetic {size}",
+        "smb_config": [
+            {"server": f"MIRROR{index}", "share": "music", "username": "", "password": "", "domain": ""}
+            for index in range(args.mirrors)
+        ],
+    }
+    synchronizer = YouTubeMP3Synchronizer(
+        playlist_extractor=FakePlaylistExtractor(size),
+        download_tracker=tracker,
+        audio_downloader=FakeAudioDownloader(args.file_size, args.download_latency, recorder),
+        file_uploader=uploader,
+        logger=logger,
+        temp_dir=os.path.join(workdir, "temp"),
+        m3u_manifest=M3UManifest(os.path.join(workdir, "m3u_manifest.json"), logger),
+        metrics=MetricsRecorder(),
+        playlists=[playlist],
+        spool_max_bytes=args.spool
+    )
+
+    started = time.perf_counter()
+    synchronizer.sync()
+    elapsed = time.perf_counter() - started
+    tracker.close()
+
+    delivered = len(recorder.latencies)
+    return {
+        "tracks": delivered,
+        "seconds": elapsed,
+        "tracks_per_second": delivered / elapsed if elapsed else 0.0,
+        "p50": percentile(recorder.latencies, 0.50),
+        "p95": percentile(recorder.latencies, 0.95),
+        "peak_rss": peak_rss(),
+    }
+
+
+def format_change(current: float, baseline: float, higher_is_better: bool) -> str:
+    """Relative change against the baseline, '+' meaning better"""
+    if not baseline:
+        return ""
+    change = (current - baseline) / baseline * 100
+    return f" ({change if higher_is_better else -change:+.0f}%)"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1_000, 10_000])
+    parser.add_argument("--file-size", type=int, default=32 * 1024, help="bytes per track (default: 32768)")
+    parser.add_argument("--download-latency", type=float, default=0.002, help="seconds per download")
+    parser.add_argument("--upload-latency", type=float, default=0.001, help="seconds per file per mirror")
+    parser.add_argument("--bandwidth", type=float, default=0.0, help="MB/s per mirror (0 - unlimited)")
+    parser.add_argument("--mirrors", type=int, default=2)
+    parser.add_argument("--max-backlog", type=int, default=4)
+    parser.add_argument(
+        "--spool", type=int, default=0, metavar="BYTES",
+        help="keep tracks up to BYTES in memory instead of temp files (0 - always disk)"
+    )
+    parser.add_argument("--save", metavar="FILE", help="save results as JSON")
+    parser.add_argument("--baseline", metavar="FILE", help="compare with results saved by --save")
+    parser.add_argument("--child", nargs=2, metavar=("SIZE", "WORKDIR"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        size, workdir = args.child
+        print(json.dumps(run_child(int(size), workdir, args)))
+        return 0
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+
+    child_options = [
+        "--file-size", str(args.file_size), "--download-latency", str(args.download_latency),
+        "--upload-latency", str(args.upload_latency), "--bandwidth", str(args.bandwidth),
+        "--mirrors", str(args.mirrors), "--max-backlog", str(args.max_backlog), "--spool", str(args.spool),
+    ]
+    print(f"{args.mirrors} mirrors, {args.file_size} bytes per track, download {args.download_latency * 1000:.1f} ms, "
+          f"upload {args.upload_latency * 1000:.1f} ms per file")
+    print(f"{'tracks':>8} {'tracks/s':>16} {'p50, ms':>16} {'p95, ms':>16} {'peak RSS, MB':>18}")
+
+    results = {}
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as workdir:
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", str(size), workdir] + child_options,
+                capture_output=True, text=True, check=True
+            ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        results[str(size)] = result
+
+        base = baseline.get(str(size), {})
+        rate = f"{result['tracks_per_second']:.1f}" + format_change(
+            result['tracks_per_second'], base.get('tracks_per_second', 0), True)
+        p50 = f"{result['p50'] * 1000:.1f}" + format_change(result['p50'], base.get('p50', 0), False)
+        p95 = f"{result['p95'] * 1000:.1f}" + format_change(result['p95'], base.get('p95', 0), False)
+        rss = f"{result['peak_rss'] / (1024 * 1024):.1f}" + format_change(
+            result['peak_rss'], base.get('peak_rss', 0), False)
+        print(f"{size:>8} {rate:>16} {p50:>16} {p95:>16} {rss:>18}")
+        if result['tracks'] != size:
+            print(f"         warning: {result['tracks']} of {size} tracks reached every mirror")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"options": vars(args), "results": results}, f, indent=2)
+        print(f"Results saved to {args.save}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
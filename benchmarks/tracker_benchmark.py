@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Benchmark of download tracker startup time and memory (RSS)
+
+Generates synthetic archives with 10k/100k/1M entries and measures, in a
+separate process for each backend, how long the tracker takes to start
+and how much resident memory it uses afterwards.
+
+Usage:
+    python benchmarks/tracker_benchmark.py [--sizes 10000 100000 1000000]
+"""
+import argparse
+import base64
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from interfaces import ILogger
+
+# "compact" runs twice: the first start builds the index snapshot, the second loads it
+BACKENDS = ["json", "sqlite", "compact", "compact"]
+
+
+class SilentLogger(ILogger):
+    """Logger that drops all messages"""
+
+    def info(self, message: str) -> None:
+        pass
+
+    def error(self, message: str) -> None:
+        pass
+
+    def warning(self, message: str) -> None:
+        pass
+
+
+def current_rss() -> int:
+    """Current resident set size of this process in bytes"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def create_tracker(backend: str, workdir: str):
+    """Create a tracker of the given backend over the prepared archive"""
+    if backend == "json":
+        from download_tracker import JsonDownloadTracker
+        return JsonDownloadTracker(os.path.join(workdir, "downloaded.json"), SilentLogger())
+    if backend == "sqlite":
+        from sqlite_tracker import SqliteDownloadTracker
+        return SqliteDownloadTracker(os.path.join(workdir, "downloaded.db"), SilentLogger())
+    from compact_tracker import CompactDownloadTracker
+    return CompactDownloadTracker(os.path.join(workdir, "downloaded.db"), SilentLogger())
+
+
+def run_child(backend: str, workdir: str, probe_ids: list) -> None:
+    """Measure a single backend (runs in a child process)"""
+    base_rss = current_rss()
+    started = time.perf_counter()
+    tracker = create_tracker(backend, workdir)
+    startup = time.perf_counter() - started
+    rss = current_rss() - base_rss
+
+    started = time.perf_counter()
+    for video_id in probe_ids:
+        tracker.is_downloaded(video_id)
+    lookup = (time.perf_counter() - started) / len(probe_ids)
+
+    print(json.dumps({"startup": startup, "rss": rss, "lookup": lookup}))
+
+
+def random_video_id(rng: random.Random) -> str:
+    """Random ID in YouTube format (11 base64url characters encoding 8 bytes)"""
+    return base64.urlsafe_b64encode(rng.randbytes(8)).decode("ascii").rstrip("=")
+
+
+def prepare_archive(size: int, workdir: str) -> list:
+    """Generate JSON and SQLite archives with `size` entries"""
+    rng = random.Random(size)
+    ids = [random_video_id(rng) for _ in range(size)]
+    downloaded = {
+        video_id: {
+            "file_path": f"Song title number {index}.mp3",
+            "download_date": "2025-01-01 12:00:00.000000",
+            "destinations": {
+                "SERVER/share/Music/Folder": {
+                    "file": f"Song title number {index}.mp3",
+                    "size": 5_000_000,
+                    "date": "2025-01-01 12:00:00.000000"
+                }
+            }
+        }
+        for index, video_id in enumerate(ids)
+    }
+    json_file = os.path.join(workdir, "downloaded.json")
+    with open(json_file, "w", encoding="utf-8") as f:
+        json.dump({"downloaded": downloaded}, f, ensure_ascii=False, indent=2)
+
+    from sqlite_tracker import SqliteDownloadTracker
+    tracker = SqliteDownloadTracker(
+        os.path.join(workdir, "downloaded.db"), SilentLogger(), import_json_file=json_file
+    )
+    tracker.close()
+
+    # Half of the probes hit the archive, half miss
+    return ids[:500] + [random_video_id(rng) for _ in range(500)]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--child", nargs=2, metavar=("BACKEND", "WORKDIR"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        backend, workdir = args.child
+        with open(os.path.join(workdir, "probe.json")) as f:
+            run_child(backend, workdir, json.load(f))
+        return 0
+
+    print("compact* = first start (builds the index), compact = start from the saved index")
+    print(f"{'entries':>10} {'backend':>8} {'startup, s':>11} {'RSS, MB':>9} {'lookup, us':>11}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as workdir:
+            probe_ids = prepare_archive(size, workdir)
+            with open(os.path.join(workdir, "probe.json"), "w") as f:
+                json.dump(probe_ids, f)
+
+            for run, backend in enumerate(BACKENDS):
+                output = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "--child", backend, workdir],
+                    capture_output=True, text=True, check=True
+                ).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                label = backend if backend != "compact" else ("compact*" if run == BACKENDS.index(backend) else "compact")
+                print(f"{size:>10} {label:>8} {result['startup']:>11.3f} "
+                      f"{result['rss'] / (1024 * 1024):>9.1f} {result['lookup'] * 1e6:>11.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
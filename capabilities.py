@@ -0,0 +1,115 @@
+"""
+Определение возможностей системы (ffmpeg) с кешированием на диске
+"""
+import json
+import os
+import shutil
+import subprocess
+from typing import Any, Dict, List, Optional
+
+# Кодировщик, необходимый для конвертации в MP3
+MP3_ENCODER = "libmp3lame"
+
+
+def probe_ffmpeg(cache_file: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Определить путь, версию и кодировщики ffmpeg
+
+    Запуск ffmpeg выполняется только при изменении бинарного файла:
+    результат кешируется в cache_file с ключом (путь, mtime, размер).
+
+    Args:
+        cache_file: Файл кеша (None - без кеширования)
+
+    Returns:
+        Словарь с ключами available, path, version, encoders
+    """
+    path = shutil.which("ffmpeg")
+    if not path:
+        return {"available": False, "path": None, "version": None, "encoders": []}
+
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return {"available": False, "path": path, "version": None, "encoders": []}
+    key = {"path": path, "mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+    cache = _load_cache(cache_file)
+    cached = cache.get("ffmpeg")
+    if cached and cached.get("key") == key:
+        return cached["result"]
+
+    result = _run_ffmpeg_probe(path)
+    if cache_file and result["available"]:
+        cache["ffmpeg"] = {"key": key, "result": result}
+        _save_cache(cache_file, cache)
+    return result
+
+
+def has_mp3_encoder(capabilities: Dict[str, Any]) -> bool:
+    """Может ли найденный ffmpeg конвертировать в MP3"""
+    if not capabilities.get("available"):
+        return False
+    encoders = capabilities.get("encoders") or []
+    # Пустой список - вывод -encoders не распознан, считаем что кодировщик есть
+    return not encoders or MP3_ENCODER in encoders
+
+
+def _run_ffmpeg_probe(path: str) -> Dict[str, Any]:
+    """Запустить ffmpeg для получения версии и списка кодировщиков"""
+    try:
+        version_output = subprocess.run(
+            [path, "-hide_banner", "-version"], capture_output=True, text=True, check=True
+        ).stdout
+        encoders_output = subprocess.run(
+            [path, "-hide_banner", "-encoders"], capture_output=True, text=True, check=True
+        ).stdout
+    except (subprocess.CalledProcessError, OSError):
+        return {"available": False, "path": path, "version": None, "encoders": []}
+
+    first_line = version_output.splitlines()[0] if version_output else ""
+    version = first_line.split()[2] if first_line.startswith("ffmpeg version") and len(first_line.split()) > 2 else None
+    return {
+        "available": True,
+        "path": path,
+        "version": version,
+        "encoders": _parse_encoders(encoders_output),
+    }
+
+
+def _parse_encoders(output: str) -> List[str]:
+    """Разобрать вывод ffmpeg -encoders (строки вида ' A..... libmp3lame  описание')"""
+    encoders = []
+    in_list = False
+    for line in output.splitlines():
+        if line.strip().startswith("------"):
+            in_list = True
+            continue
+        parts = line.split()
+        if in_list and len(parts) >= 2 and len(parts[0]) == 6:
+            encoders.append(parts[1])
+    return encoders
+
+
+def _load_cache(cache_file: Optional[str]) -> Dict[str, Any]:
+    """Прочитать кеш (поврежденный или отсутствующий файл - пустой кеш)"""
+    if not cache_file:
+        return {}
+    try:
+        with open(cache_file, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+        return cache if isinstance(cache, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(cache_file: str, cache: Dict[str, Any]) -> None:
+    """Записать кеш (атомарная замена); ошибки записи не мешают работе"""
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(cache_file) or ".", exist_ok=True)
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(cache, f, indent=2)
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        pass
@@ -0,0 +1,140 @@
+"""
+Каталог доставленных треков по всем папкам с индексами для быстрых выборок
+"""
+import fnmatch
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional
+from m3u_manifest import M3UManifest
+
+
+class TrackCatalogue:
+    """
+    Индексированный каталог всех доставленных треков.
+
+    Строится из манифеста M3U, который обновляется при каждой доставке файла,
+    поэтому не требует обращений к SMB серверам. Каждый трек содержит
+    id, server, share, folder, file, title, duration, uploader и added.
+    """
+
+    def __init__(self, tracks: List[Dict[str, Any]]):
+        self.tracks = tracks
+
+        # Индексы для частых выборок
+        self._by_uploader: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self._by_location: Dict[tuple, List[Dict[str, Any]]] = defaultdict(list)
+        for track in tracks:
+            self._by_uploader[track["uploader"]].append(track)
+            self._by_location[(track["server"], track["share"])].append(track)
+        self._by_added = sorted(tracks, key=lambda track: track["added"], reverse=True)
+
+    @classmethod
+    def from_manifest(cls, manifest: M3UManifest) -> "TrackCatalogue":
+        """
+        Построить каталог из манифеста доставленных треков
+
+        Args:
+            manifest: Манифест M3U
+
+        Returns:
+            Каталог треков всех назначений
+        """
+        tracks = []
+        for destination, entries in manifest.get_all_entries().items():
+            server, share, folder = (destination.split('/', 2) + ['', ''])[:3]
+            for entry in entries:
+                tracks.append({
+                    "id": entry["id"],
+                    "server": server,
+                    "share": share,
+                    "folder": folder,
+                    "file": entry["file"],
+                    "title": entry.get("title", ""),
+                    "duration": entry.get("duration", -1),
+                    "uploader": entry.get("uploader", ""),
+                    "added": entry.get("added", ""),
+                    "position": entry.get("position", 0),
+                })
+        return cls(tracks)
+
+    def get_uploaders(self, server: Optional[str] = None, share: Optional[str] = None) -> List[str]:
+        """Получить список авторов (опционально только для указанной шары)"""
+        tracks = self.tracks if server is None else self._by_location.get((server, share), [])
+        return sorted({track["uploader"] for track in tracks if track["uploader"]})
+
+    def query(self, rules: Dict[str, Any], server: Optional[str] = None, share: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Выбрать треки по правилам смарт-плейлиста
+
+        Поддерживаемые правила:
+            folder: Маска папки (fnmatch), например "Music/Correr*"
+            uploader: Автор или список авторов
+            min_duration / max_duration: Границы длительности в секундах
+            added_within_days: Добавлены не ранее N дней назад
+            title_contains: Подстрока в названии (без учета регистра)
+            sort: "playlist" (по умолчанию), "added", "title" или "duration"
+            limit: Максимальное количество треков
+
+        Args:
+            rules: Правила выборки
+            server: Ограничить выборку треками этого сервера
+            share: Ограничить выборку треками этой шары
+
+        Returns:
+            Список подходящих треков
+        """
+        # Выбираем самый узкий индекс как отправную точку
+        uploaders = rules.get("uploader")
+        if isinstance(uploaders, str):
+            uploaders = [uploaders]
+        if uploaders:
+            candidates = [track for uploader in uploaders for track in self._by_uploader.get(uploader, [])]
+        elif rules.get("added_within_days") is not None:
+            candidates = self.recently_added(rules["added_within_days"])
+        elif server is not None:
+            candidates = self._by_location.get((server, share), [])
+        else:
+            candidates = self.tracks
+
+        added_after = None
+        if rules.get("added_within_days") is not None:
+            added_after = (datetime.now() - timedelta(days=rules["added_within_days"])).isoformat(timespec='seconds')
+        title_contains = (rules.get("title_contains") or "").lower()
+
+        result = []
+        for track in candidates:
+            if server is not None and (track["server"], track["share"]) != (server, share):
+                continue
+            if rules.get("folder") and not fnmatch.fnmatch(track["folder"], rules["folder"]):
+                continue
+            duration = track["duration"]
+            if rules.get("min_duration") is not None and (duration < 0 or duration < rules["min_duration"]):
+                continue
+            if rules.get("max_duration") is not None and (duration < 0 or duration > rules["max_duration"]):
+                continue
+            if added_after and track["added"] < added_after:
+                continue
+            if title_contains and title_contains not in track["title"].lower():
+                continue
+            result.append(track)
+
+        sort_key = {
+            "added": lambda track: track["added"],
+            "title": lambda track: track["title"].lower(),
+            "duration": lambda track: track["duration"],
+        }.get(rules.get("sort", "playlist"), lambda track: (track["folder"], track["position"]))
+        result.sort(key=sort_key, reverse=rules.get("sort") == "added")
+
+        if rules.get("limit"):
+            result = result[:rules["limit"]]
+        return result
+
+    def recently_added(self, days: float) -> List[Dict[str, Any]]:
+        """Получить треки, добавленные за последние N дней (новые первыми)"""
+        threshold = (datetime.now() - timedelta(days=days)).isoformat(timespec='seconds')
+        result = []
+        for track in self._by_added:
+            if track["added"] < threshold:
+                break
+            result.append(track)
+        return result
@@ -0,0 +1,183 @@
+"""
+Трекер загрузок с компактным индексом ID в памяти для очень больших архивов
+"""
+import base64
+import bisect
+import heapq
+import os
+import re
+from array import array
+from typing import Optional
+from interfaces import ILogger
+from sqlite_tracker import SqliteDownloadTracker
+
+# ID YouTube: 11 символов base64url, последний символ кодирует только 4 бита
+_VIDEO_ID_PATTERN = re.compile(r'[A-Za-z0-9_-]{10}[AEIMQUYcgkosw048]')
+
+
+def _pack_video_id(video_id: str) -> Optional[int]:
+    """
+    Упаковать ID видео YouTube в 64-битное целое
+
+    ID YouTube кодирует ровно 8 байт. Для ID другого формата возвращается None.
+    """
+    if not _VIDEO_ID_PATTERN.fullmatch(video_id):
+        return None
+    return int.from_bytes(base64.urlsafe_b64decode(video_id + "="), 'big')
+
+
+class CompactDownloadTracker(SqliteDownloadTracker):
+    """
+    Трекер на SQLite, держащий в памяти только компактный индекс ID.
+
+    ID YouTube упаковываются в 64-битные целые и хранятся в отсортированном
+    массиве (8 байт на запись) с бинарным поиском. ID другого формата и записи,
+    добавленные во время работы, хранятся в небольшом множестве. Пути, даты
+    и сведения о доставке читаются из базы по запросу и только для ID,
+    которые есть в индексе.
+
+    Индекс сохраняется рядом с базой (файл .idx) вместе со счетчиком
+    изменений базы, поэтому при запуске он читается одним блоком и
+    перестраивается только если база менялась в обход трекера.
+    """
+
+    def __init__(self, db_file: str, logger: ILogger, **kwargs):
+        super().__init__(db_file, logger, **kwargs)
+        self.index_file = f"{db_file}.idx"
+        self._extra_ids = set()
+        self._index_dirty = False
+        self._ids = self._load_snapshot()
+        if self._ids is None:
+            self._ids = self._build_index()
+            self._save_snapshot()
+
+    def _generation(self) -> int:
+        """Получить счетчик изменений набора ID в базе"""
+        row = self._connection.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        return int(row[0]) if row else 0
+
+    def _load_snapshot(self) -> Optional[array]:
+        """Прочитать сохраненный индекс, если он соответствует базе"""
+        if not os.path.exists(self.index_file):
+            return None
+
+        try:
+            with open(self.index_file, 'rb') as f:
+                generation = int.from_bytes(f.read(8), 'little')
+                if generation != self._generation():
+                    self.logger.info("Компактный индекс устарел, перестраиваем")
+                    return None
+                count = int.from_bytes(f.read(8), 'little')
+                packed = array('Q')
+                packed.fromfile(f, count)
+                # ID нестандартного формата хранятся после массива, по одному в строке
+                irregular = f.read().decode('utf-8')
+        except (IOError, ValueError, EOFError) as e:
+            self.logger.warning(f"Не удалось прочитать компактный индекс: {e}")
+            return None
+
+        self._extra_ids.update(video_id for video_id in irregular.split('\n') if video_id)
+        self.logger.info(f"Загружен компактный индекс: {len(packed)} ID")
+        return packed
+
+    def _build_index(self) -> array:
+        """Построить отсортированный индекс ID по базе"""
+        with self._lock:
+            packed = array('Q')
+            for (video_id,) in self._connection.execute("SELECT video_id FROM videos"):
+                value = _pack_video_id(video_id)
+                if value is None:
+                    self._extra_ids.add(video_id)
+                else:
+                    packed.append(value)
+            packed = array('Q', sorted(packed))
+            self.logger.info(
+                f"Построен компактный индекс: {len(packed)} ID ({packed.itemsize * len(packed)} байт), "
+                f"прочих ID: {len(self._extra_ids)}"
+            )
+            return packed
+
+    def _save_snapshot(self) -> None:
+        """Сохранить индекс рядом с базой (атомарная замена файла)"""
+        tmp_file = f"{self.index_file}.tmp"
+        try:
+            with open(tmp_file, 'wb') as f:
+                f.write(self._generation().to_bytes(8, 'little'))
+                f.write(len(self._ids).to_bytes(8, 'little'))
+                self._ids.tofile(f)
+                f.write('\n'.join(sorted(self._extra_ids)).encode('utf-8'))
+            os.replace(tmp_file, self.index_file)
+        except IOError as e:
+            self.logger.warning(f"Не удалось сохранить компактный индекс: {e}")
+
+    def close(self) -> None:
+        """Перенести новые ID в индекс, сохранить его и закрыть базу"""
+        with self._lock:
+            self.flush()
+            if self._index_dirty:
+                added = []
+                for video_id in list(self._extra_ids):
+                    value = _pack_video_id(video_id)
+                    if value is not None:
+                        added.append(value)
+                        self._extra_ids.discard(video_id)
+                self._ids = array('Q', self._merge_unique(self._ids, sorted(added)))
+                # Сохраняем индекс, только если он покрывает всю базу
+                # (другой процесс мог добавить записи за время работы)
+                count = self._connection.execute("SELECT COUNT(*) FROM videos").fetchone()[0]
+                if count == len(self._ids) + len(self._extra_ids):
+                    self._save_snapshot()
+                elif os.path.exists(self.index_file):
+                    os.remove(self.index_file)
+                self._index_dirty = False
+            super().close()
+
+    @staticmethod
+    def _merge_unique(first, second):
+        """Слить две отсортированные последовательности без дубликатов"""
+        previous = None
+        for value in heapq.merge(first, second):
+            if value != previous:
+                yield value
+                previous = value
+
+    def _remember(self, video_id: str) -> None:
+        """Добавить ID, записанный во время работы"""
+        self._extra_ids.add(video_id)
+        self._index_dirty = True
+
+    def _in_index(self, video_id: str) -> bool:
+        """Проверить наличие ID в индексе без обращения к базе"""
+        if video_id in self._extra_ids:
+            return True
+        value = _pack_video_id(video_id)
+        if value is None:
+            return False
+        index = bisect.bisect_left(self._ids, value)
+        return index < len(self._ids) and self._ids[index] == value
+
+    def is_downloaded(self, video_id: str) -> bool:
+        """Проверить, был ли файл уже загружен (только по индексу)"""
+        return self._in_index(video_id)
+
+    def mark_as_downloaded(self, video_id: str, file_path: str) -> None:
+        """Отметить файл как загруженный"""
+        super().mark_as_downloaded(video_id, file_path)
+        self._remember(video_id)
+
+    def is_delivered(self, video_id: str, destination: str) -> bool:
+        """Проверить доставку: отрицательный ответ дается без обращения к базе"""
+        if not self._in_index(video_id):
+            return False
+        return super().is_delivered(video_id, destination)
+
+    def mark_delivered(self, video_id: str, destination: str, remote_filename: str, size: int) -> None:
+        """Отметить файл как доставленный в указанное назначение"""
+        super().mark_delivered(video_id, destination, remote_filename, size)
+        self._remember(video_id)
+
+    def get_delivered_file(self, video_id: str, destination: str) -> Optional[str]:
+        """Получить имя доставленного файла (из базы, только для известных ID)"""
+        if not self._in_index(video_id):
+            return None
+        return super().get_delivered_file(video_id, destination)
@@ -2,16 +2,173 @@
 Конфигурация приложения для загрузки MP3 из YouTube плейлиста
 """
 import os
-import subprocess
-from dotenv import load_dotenv
 
-# Загружаем переменные окружения из .env файла
-load_dotenv()
+
+def _find_env_file() -> str:
+    """Найти .env в папке проекта или выше (как load_dotenv без аргументов)"""
+    directory = os.path.dirname(os.path.abspath(__file__))
+    while True:
+        candidate = os.path.join(directory, ".env")
+        if os.path.isfile(candidate):
+            return candidate
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return ""
+        directory = parent
+
+
+# Загружаем переменные окружения из .env файла (dotenv импортируется, только если файл есть)
+_ENV_FILE = _find_env_file()
+if _ENV_FILE:
+    from dotenv import load_dotenv
+    load_dotenv(_ENV_FILE)
 
 # Настройки загрузки
 DOWNLOAD_ARCHIVE_FILE = "downloaded.json"
 TEMP_DOWNLOAD_DIR = "temp_downloads"
 
+# Место во временной папке. Перед загрузкой резервируется оценка размера
+# (длительность × TEMP_ESTIMATE_KBPS: исходный поток и MP3 во время
+# конвертации); при превышении TEMP_SPACE_QUOTA (0 - без ограничения) или
+# если на диске останется меньше TEMP_MIN_FREE_SPACE, новые загрузки ждут.
+# При запуске удаляются файлы старше TEMP_ORPHAN_AGE секунд (остатки
+# прерванных запусков)
+TEMP_SPACE_QUOTA = 2 * 1024 * 1024 * 1024
+TEMP_MIN_FREE_SPACE = 512 * 1024 * 1024
+TEMP_ESTIMATE_KBPS = 400
+TEMP_ORPHAN_AGE = 3600
+
+# Треки, которые по оценке (длительность × битрейт) и по размеру потока не
+# больше SPOOL_MAX_BYTES, скачиваются в память и конвертируются ffmpeg через
+# каналы, без временных файлов; более крупные - через TEMP_DOWNLOAD_DIR.
+# 0 - всегда через диск
+SPOOL_MAX_BYTES = 16 * 1024 * 1024
+
+# Поиск дубликатов по звуку: при конвертации ffmpeg считает хеш
+# декодированного звука, и видео с тем же звуком, что у уже доставленного
+# (перезалив, видео с текстом песни), ссылается на существующий файл вместо
+# повторной загрузки на сервер. Требует ffmpeg
+DEDUP_BY_CONTENT = True
+
+# Быстрая временная папка для небольших файлов (например, "/dev/shm/ytsync"
+# на tmpfs; пусто - не используется): файлы с оценкой до TEMP_FAST_MAX_FILE
+# в пределах квоты TEMP_FAST_QUOTA
+TEMP_FAST_DIR = ""
+TEMP_FAST_MAX_FILE = 32 * 1024 * 1024
+TEMP_FAST_QUOTA = 256 * 1024 * 1024
+
+# Хранилище трекера загрузок: "sqlite" (по умолчанию), "compact" или "json".
+# "compact" - та же база SQLite, но в памяти держится только компактный
+# индекс ID (для архивов в сотни тысяч записей).
+# При первом запуске SQLite трекер импортирует существующий DOWNLOAD_ARCHIVE_FILE
+TRACKER_BACKEND = "sqlite"
+SQLITE_ARCHIVE_FILE = "downloaded.db"
+# Пакетная фиксация изменений SQLite: после N отметок или раз в N секунд
+TRACKER_COMMIT_BATCH_SIZE = 50
+TRACKER_COMMIT_INTERVAL = 5.0
+
+# Манифест доставленных треков, из которого строятся M3U плейлисты
+M3U_MANIFEST_FILE = "m3u_manifest.json"
+# Как часто сверять манифест с содержимым папки на сервере (дни)
+M3U_RECONCILE_INTERVAL_DAYS = 7
+
+# Повторные попытки загрузки видео с ошибками: задержка удваивается после
+# каждой неудачи (от RETRY_BASE_DELAY до RETRY_MAX_DELAY секунд), после
+# RETRY_MAX_ATTEMPTS попыток видео больше не запрашивается
+RETRY_BASE_DELAY = 3600
+RETRY_MAX_DELAY = 7 * 24 * 3600
+RETRY_MAX_ATTEMPTS = 8
+
+# Повторы сетевых операций внутри запуска (YouTube и SMB): число попыток и
+# экспоненциальная задержка со случайным разбросом. Ключи операций:
+# youtube_playlist, youtube_metadata, youtube_download, smb_connect, smb_write, smb_read.
+# Значения по умолчанию - resilience.DEFAULT_OPERATION_RETRIES, здесь можно их изменить:
+# {"smb_write": {"attempts": 5, "base_delay": 2.0, "max_delay": 30.0}}
+OPERATION_RETRIES = {}
+# Предохранитель: после CIRCUIT_BREAKER_FAILURES ошибок подряд сервер (или YouTube)
+# отключается, и оставшаяся работа с ним сразу пропускается; через
+# CIRCUIT_BREAKER_RESET секунд выполняется пробный запрос
+CIRCUIT_BREAKER_FAILURES = 4
+CIRCUIT_BREAKER_RESET = 300
+
+# Адаптивное ограничение запросов к YouTube: при ответе 429 или проверке на
+# бота частота (запросов в минуту) и параллельность уменьшаются вдвое, после
+# успешных запросов постепенно растут. Найденная частота сохраняется в
+# THROTTLE_STATE_FILE и используется при следующем запуске
+THROTTLE_STATE_FILE = "youtube_throttle.json"
+THROTTLE_INITIAL_RATE = 30.0
+THROTTLE_MIN_RATE = 2.0
+THROTTLE_MAX_RATE = 120.0
+THROTTLE_MAX_CONCURRENCY = 4
+
+# Алгоритм проверки целостности загрузок: "auto" (xxh3_128 при установленном
+# пакете xxhash, иначе blake2b), "xxh3_128", "xxh64", "blake2b", "md5" или "sha256"
+HASH_ALGORITHM = "auto"
+
+# Логирование: уровень (DEBUG, INFO, WARNING, ERROR) и файл для записи
+# JSON строк с ротацией (None - только консоль). Запись выполняется
+# в отдельном потоке и не задерживает загрузку
+LOG_LEVEL = "INFO"
+LOG_FILE = None  # например "logs/sync.jsonl"
+LOG_FILE_MAX_BYTES = 10 * 1024 * 1024
+LOG_FILE_BACKUP_COUNT = 5
+
+# Метрики этапов (время, объем по серверам, очереди) в формате Prometheus
+# для textfile collector node_exporter. None - не записывать.
+# Файл пишется в конце запуска и не чаще раза в METRICS_WRITE_INTERVAL секунд во время работы
+METRICS_TEXTFILE = None  # например "/var/lib/node_exporter/textfile_collector/ytsync.prom"
+METRICS_WRITE_INTERVAL = 60
+
+# Сводный прогресс: файл состояния в JSON (передачи, оставшиеся треки, ETA)
+# для внешнего мониторинга. None - не записывать. Строка прогресса в
+# терминале включается ключом --progress. Обновление раз в PROGRESS_REFRESH_INTERVAL секунд
+PROGRESS_STATUS_FILE = None  # например "status.json"
+PROGRESS_REFRESH_INTERVAL = 1.0
+
+# Папка для отчетов профилирования (python main.py --profile)
+PROFILE_DIR = "profiles"
+
+# Количество параллельных потоков команды reconcile (чтение плейлистов и папок)
+RECONCILE_MAX_WORKERS = 8
+
+# Максимум файлов в очереди одного зеркала. Если зеркало не успевает,
+# загрузка следующих треков ждет, пока в его очереди не освободится место
+MIRROR_MAX_BACKLOG = 4
+
+# Удаление из папки треков, которых больше нет в плейлисте YouTube: включается
+# для плейлиста ключом "remove_missing": "trash" (перенос в подпапку
+# MIRROR_TRASH_FOLDER) или "delete". Если пропала большая доля доставленных
+# треков (больше MIRROR_REMOVAL_MAX_FRACTION, например после неполного
+# получения плейлиста), удаление в этом назначении отменяется
+MIRROR_TRASH_FOLDER = ".trash"
+MIRROR_REMOVAL_MAX_FRACTION = 0.25
+
+# Режим нескольких узлов (команды coordinate и worker): общая очередь заданий
+# в базе SQLite на хранилище, доступном всем узлам. Узел берет задания
+# JOB_CLAIM_BATCH видео в аренду на JOB_LEASE_SECONDS и продлевает ее, пока
+# работает; задания упавшего узла после истечения аренды получают другие.
+# Задание, выданное JOB_MAX_ATTEMPTS раз без успеха, считается неудачным
+JOB_QUEUE_FILE = "jobs.db"
+JOB_LEASE_SECONDS = 600
+JOB_CLAIM_BATCH = 2
+JOB_MAX_ATTEMPTS = 3
+JOB_POLL_INTERVAL = 30
+
+# Профили производительности: имя -> настройки (см. profiles.DEFAULT_PROFILE).
+# Плейлист выбирает профиль ключом "profile" и может уточнить его ключом
+# "overrides"; те же ключи в smb_config задают настройки загрузки для
+# отдельного сервера. Профиль "default" применяется ко всем плейлистам
+PERFORMANCE_PROFILES = {
+    "podcast": {"quality": "64", "upload_workers": 4, "max_backlog": 16, "verify": "size"},
+    "music": {"quality": "320", "verify": "hash"},
+}
+
+# Внешний файл настроек (TOML или YAML) с разделами profiles и playlists.
+# Профили из файла дополняют PERFORMANCE_PROFILES, плейлисты заменяют
+# PLAYLISTS_CONFIG. Файл проверяется при запуске; если его нет, используется config.py.
+# Пример: sync.example.toml
+SETTINGS_FILE = "sync.toml"
+
 # Конфигурация плейлистов с индивидуальными настройками SMB
 # Каждый элемент содержит: URL плейлиста, настройки SMB и папку назначения
 PLAYLISTS_CONFIG = [
@@ -41,6 +198,26 @@ PLAYLISTS_CONFIG = [
             "domain": ""                  # Домен (обычно не требуется)
         }
     },
+    # Плейлист с зеркалами: smb_config может быть списком назначений.
+    # Файл скачивается один раз и параллельно загружается на все серверы:
+    # {
+    #     "url": "https://www.youtube.com/playlist?list=PLAYLIST_ID",
+    #     "folder": "Music/Backup",
+    #     "description": "Плейлист с резервной копией",
+    #     "playlist": "Backup.m3u",
+    #     "smb_config": [
+    #         {"server": "MYCLOUDEX2ULTRA", "share": "leon", "username": ..., "password": ..., "domain": ""},
+    #         {"server": "BACKUP_NAS", "share": "music", "username": ..., "password": ..., "domain": ""},
+    #     ]
+    # },
+    # Плейлист, папка которого повторяет плейлист: треки, удаленные из плейлиста
+    # на YouTube, переносятся в папку корзины (или удаляются при "delete"):
+    # {
+    #     "url": "https://www.youtube.com/playlist?list=PLAYLIST_ID",
+    #     "folder": "Music/Current",
+    #     "remove_missing": "trash",
+    #     "smb_config": {...}
+    # },
     # Добавьте дополнительные плейлисты здесь:
     # {
     #     "url": "https://www.youtube.com/playlist?list=PLAYLIST_ID_2",
@@ -57,45 +234,87 @@ PLAYLISTS_CONFIG = [
     # },
 ]
 
-def _check_ffmpeg_available() -> bool:
-    """Проверить доступность ffmpeg в системе"""
-    try:
-        subprocess.run(['ffmpeg', '-version'], capture_output=True, check=True)
-        return True
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        return False
-
-# Проверяем доступность ffmpeg
-_check_ffmpeg_available()
-
-# Определяем доступность ffmpeg
-FFMPEG_AVAILABLE = _check_ffmpeg_available()
-
-# Настройки yt-dlp с автоматической адаптацией
-if FFMPEG_AVAILABLE:
-    # С ffmpeg - можем конвертировать в MP3
-    YT_DLP_OPTIONS = {
-        'format': 'bestaudio/best',
-        'outtmpl': '%(title)s',  # Без расширения, FFmpeg добавит .mp3
-        'postprocessors': [{
-            'key': 'FFmpegExtractAudio',
-            'preferredcodec': 'mp3',
-            'preferredquality': '192',
-        }],
-        'writeinfojson': False,
-        'writesubtitles': False,
-        'writeautomaticsub': False,
-        'ignoreerrors': True,
-    }
-    print("OK: FFmpeg detected - will convert to MP3")
-else:
-    # Без ffmpeg - скачиваем лучший доступный аудио формат
-    YT_DLP_OPTIONS = {
-        'format': 'bestaudio[ext=m4a]/bestaudio[ext=webm]/bestaudio',
-        'outtmpl': '%(title)s.%(ext)s',
-        'writeinfojson': False,
-        'writesubtitles': False,
-        'writeautomaticsub': False,
-        'ignoreerrors': True,
-    }
-    print("WARNING: FFmpeg not found - will download best available audio format")
+# Смарт-плейлисты (M3U8) по всем папкам библиотеки.
+# Строятся из каталога доставленных треков за один проход после синхронизации.
+# Пути к трекам записываются относительно папки плейлиста, поэтому
+# плейлист должен лежать на той же шаре, что и треки.
+SMART_PLAYLISTS = [
+    # {
+    #     "name": "Running under 4 min.m3u8",
+    #     "smb_config": PLAYLISTS_CONFIG[0]["smb_config"],
+    #     "folder": "Music/Smart",
+    #     "rules": {"folder": "Music/Correr*", "max_duration": 240},
+    # },
+    # {
+    #     "name": "Added last 30 days.m3u8",
+    #     "smb_config": PLAYLISTS_CONFIG[0]["smb_config"],
+    #     "folder": "Music/Smart",
+    #     "rules": {"added_within_days": 30, "sort": "added"},
+    # },
+    # {
+    #     "name": "By {group}.m3u8",  # Один плейлист на каждого автора
+    #     "smb_config": PLAYLISTS_CONFIG[0]["smb_config"],
+    #     "folder": "Music/Smart/Uploaders",
+    #     "group_by": "uploader",
+    # },
+]
+
+# Постоянный кеш yt-dlp (разобранные функции подписи плеера YouTube и т.п.):
+# переживает перезапуски, поэтому первое видео не ждет загрузки и разбора
+# плеера. Записи, не обновлявшиеся YT_DLP_CACHE_MAX_AGE_DAYS дней, удаляются
+YT_DLP_CACHE_DIR = "yt_dlp_cache"
+YT_DLP_CACHE_MAX_AGE_DAYS = 30
+
+# Кеш определения возможностей системы (путь, версия и кодировщики ffmpeg).
+# ffmpeg запускается заново только при изменении его бинарного файла
+CAPABILITIES_CACHE_FILE = "capabilities.json"
+
+# Опции yt-dlp для загрузки с конвертацией в MP3 (нужен ffmpeg)
+_YT_DLP_OPTIONS_MP3 = {
+    'format': 'bestaudio/best',
+    'outtmpl': '%(title)s',  # Без расширения, FFmpeg добавит .mp3
+    'postprocessors': [{
+        'key': 'FFmpegExtractAudio',
+        'preferredcodec': 'mp3',
+        'preferredquality': '192',
+    }],
+    'writeinfojson': False,
+    'writesubtitles': False,
+    'writeautomaticsub': False,
+    'ignoreerrors': True,
+}
+
+# Без ffmpeg - скачиваем лучший доступный аудио формат
+_YT_DLP_OPTIONS_NATIVE = {
+    'format': 'bestaudio[ext=m4a]/bestaudio[ext=webm]/bestaudio',
+    'outtmpl': '%(title)s.%(ext)s',
+    'writeinfojson': False,
+    'writesubtitles': False,
+    'writeautomaticsub': False,
+    'ignoreerrors': True,
+}
+
+_capabilities = None
+
+
+def get_capabilities() -> dict:
+    """Возможности ffmpeg (определяются при первом обращении, см. capabilities.probe_ffmpeg)"""
+    global _capabilities
+    if _capabilities is None:
+        from capabilities import probe_ffmpeg
+        _capabilities = probe_ffmpeg(CAPABILITIES_CACHE_FILE)
+    return _capabilities
+
+
+def __getattr__(name: str):
+    """
+    FFMPEG_AVAILABLE и YT_DLP_OPTIONS вычисляются при первом обращении,
+    чтобы команды, которым не нужен ffmpeg, не тратили время на его поиск
+    """
+    if name == "FFMPEG_AVAILABLE":
+        from capabilities import has_mp3_encoder
+        return has_mp3_encoder(get_capabilities())
+    if name == "YT_DLP_OPTIONS":
+        # Настройки yt-dlp с автоматической адаптацией
+        return dict(_YT_DLP_OPTIONS_MP3 if __getattr__("FFMPEG_AVAILABLE") else _YT_DLP_OPTIONS_NATIVE)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
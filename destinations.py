@@ -0,0 +1,38 @@
+"""
+Вспомогательные функции для работы с SMB назначениями плейлистов
+"""
+from typing import List, Dict, Any
+
+
+def get_smb_configs(playlist_config: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Получить список SMB назначений плейлиста
+
+    Параметр smb_config может быть словарем (одно назначение)
+    или списком словарей (основной сервер и зеркала).
+
+    Args:
+        playlist_config: Конфигурация плейлиста
+
+    Returns:
+        Список конфигураций SMB в порядке объявления
+    """
+    smb_config = playlist_config.get("smb_config", [])
+    if isinstance(smb_config, dict):
+        return [smb_config]
+    return list(smb_config)
+
+
+def destination_key(smb_config: Dict[str, Any], folder_path: str) -> str:
+    """
+    Сформировать ключ назначения для учета доставки файлов
+
+    Args:
+        smb_config: Конфигурация SMB (server, share, ...)
+        folder_path: Путь к папке на SMB сервере
+
+    Returns:
+        Строка вида "SERVER/share/folder"
+    """
+    folder = folder_path.replace('\\', '/').strip('/')
+    return f"{smb_config['server']}/{smb_config['share']}/{folder}"
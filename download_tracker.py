@@ -3,7 +3,8 @@
 """
 import json
 import os
-from typing import List, Dict, Any
+import threading
+from typing import List, Dict, Any, Optional
 from interfaces import IDownloadTracker, ILogger
 
 
@@ -13,6 +14,7 @@ class JsonDownloadTracker(IDownloadTracker):
     def __init__(self, archive_file: str, logger: ILogger):
         self.archive_file = archive_file
         self.logger = logger
+        self._lock = threading.RLock()
         self._downloaded_data = self._load_archive()
     
     def _load_archive(self) -> Dict[str, Any]:
@@ -33,8 +35,12 @@ class JsonDownloadTracker(IDownloadTracker):
     def _save_archive(self) -> None:
         """Сохранить архив загруженных файлов"""
         try:
-            with open(self.archive_file, 'w', encoding='utf-8') as f:
+            # Пишем во временный файл и атомарно заменяем архив,
+            # чтобы сбой во время записи не повредил его
+            tmp_file = f"{self.archive_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
                 json.dump(self._downloaded_data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, self.archive_file)
             self.logger.info(f"Архив сохранен в {self.archive_file}")
         except IOError as e:
             self.logger.error(f"Ошибка при сохранении архива: {e}")
@@ -45,19 +51,142 @@ class JsonDownloadTracker(IDownloadTracker):
     
     def mark_as_downloaded(self, video_id: str, file_path: str) -> None:
         """Отметить файл как загруженный"""
-        if "downloaded" not in self._downloaded_data:
-            self._downloaded_data["downloaded"] = {}
-        
-        self._downloaded_data["downloaded"][video_id] = {
-            "file_path": file_path,
-            "download_date": str(datetime.now())
-        }
-        self._save_archive()
+        with self._lock:
+            if "downloaded" not in self._downloaded_data:
+                self._downloaded_data["downloaded"] = {}
+            
+            self._downloaded_data["downloaded"][video_id] = {
+                "file_path": file_path,
+                "download_date": str(datetime.now())
+            }
+            self._save_archive()
         self.logger.info(f"Файл {video_id} отмечен как загруженный")
     
     def get_downloaded_list(self) -> List[str]:
         """Получить список загруженных файлов"""
         return list(self._downloaded_data.get("downloaded", {}).keys())
+    
+    def is_delivered(self, video_id: str, destination: str) -> bool:
+        """
+        Проверить, был ли файл доставлен в указанное назначение
+        
+        Записи, созданные до учета назначений, не содержат поля destinations
+        и считаются доставленными во все назначения.
+        """
+        with self._lock:
+            record = self._downloaded_data.get("downloaded", {}).get(video_id)
+            if record is None:
+                return False
+            destinations = record.get("destinations")
+            if destinations is None:
+                return True
+            return destination in destinations
+    
+    def mark_delivered(self, video_id: str, destination: str, remote_filename: str, size: int) -> None:
+        """
+        Отметить файл как доставленный в указанное назначение
+        
+        Args:
+            video_id: ID видео
+            destination: Ключ назначения (см. destinations.destination_key)
+            remote_filename: Имя файла на сервере
+            size: Размер файла в байтах
+        """
+        with self._lock:
+            downloaded = self._downloaded_data.setdefault("downloaded", {})
+            record = downloaded.setdefault(video_id, {
+                "file_path": remote_filename,
+                "download_date": str(datetime.now())
+            })
+            record.setdefault("destinations", {})[destination] = {
+                "file": remote_filename,
+                "size": size,
+                "date": str(datetime.now())
+            }
+            # Успешная доставка завершает цикл повторных попыток
+            self._downloaded_data.get("failures", {}).pop(video_id, None)
+            self._save_archive()
+        self.logger.info(f"Файл {video_id} отмечен как доставленный в {destination}")
+    
+    def get_deliveries(self, destination: str) -> Dict[str, Dict[str, Any]]:
+        """Получить доставки в назначение: ID видео -> {file, size}"""
+        with self._lock:
+            return {
+                video_id: {"file": record["destinations"][destination]["file"],
+                           "size": record["destinations"][destination].get("size", 0)}
+                for video_id, record in self._downloaded_data.get("downloaded", {}).items()
+                if destination in (record.get("destinations") or {})
+            }
+    
+    def remove_delivery(self, video_id: str, destination: str) -> None:
+        """
+        Снять отметку о доставке в назначение
+        
+        Старая запись без учета назначений превращается в запись без доставок:
+        остальные назначения подтверждаются сверкой заново.
+        """
+        with self._lock:
+            record = self._downloaded_data.get("downloaded", {}).get(video_id)
+            if record is None:
+                return
+            if record.get("destinations") is None:
+                record["destinations"] = {}
+            record["destinations"].pop(destination, None)
+            self._save_archive()
+        self.logger.info(f"Отметка о доставке {video_id} в {destination} снята")
+    
+    def get_failure(self, video_id: str) -> Optional[Dict[str, Any]]:
+        """Получить запись об ошибке видео: {state, attempts, next_retry, error}"""
+        with self._lock:
+            failure = self._downloaded_data.get("failures", {}).get(video_id)
+            return dict(failure) if failure else None
+    
+    def get_failures(self) -> Dict[str, Dict[str, Any]]:
+        """Получить все записи об ошибках: ID видео -> запись"""
+        with self._lock:
+            return {video_id: dict(failure) for video_id, failure in self._downloaded_data.get("failures", {}).items()}
+    
+    def record_failure(self, video_id: str, failure: Dict[str, Any]) -> None:
+        """Сохранить запись об ошибке видео"""
+        with self._lock:
+            self._downloaded_data.setdefault("failures", {})[video_id] = dict(failure)
+            self._save_archive()
+        self.logger.info(f"Видео {video_id}: {failure['state']}, попытка {failure['attempts']}")
+    
+    def clear_failure(self, video_id: str) -> None:
+        """Удалить запись об ошибке видео"""
+        with self._lock:
+            if self._downloaded_data.get("failures", {}).pop(video_id, None) is not None:
+                self._save_archive()
+    
+    def get_delivered_file(self, video_id: str, destination: str) -> Optional[str]:
+        """Получить имя доставленного в назначение файла"""
+        with self._lock:
+            record = self._downloaded_data.get("downloaded", {}).get(video_id)
+            if record is None:
+                return None
+            destinations = record.get("destinations")
+            if destinations is None:
+                # Старая запись: file_path указывает на временный файл с тем же именем
+                return os.path.basename(record.get("file_path", "")) or None
+            delivery = destinations.get(destination)
+            return delivery["file"] if delivery else None
+    
+    def record_content_hash(self, video_id: str, content_hash: str) -> None:
+        """Сохранить хеш декодированного звука видео"""
+        with self._lock:
+            hashes = self._downloaded_data.setdefault("content_hashes", {})
+            if hashes.get(video_id) != content_hash:
+                hashes[video_id] = content_hash
+                self._save_archive()
+    
+    def find_by_content_hash(self, content_hash: str) -> List[str]:
+        """Получить ID видео с таким же хешем звука"""
+        with self._lock:
+            return sorted(
+                video_id for video_id, value in self._downloaded_data.get("content_hashes", {}).items()
+                if value == content_hash
+            )
 
 
 # Импорт datetime для использования в классе
@@ -0,0 +1,176 @@
+"""
+Хеширование файлов и буферов для проверки целостности загрузок
+"""
+import functools
+import hashlib
+import mmap
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import BinaryIO, Callable, Optional
+
+try:
+    import xxhash
+except ImportError:  # Необязательная зависимость: без нее используется BLAKE2
+    xxhash = None
+
+ALGORITHMS = ("xxh3_128", "xxh64", "blake2b", "sha256", "md5")
+XXHASH_ALGORITHMS = ("xxh3_128", "xxh64")
+# Кандидаты "auto" без xxhash: sha256 быстрее blake2b на процессорах с
+# инструкциями SHA, blake2b - на остальных
+BUILTIN_CANDIDATES = ("blake2b", "sha256")
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+# Общий пул потоков хеширования: hashlib и xxhash отпускают GIL на больших
+# блоках, поэтому хеширование идет параллельно с чтением и записью по сети
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def resolve_algorithm(name: str = "auto") -> str:
+    """
+    Выбрать алгоритм хеширования
+
+    Args:
+        name: Имя из ALGORITHMS или "auto" (xxh3_128, если установлен
+            пакет xxhash, иначе самый быстрый на этом процессоре из
+            BUILTIN_CANDIDATES)
+
+    Raises:
+        ValueError: Неизвестный или недоступный алгоритм
+    """
+    if name == "auto":
+        return "xxh3_128" if xxhash else _fastest_builtin()
+    if name not in ALGORITHMS:
+        raise ValueError(f"Неизвестный алгоритм хеширования '{name}' (доступны: auto, {', '.join(ALGORITHMS)})")
+    if name in XXHASH_ALGORITHMS and not xxhash:
+        raise ValueError(f"Для алгоритма {name} нужен пакет xxhash (pip install xxhash)")
+    return name
+
+
+@functools.lru_cache(maxsize=None)
+def _fastest_builtin() -> str:
+    """Выбрать самый быстрый из BUILTIN_CANDIDATES (замер один раз на процесс)"""
+    sample = bytes(1024 * 1024)
+    timings = {}
+    for name in BUILTIN_CANDIDATES:
+        started = time.perf_counter()
+        for _ in range(4):
+            hashlib.new(name, sample).digest()
+        timings[name] = time.perf_counter() - started
+    return min(timings, key=timings.get)
+
+
+def new_hasher(algorithm: str = "auto"):
+    """Новый объект хеширования с методами update() и hexdigest()"""
+    algorithm = resolve_algorithm(algorithm)
+    if algorithm in XXHASH_ALGORITHMS:
+        return getattr(xxhash, algorithm)()
+    return hashlib.new(algorithm)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=min(4, os.cpu_count() or 1), thread_name_prefix="hash"
+            )
+        return _executor
+
+
+def hash_bytes(data: bytes, algorithm: str = "auto") -> str:
+    """Хеш буфера в памяти"""
+    hasher = new_hasher(algorithm)
+    hasher.update(data)
+    return hasher.hexdigest()
+
+
+def submit_hash_bytes(data: bytes, algorithm: str = "auto") -> "Future[str]":
+    """Вычислить хеш буфера в пуле хеширования (результат - через Future)"""
+    return _get_executor().submit(hash_bytes, data, algorithm)
+
+
+def hash_file(path: str, algorithm: str = "auto", chunk_size: int = DEFAULT_CHUNK_SIZE) -> str:
+    """
+    Хеш локального файла
+
+    Файл отображается в память (mmap), поэтому данные не копируются
+    в промежуточные буферы Python.
+    """
+    hasher = new_hasher(algorithm)
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return hasher.hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                for offset in range(0, len(view), chunk_size):
+                    hasher.update(view[offset:offset + chunk_size])
+            finally:
+                view.release()
+    return hasher.hexdigest()
+
+
+def submit_hash_file(path: str, algorithm: str = "auto", chunk_size: int = DEFAULT_CHUNK_SIZE) -> "Future[str]":
+    """Вычислить хеш локального файла в пуле хеширования (результат - через Future)"""
+    return _get_executor().submit(hash_file, path, algorithm, chunk_size)
+
+
+def hash_stream(
+    stream: BinaryIO,
+    algorithm: str = "auto",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    on_progress: Optional[Callable[[int], None]] = None
+) -> str:
+    """
+    Хеш потока (например, файла на SMB сервере)
+
+    Чтение выполняется через readinto в два заранее выделенных буфера:
+    пока пул хеширования обрабатывает один блок, в другой читается
+    следующий, так что чтение по сети и хеширование идут параллельно.
+
+    Args:
+        stream: Открытый на чтение бинарный поток
+        algorithm: Алгоритм хеширования
+        chunk_size: Размер блока чтения
+        on_progress: Вызывается после каждого блока с числом прочитанных байт
+
+    Returns:
+        Хеш содержимого потока
+    """
+    hasher = new_hasher(algorithm)
+    readinto = getattr(stream, "readinto", None)
+    if readinto is None:
+        total_read = 0
+        for chunk in iter(lambda: stream.read(chunk_size), b""):
+            hasher.update(chunk)
+            total_read += len(chunk)
+            if on_progress:
+                on_progress(total_read)
+        return hasher.hexdigest()
+
+    executor = _get_executor()
+    buffers = [memoryview(bytearray(chunk_size)), memoryview(bytearray(chunk_size))]
+    pending: Optional[Future] = None
+    total_read = 0
+    current = 0
+    try:
+        while True:
+            read = readinto(buffers[current])
+            if not read:
+                break
+            total_read += read
+            # Блок обновляет хеш только после предыдущего: порядок сохраняется
+            if pending is not None:
+                pending.result()
+            pending = executor.submit(hasher.update, buffers[current][:read])
+            current = 1 - current
+            if on_progress:
+                on_progress(total_read)
+    finally:
+        if pending is not None:
+            pending.result()
+    return hasher.hexdigest()
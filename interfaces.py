@@ -2,7 +2,13 @@
 Абстрактные интерфейсы для соблюдения принципов SOLID
 """
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Optional, Tuple
+
+# Состояния видео относительно назначений плейлиста
+STATE_PENDING = "pending"
+STATE_FAILED_TRANSIENT = "failed-transient"
+STATE_FAILED_PERMANENT = "failed-permanent"
+STATE_DELIVERED = "delivered"
 
 
 class IPlaylistExtractor(ABC):
@@ -31,15 +37,108 @@ class IDownloadTracker(ABC):
     def get_downloaded_list(self) -> List[str]:
         """Получить список загруженных файлов"""
         pass
+    
+    @abstractmethod
+    def is_delivered(self, video_id: str, destination: str) -> bool:
+        """Проверить, был ли файл доставлен в указанное назначение"""
+        pass
+    
+    @abstractmethod
+    def mark_delivered(self, video_id: str, destination: str, remote_filename: str, size: int) -> None:
+        """Отметить файл как доставленный в указанное назначение"""
+        pass
+    
+    @abstractmethod
+    def get_delivered_file(self, video_id: str, destination: str) -> Optional[str]:
+        """Получить имя доставленного в назначение файла"""
+        pass
+    
+    @abstractmethod
+    def get_deliveries(self, destination: str) -> Dict[str, Dict[str, Any]]:
+        """Получить доставки в назначение: ID видео -> {file, size}"""
+        pass
+    
+    @abstractmethod
+    def remove_delivery(self, video_id: str, destination: str) -> None:
+        """Снять отметку о доставке в назначение (файл будет загружен повторно)"""
+        pass
+    
+    @abstractmethod
+    def get_failure(self, video_id: str) -> Optional[Dict[str, Any]]:
+        """Получить запись об ошибке видео: {state, attempts, next_retry, error}"""
+        pass
+    
+    @abstractmethod
+    def get_failures(self) -> Dict[str, Dict[str, Any]]:
+        """Получить все записи об ошибках: ID видео -> запись"""
+        pass
+    
+    @abstractmethod
+    def record_failure(self, video_id: str, failure: Dict[str, Any]) -> None:
+        """Сохранить запись об ошибке видео (см. video_state.RetryPolicy)"""
+        pass
+    
+    @abstractmethod
+    def clear_failure(self, video_id: str) -> None:
+        """Удалить запись об ошибке видео"""
+        pass
+    
+    def record_content_hash(self, video_id: str, content_hash: str) -> None:
+        """Сохранить хеш декодированного звука видео (реализации с поиском дубликатов)"""
+        pass
+    
+    def find_by_content_hash(self, content_hash: str) -> List[str]:
+        """Получить ID видео с таким же хешем звука"""
+        return []
+    
+    def get_video_state(self, video_id: str, destinations: List[str]) -> str:
+        """Получить состояние видео относительно назначений (STATE_*)"""
+        if all(self.is_delivered(video_id, destination) for destination in destinations):
+            return STATE_DELIVERED
+        failure = self.get_failure(video_id)
+        return failure["state"] if failure else STATE_PENDING
+    
+    def flush(self) -> None:
+        """Сохранить отложенные изменения (реализации с пакетной записью)"""
+        pass
+    
+    def close(self) -> None:
+        """Сохранить изменения и освободить ресурсы трекера"""
+        self.flush()
 
 
 class IAudioDownloader(ABC):
     """Интерфейс для загрузки аудио"""
     
     @abstractmethod
-    def download_audio(self, video_url: str, output_path: str) -> str:
-        """Загрузить аудио файл"""
+    def download_audio(
+        self, video_url: str, output_path: str, performance: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """Загрузить аудио файл (performance - профиль плейлиста, см. profiles.py)"""
         pass
+    
+    def download_audio_data(
+        self,
+        video_url: str,
+        max_bytes: int,
+        performance: Optional[Dict[str, Any]] = None,
+        duration: Optional[float] = None,
+        spool_dir: Optional[str] = None
+    ) -> Optional[Tuple[bytes, str]]:
+        """
+        Загрузить трек не больше max_bytes в память: (данные, расширение)
+
+        None без ошибки (get_last_error) - трек нужно загрузить на диск через download_audio
+        """
+        return None
+    
+    def get_last_error(self) -> Optional[Dict[str, Any]]:
+        """Получить ошибку последней загрузки в текущем потоке: {error, permanent} или None"""
+        return None
+    
+    def get_content_hash(self) -> Optional[str]:
+        """Получить хеш декодированного звука последней загрузки в текущем потоке (None - не вычислялся)"""
+        return None
 
 
 class IFileUploader(ABC):
@@ -61,6 +160,128 @@ class IFileUploader(ABC):
         pass
 
 
+class IMirroredFileUploader(IFileUploader):
+    """Интерфейс для загрузки одного файла сразу в несколько назначений"""
+    
+    @abstractmethod
+    def get_destinations(self) -> List[str]:
+        """Получить ключи подключенных назначений"""
+        pass
+    
+    @abstractmethod
+    def upload_to_destinations(
+        self,
+        local_path: str,
+        remote_filename: str,
+        destinations: List[str],
+        on_result: Optional[Callable[[str, bool, int], None]] = None
+    ) -> int:
+        """
+        Поставить файл в очередь загрузки в указанные назначения
+
+        Файл должен быть прочитан до возврата из метода: вызывающий код
+        удаляет его сразу после вызова.
+        """
+        pass
+    
+    @abstractmethod
+    def upload_data_to_destinations(
+        self,
+        data: bytes,
+        remote_filename: str,
+        destinations: List[str],
+        on_result: Optional[Callable[[str, bool, int], None]] = None
+    ) -> int:
+        """
+        Поставить в очередь загрузки данные из памяти
+
+        Реализация держит ссылку на data, пока загрузка во все назначения
+        не завершится.
+        """
+        pass
+    
+    @abstractmethod
+    def wait_for_uploads(self) -> None:
+        """Дождаться завершения всех поставленных в очередь загрузок"""
+        pass
+    
+    def rename_file(self, destination: str, old_name: str, new_name: str) -> bool:
+        """Переименовать файл в назначении на сервере (False - не поддерживается или ошибка)"""
+        return False
+    
+    def remove_files(self, destination: str, names: List[str], trash_folder: Optional[str] = None) -> List[str]:
+        """
+        Удалить файлы из назначения или перенести их в папку корзины trash_folder
+
+        Returns:
+            Имена удаленных (перенесенных) файлов; пустой список - не поддерживается
+        """
+        return []
+
+
+class IJobQueue(ABC):
+    """
+    Интерфейс общей очереди заданий для нескольких узлов
+
+    Задание - доставка одного видео в одно назначение. Узел берет задания
+    в аренду (lease) на ограниченное время и продлевает ее, пока работает;
+    задания узла, который упал и перестал продлевать аренду, по истечении
+    срока снова выдаются другим узлам.
+    """
+    
+    @abstractmethod
+    def enqueue(self, jobs: List[Dict[str, Any]]) -> int:
+        """
+        Добавить задания {video, destination, name}
+
+        Незавершенные задания не дублируются; завершенные и уже учтенные
+        координатором задания возвращаются в очередь.
+
+        Returns:
+            Количество добавленных заданий
+        """
+        pass
+    
+    @abstractmethod
+    def claim(self, worker_id: str, max_videos: int, lease_seconds: float) -> List[Dict[str, Any]]:
+        """Взять в аренду задания не более чем max_videos видео (все назначения видео вместе)"""
+        pass
+    
+    @abstractmethod
+    def renew(self, worker_id: str, job_ids: List[str], lease_seconds: float) -> int:
+        """Продлить действующую аренду заданий узла; возвращает количество продленных"""
+        pass
+    
+    @abstractmethod
+    def complete(self, worker_id: str, job_id: str, remote_file: str, size: int) -> bool:
+        """
+        Отметить задание выполненным
+
+        Результат принимается, только пока аренда узла действует: задание,
+        переданное другому узлу, остается за ним. Returns: принят ли результат
+        """
+        pass
+    
+    @abstractmethod
+    def fail(self, worker_id: str, job_id: str, error: str, permanent: bool = False, stage: str = "download") -> bool:
+        """Вернуть задание в очередь после ошибки (или отметить неудачным); как complete, только по действующей аренде"""
+        pass
+    
+    @abstractmethod
+    def collect_results(self) -> List[Dict[str, Any]]:
+        """Получить завершенные задания, еще не учтенные координатором, и отметить их учтенными"""
+        pass
+    
+    @abstractmethod
+    def counts(self) -> Dict[str, int]:
+        """Количество заданий по состояниям"""
+        pass
+    
+    def close(self) -> None:
+        """Освободить ресурсы очереди"""
+        pass
+
+
 class ILogger(ABC):
     """Интерфейс для логирования"""
     
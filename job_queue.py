@@ -0,0 +1,325 @@
+"""
+Общая очередь заданий (видео × назначение) с арендой для работы на нескольких узлах
+"""
+import json
+import pathlib
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List
+
+from interfaces import IJobQueue, ILogger
+
+JOB_PENDING = "pending"
+JOB_LEASED = "leased"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_STATES = (JOB_PENDING, JOB_LEASED, JOB_DONE, JOB_FAILED)
+
+# Ошибка заданий, аренда которых истекала слишком много раз (узел падает на них)
+LEASE_EXHAUSTED_ERROR = "Аренда истекла, попытки исчерпаны"
+
+
+def job_id_for(video_id: str, destination: str) -> str:
+    """Ключ задания"""
+    return f"{video_id}|{destination}"
+
+
+class SqliteJobQueue(IJobQueue):
+    """
+    Очередь заданий в базе SQLite на общем хранилище.
+
+    Выдача заданий выполняется в транзакции BEGIN IMMEDIATE, поэтому одно
+    задание не достается двум узлам. База использует обычный журнал
+    (не WAL): WAL требует общей памяти и не работает на сетевых дисках.
+    Блокировка SQLite надежна на локальном диске и на большинстве шар SMB;
+    на NFS без поддержки блокировок базу лучше держать на узле координатора.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            seq INTEGER PRIMARY KEY,
+            job_id TEXT NOT NULL UNIQUE,
+            video_id TEXT NOT NULL,
+            destination TEXT NOT NULL,
+            video TEXT NOT NULL,
+            name TEXT NOT NULL,
+            state TEXT NOT NULL,
+            worker TEXT,
+            lease_expires REAL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            error TEXT NOT NULL DEFAULT '',
+            permanent INTEGER NOT NULL DEFAULT 0,
+            stage TEXT NOT NULL DEFAULT '',
+            remote_file TEXT,
+            size INTEGER,
+            imported INTEGER NOT NULL DEFAULT 0,
+            updated REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state, video_id);
+    """
+
+    # Условие действующей аренды узла (параметры: worker_id, текущее время)
+    HELD = "state = 'leased' AND worker = ? AND lease_expires >= ?"
+
+    COLUMNS = ("job_id", "video_id", "destination", "video", "name", "state", "worker", "lease_expires",
+               "attempts", "error", "permanent", "stage", "remote_file", "size")
+
+    def __init__(self, db_file: str, logger: ILogger, max_attempts: int = 3, read_only: bool = False):
+        """
+        Args:
+            db_file: Путь к базе (на общем хранилище, доступном всем узлам)
+            logger: Логгер
+            max_attempts: Сколько раз задание выдается, прежде чем считается неудачным
+            read_only: Только чтение существующей базы (команда status): режим
+                журнала и схема не меняются; файла нет - sqlite3.OperationalError
+        """
+        self.db_file = db_file
+        self.logger = logger
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        # Транзакции управляются явно (isolation_level=None)
+        if read_only:
+            uri = f"{pathlib.Path(db_file).resolve().as_uri()}?mode=ro"
+            self._connection = sqlite3.connect(
+                uri, uri=True, timeout=60, check_same_thread=False, isolation_level=None
+            )
+            return
+        self._connection = sqlite3.connect(db_file, timeout=60, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=DELETE")
+        self._connection.executescript(self.SCHEMA)
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._connection
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
+
+    def _row_to_job(self, row) -> Dict[str, Any]:
+        job = dict(zip(self.COLUMNS, row))
+        job["video"] = json.loads(job["video"])
+        job["permanent"] = bool(job["permanent"])
+        return job
+
+    def enqueue(self, jobs: List[Dict[str, Any]]) -> int:
+        now = time.time()
+        with self._transaction() as connection:
+            before = connection.total_changes
+            connection.executemany(
+                """
+                INSERT INTO jobs (job_id, video_id, destination, video, name, state, updated)
+                VALUES (?, ?, ?, ?, ?, 'pending', ?)
+                ON CONFLICT (job_id) DO UPDATE SET
+                    state = 'pending', video = excluded.video, name = excluded.name, worker = NULL,
+                    lease_expires = NULL, attempts = 0, error = '', permanent = 0, stage = '',
+                    remote_file = NULL, size = NULL, imported = 0, updated = excluded.updated
+                WHERE jobs.imported = 1
+                """,
+                [
+                    (job_id_for(job["video"]["id"], job["destination"]), job["video"]["id"], job["destination"],
+                     json.dumps(job["video"], ensure_ascii=False), job["name"], now)
+                    for job in jobs
+                ]
+            )
+            return connection.total_changes - before
+
+    def claim(self, worker_id: str, max_videos: int, lease_seconds: float) -> List[Dict[str, Any]]:
+        now = time.time()
+        with self._transaction() as connection:
+            # Задания, на которых узлы падали max_attempts раз, больше не выдаются
+            connection.execute(
+                "UPDATE jobs SET state = 'failed', error = ?, stage = 'lease', worker = NULL, updated = ? "
+                "WHERE state = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (LEASE_EXHAUSTED_ERROR, now, now, self.max_attempts)
+            )
+            video_ids = [row[0] for row in connection.execute(
+                "SELECT video_id FROM jobs WHERE state = 'pending' OR (state = 'leased' AND lease_expires < ?) "
+                "GROUP BY video_id ORDER BY MIN(seq) LIMIT ?",
+                (now, max_videos)
+            )]
+            if not video_ids:
+                return []
+            placeholders = ",".join("?" * len(video_ids))
+            connection.execute(
+                f"UPDATE jobs SET state = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1, "
+                f"updated = ? WHERE video_id IN ({placeholders}) "
+                f"AND (state = 'pending' OR (state = 'leased' AND lease_expires < ?))",
+                [worker_id, now + lease_seconds, now] + video_ids + [now]
+            )
+            rows = connection.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM jobs "
+                f"WHERE worker = ? AND state = 'leased' AND video_id IN ({placeholders}) ORDER BY seq",
+                [worker_id] + video_ids
+            ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def renew(self, worker_id: str, job_ids: List[str], lease_seconds: float) -> int:
+        if not job_ids:
+            return 0
+        now = time.time()
+        placeholders = ",".join("?" * len(job_ids))
+        with self._transaction() as connection:
+            return connection.execute(
+                f"UPDATE jobs SET lease_expires = ?, updated = ? "
+                f"WHERE {self.HELD} AND job_id IN ({placeholders})",
+                [now + lease_seconds, now, worker_id, now] + list(job_ids)
+            ).rowcount
+
+    def complete(self, worker_id: str, job_id: str, remote_file: str, size: int) -> bool:
+        now = time.time()
+        with self._transaction() as connection:
+            return connection.execute(
+                f"UPDATE jobs SET state = 'done', remote_file = ?, size = ?, worker = NULL, lease_expires = NULL, "
+                f"error = '', updated = ? WHERE job_id = ? AND {self.HELD}",
+                (remote_file, size, now, job_id, worker_id, now)
+            ).rowcount > 0
+
+    def fail(self, worker_id: str, job_id: str, error: str, permanent: bool = False, stage: str = "download") -> bool:
+        now = time.time()
+        with self._transaction() as connection:
+            return connection.execute(
+                f"UPDATE jobs SET state = CASE WHEN ? OR attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                f"error = ?, permanent = ?, stage = ?, worker = NULL, lease_expires = NULL, updated = ? "
+                f"WHERE job_id = ? AND {self.HELD}",
+                (int(permanent), self.max_attempts, error, int(permanent), stage, now, job_id, worker_id, now)
+            ).rowcount > 0
+
+    def collect_results(self) -> List[Dict[str, Any]]:
+        with self._transaction() as connection:
+            rows = connection.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM jobs "
+                f"WHERE state IN ('done', 'failed') AND imported = 0 ORDER BY seq"
+            ).fetchall()
+            connection.execute("UPDATE jobs SET imported = 1 WHERE state IN ('done', 'failed') AND imported = 0")
+        return [self._row_to_job(row) for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._connection.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        counts = {state: 0 for state in JOB_STATES}
+        counts.update(dict(rows))
+        return counts
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+class MemoryJobQueue(IJobQueue):
+    """
+    Очередь заданий в памяти процесса с той же логикой аренды.
+
+    Заменяет общую базу, когда все узлы - потоки одного процесса
+    (бенчмарки, проверки).
+    """
+
+    def __init__(self, max_attempts: int = 3, clock=time.time):
+        self.max_attempts = max_attempts
+        self._clock = clock
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _public(job: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: value for key, value in job.items() if key != "imported"}
+
+    @staticmethod
+    def _held(job: Dict[str, Any], worker_id: str, now: float) -> bool:
+        """Действует ли аренда задания узлом worker_id"""
+        return job["state"] == JOB_LEASED and job["worker"] == worker_id and job["lease_expires"] >= now
+
+    def enqueue(self, jobs: List[Dict[str, Any]]) -> int:
+        added = 0
+        with self._lock:
+            for job in jobs:
+                job_id = job_id_for(job["video"]["id"], job["destination"])
+                existing = self._jobs.get(job_id)
+                if existing is not None and not existing["imported"]:
+                    continue
+                # Новое задание встает в конец очереди (как seq в SQLite)
+                self._jobs.pop(job_id, None)
+                self._jobs[job_id] = {
+                    "job_id": job_id, "video_id": job["video"]["id"], "destination": job["destination"],
+                    "video": dict(job["video"]), "name": job["name"], "state": JOB_PENDING, "worker": None,
+                    "lease_expires": None, "attempts": 0, "error": "", "permanent": False, "stage": "",
+                    "remote_file": None, "size": None, "imported": False,
+                }
+                added += 1
+        return added
+
+    def claim(self, worker_id: str, max_videos: int, lease_seconds: float) -> List[Dict[str, Any]]:
+        now = self._clock()
+        with self._lock:
+            available = []
+            for job in self._jobs.values():
+                expired = job["state"] == JOB_LEASED and job["lease_expires"] < now
+                if expired and job["attempts"] >= self.max_attempts:
+                    job.update(state=JOB_FAILED, error=LEASE_EXHAUSTED_ERROR, stage="lease", worker=None)
+                elif job["state"] == JOB_PENDING or expired:
+                    available.append(job)
+            video_ids = []
+            for job in available:
+                if job["video_id"] not in video_ids:
+                    video_ids.append(job["video_id"])
+            video_ids = set(video_ids[:max_videos])
+            claimed = []
+            for job in available:
+                if job["video_id"] in video_ids:
+                    job.update(state=JOB_LEASED, worker=worker_id, lease_expires=now + lease_seconds,
+                               attempts=job["attempts"] + 1)
+                    claimed.append(self._public(job))
+        return claimed
+
+    def renew(self, worker_id: str, job_ids: List[str], lease_seconds: float) -> int:
+        now = self._clock()
+        renewed = 0
+        with self._lock:
+            for job_id in job_ids:
+                job = self._jobs.get(job_id)
+                if job and self._held(job, worker_id, now):
+                    job["lease_expires"] = now + lease_seconds
+                    renewed += 1
+        return renewed
+
+    def complete(self, worker_id: str, job_id: str, remote_file: str, size: int) -> bool:
+        now = self._clock()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job or not self._held(job, worker_id, now):
+                return False
+            job.update(state=JOB_DONE, remote_file=remote_file, size=size, worker=None,
+                       lease_expires=None, error="")
+            return True
+
+    def fail(self, worker_id: str, job_id: str, error: str, permanent: bool = False, stage: str = "download") -> bool:
+        now = self._clock()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job or not self._held(job, worker_id, now):
+                return False
+            failed = permanent or job["attempts"] >= self.max_attempts
+            job.update(state=JOB_FAILED if failed else JOB_PENDING, error=error, permanent=permanent,
+                       stage=stage, worker=None, lease_expires=None)
+            return True
+
+    def collect_results(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            results = []
+            for job in self._jobs.values():
+                if job["state"] in (JOB_DONE, JOB_FAILED) and not job["imported"]:
+                    job["imported"] = True
+                    results.append(self._public(job))
+        return results
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            counts = {state: 0 for state in JOB_STATES}
+            for job in self._jobs.values():
+                counts[job["state"]] += 1
+        return counts
@@ -1,21 +1,41 @@
 """
 Реализация логгера для приложения
 """
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
 from datetime import datetime
+from typing import Callable, Optional
 from interfaces import ILogger
 
 
+def is_debug_enabled(logger: ILogger) -> bool:
+    """
+    Проверить, включен ли уровень DEBUG у логгера
+    
+    Горячие участки кода вызывают эту проверку до форматирования сообщения.
+    Логгеры без уровня DEBUG считаются выключенными для него.
+    """
+    check = getattr(logger, "is_debug_enabled", None)
+    return bool(check and check())
+
+
 class ConsoleLogger(ILogger):
     """Простой консольный логгер"""
     
-    def __init__(self, name: str = "YouTubeMP3Downloader"):
+    def __init__(self, name: str = "YouTubeMP3Downloader", level: str = "INFO"):
         self.logger = logging.getLogger(name)
-        self.logger.setLevel(logging.INFO)
+        self.logger.setLevel(level)
         
         # Создаем обработчик для консоли
         console_handler = logging.StreamHandler()
-        console_handler.setLevel(logging.INFO)
+        console_handler.setLevel(level)
         
         # Создаем форматтер
         formatter = logging.Formatter(
@@ -27,6 +47,14 @@ class ConsoleLogger(ILogger):
         if not self.logger.handlers:
             self.logger.addHandler(console_handler)
     
+    def is_debug_enabled(self) -> bool:
+        """Включен ли уровень DEBUG"""
+        return self.logger.isEnabledFor(logging.DEBUG)
+    
+    def debug(self, message: str) -> None:
+        """Отладочное сообщение"""
+        self.logger.debug(message)
+    
     def info(self, message: str) -> None:
         """Информационное сообщение"""
         self.logger.info(message)
@@ -38,3 +66,156 @@ class ConsoleLogger(ILogger):
     def warning(self, message: str) -> None:
         """Предупреждение"""
         self.logger.warning(message)
+
+
+class JsonLineFormatter(logging.Formatter):
+    """Форматтер записей лога в JSON (одна запись на строку)"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            # Трейсбек, отформатированный до очереди (см. ExceptionQueueHandler)
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class ExceptionQueueHandler(logging.handlers.QueueHandler):
+    """
+    Обработчик очереди, сохраняющий трейсбек отдельно от сообщения
+    
+    Стандартный QueueHandler вклеивает трейсбек в текст сообщения и
+    обнуляет exc_info, поэтому в файле лога пропадает поле exception.
+    Здесь трейсбек форматируется до постановки в очередь (объект
+    исключения не передается в поток-слушатель) и остается в exc_text.
+    """
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
+class QueueLogger(ILogger):
+    """
+    Неблокирующий логгер.
+    
+    Вызовы логгера только помещают запись в очередь; вывод в консоль и
+    в файл (JSON строки с ротацией) выполняет отдельный поток-слушатель,
+    поэтому рабочие потоки не ждут ввода-вывода и не конкурируют за него.
+    """
+    
+    def __init__(
+        self,
+        name: str = "YouTubeMP3Downloader",
+        level: str = "INFO",
+        log_file: Optional[str] = None,
+        max_bytes: int = 10 * 1024 * 1024,
+        backup_count: int = 5
+    ):
+        """
+        Args:
+            name: Имя логгера
+            level: Уровень логирования (DEBUG, INFO, WARNING, ERROR)
+            log_file: Файл для записи JSON строк (None - только консоль)
+            max_bytes: Размер файла лога, после которого выполняется ротация
+            backup_count: Количество хранимых файлов после ротации
+        """
+        self.logger = logging.getLogger(name)
+        self.logger.setLevel(level)
+        self.logger.propagate = False
+        
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+        ))
+        handlers = [console_handler]
+        
+        if log_file:
+            os.makedirs(os.path.dirname(log_file) or ".", exist_ok=True)
+            file_handler = logging.handlers.RotatingFileHandler(
+                log_file, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+            )
+            file_handler.setFormatter(JsonLineFormatter())
+            handlers.append(file_handler)
+        
+        self._queue = queue.SimpleQueue()
+        for handler in list(self.logger.handlers):
+            self.logger.removeHandler(handler)
+        self.logger.addHandler(ExceptionQueueHandler(self._queue))
+        
+        self._listener = logging.handlers.QueueListener(self._queue, *handlers, respect_handler_level=True)
+        self._listener.start()
+        self._closed = False
+        atexit.register(self.close)
+    
+    def close(self) -> None:
+        """Дописать накопленные записи и остановить поток-слушатель"""
+        if self._closed:
+            return
+        self._closed = True
+        self._listener.stop()
+        for handler in self._listener.handlers:
+            handler.close()
+    
+    def is_debug_enabled(self) -> bool:
+        """Включен ли уровень DEBUG"""
+        return self.logger.isEnabledFor(logging.DEBUG)
+    
+    def debug(self, message: str) -> None:
+        """Отладочное сообщение"""
+        self.logger.debug(message)
+    
+    def info(self, message: str) -> None:
+        """Информационное сообщение"""
+        self.logger.info(message)
+    
+    def error(self, message: str) -> None:
+        """Сообщение об ошибке"""
+        self.logger.error(message)
+    
+    def warning(self, message: str) -> None:
+        """Предупреждение"""
+        self.logger.warning(message)
+
+
+class ProgressLogger:
+    """
+    Логирование прогресса не чаще одного раза за интервал.
+    
+    Сообщение формируется функцией только в момент вывода, поэтому
+    частые вызовы update() в цикле чтения почти ничего не стоят.
+    """
+    
+    def __init__(self, logger: ILogger, interval: float = 5.0):
+        """
+        Args:
+            logger: Логгер
+            interval: Минимальный интервал между сообщениями (секунды)
+        """
+        self.logger = logger
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._last = time.monotonic()
+    
+    def update(self, message: Callable[[], str]) -> None:
+        """Вывести сообщение о прогрессе, если интервал истек"""
+        now = time.monotonic()
+        if now - self._last < self.interval:
+            return
+        with self._lock:
+            if now - self._last < self.interval:
+                return
+            self._last = now
+        self.logger.info(message())
@@ -2,7 +2,8 @@
 Менеджер для создания и управления M3U плейлистами
 """
 import os
-from typing import List, Optional
+import hashlib
+from typing import List, Dict, Any, Optional, Union
 import smbclient
 from interfaces import ILogger
 
@@ -45,6 +46,8 @@ class M3UPlaylistManager:
             
             # Получаем список MP3 файлов в папке
             mp3_files = self._get_mp3_files_from_smb(folder_full_path)
+            if mp3_files is None:
+                return False
             
             if not mp3_files:
                 self.logger.warning(f"Не найдено MP3 файлов в папке {folder_path}")
@@ -71,7 +74,91 @@ class M3UPlaylistManager:
             self.logger.error(f"Ошибка при создании M3U плейлиста: {e}")
             return False
     
-    def _get_mp3_files_from_smb(self, folder_path: str) -> List[str]:
+    def write_m3u_playlist(
+        self,
+        smb_config: dict,
+        folder_path: str,
+        playlist_name: str,
+        tracks: List[Dict[str, Any]],
+        previous_hash: Optional[str] = None,
+        create_folder: bool = False
+    ) -> Optional[str]:
+        """
+        Записать M3U плейлист из готового списка треков, если он изменился
+        
+        Файл перезаписывается только при изменении хеша содержимого.
+        Запись атомарная: сначала пишется временный файл, который затем
+        заменяет существующий плейлист.
+        
+        Args:
+            smb_config: Конфигурация SMB (server, share, username, password, domain)
+            folder_path: Путь к папке плейлиста на SMB сервере
+            playlist_name: Имя M3U файла плейлиста
+            tracks: Треки (file, title, duration) в порядке воспроизведения
+            previous_hash: Хеш последнего записанного содержимого
+            create_folder: Создать папку плейлиста, если она не существует
+            
+        Returns:
+            Хеш актуального содержимого или None в случае ошибки
+        """
+        m3u_content = self._generate_m3u_content(tracks)
+        content_hash = hashlib.sha1(m3u_content.encode('utf-8')).hexdigest()
+        
+        if content_hash == previous_hash:
+            self.logger.info(f"M3U плейлист не изменился, пропускаем запись: {playlist_name}")
+            return content_hash
+        
+        try:
+            folder_full_path = self._connect(smb_config, folder_path)
+            if create_folder:
+                smbclient.makedirs(folder_full_path, exist_ok=True)
+            playlist_full_path = os.path.join(folder_full_path, playlist_name).replace('/', '\\')
+            tmp_full_path = f"{playlist_full_path}.tmp"
+            
+            with smbclient.open_file(tmp_full_path, mode='w', encoding='utf-8') as f:
+                f.write(m3u_content)
+            smbclient.replace(tmp_full_path, playlist_full_path)
+            
+            self.logger.info(f"M3U плейлист обновлен ({len(tracks)} треков): {playlist_full_path}")
+            return content_hash
+            
+        except Exception as e:
+            self.logger.error(f"Ошибка при записи M3U плейлиста: {e}")
+            return None
+    
+    def list_mp3_files(self, smb_config: dict, folder_path: str) -> Optional[List[str]]:
+        """
+        Получить список MP3 файлов в папке плейлиста на SMB сервере
+        
+        Args:
+            smb_config: Конфигурация SMB (server, share, username, password, domain)
+            folder_path: Путь к папке на SMB сервере
+            
+        Returns:
+            Список имен MP3 файлов или None, если папку не удалось прочитать
+        """
+        try:
+            return self._get_mp3_files_from_smb(self._connect(smb_config, folder_path))
+        except Exception as e:
+            self.logger.error(f"Ошибка при получении списка MP3 файлов: {e}")
+            return None
+    
+    def _connect(self, smb_config: dict, folder_path: str) -> str:
+        """
+        Настроить учетные данные SMB и получить полный путь к папке
+        
+        Returns:
+            Полный UNC путь к папке
+        """
+        username = smb_config['username']
+        if smb_config.get('domain'):
+            username = f"{smb_config['domain']}\\{username}"
+        smbclient.register_session(smb_config['server'], username=username, password=smb_config['password'])
+        
+        base_path = f"\\\\{smb_config['server']}\\{smb_config['share']}"
+        return os.path.join(base_path, folder_path).replace('/', '\\')
+    
+    def _get_mp3_files_from_smb(self, folder_path: str) -> Optional[List[str]]:
         """
         Получить список MP3 файлов из папки на SMB сервере
         
@@ -79,7 +166,7 @@ class M3UPlaylistManager:
             folder_path: Полный путь к папке на SMB сервере
             
         Returns:
-            Список имен MP3 файлов
+            Список имен MP3 файлов или None при ошибке (пустая папка - пустой список)
         """
         try:
             files = smbclient.listdir(folder_path)
@@ -92,7 +179,7 @@ class M3UPlaylistManager:
             
         except Exception as e:
             self.logger.error(f"Ошибка при получении списка MP3 файлов: {e}")
-            return []
+            return None
     
     def _playlist_exists(self, playlist_path: str) -> bool:
         """
@@ -109,21 +196,26 @@ class M3UPlaylistManager:
         except Exception:
             return False
     
-    def _generate_m3u_content(self, mp3_files: List[str]) -> str:
+    def _generate_m3u_content(self, tracks: List[Union[str, Dict[str, Any]]]) -> str:
         """
         Сгенерировать содержимое M3U плейлиста
         
         Args:
-            mp3_files: Список имен MP3 файлов
+            tracks: Имена MP3 файлов или словари с полями file, title
+                и duration (секунды, -1 если неизвестна)
             
         Returns:
             Содержимое M3U файла
         """
         lines = ["#EXTM3U"]
         
-        for mp3_file in mp3_files:
-            # Добавляем информацию о треке (можно расширить в будущем)
-            lines.append(f"#EXTINF:-1,{os.path.splitext(mp3_file)[0]}")
-            lines.append(mp3_file)
+        for track in tracks:
+            if isinstance(track, str):
+                track = {"file": track}
+            
+            title = track.get("title") or os.path.splitext(os.path.basename(track["file"]))[0]
+            duration = int(track.get("duration") or -1)
+            lines.append(f"#EXTINF:{duration},{title}")
+            lines.append(track["file"])
         
         return "\n".join(lines) + "\n"
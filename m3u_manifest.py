@@ -0,0 +1,209 @@
+"""
+Локальный манифест доставленных треков для инкрементального обновления M3U
+"""
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional
+from interfaces import ILogger
+
+
+class M3UManifest:
+    """
+    Манифест треков, доставленных в каждое назначение.
+
+    Хранит для каждого назначения (сервер/шара/папка) список треков с названием,
+    длительностью, автором, датой добавления и позицией в плейлисте YouTube,
+    а также хеш последнего записанного M3U. Позволяет строить M3U без
+    сканирования папки на сервере и служит источником для каталога треков.
+    """
+
+    def __init__(self, manifest_file: str, logger: ILogger):
+        self.manifest_file = manifest_file
+        self.logger = logger
+        self._lock = threading.RLock()
+        self._data = self._load()
+
+    def _load(self) -> Dict[str, Any]:
+        """Загрузить манифест с диска"""
+        if not os.path.exists(self.manifest_file):
+            return {"destinations": {}}
+
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            self.logger.error(f"Ошибка при загрузке манифеста M3U, будет выполнена сверка папок: {e}")
+            return {"destinations": {}}
+
+    def save(self) -> None:
+        """Сохранить манифест на диск (атомарная замена файла)"""
+        with self._lock:
+            tmp_file = f"{self.manifest_file}.tmp"
+            try:
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    json.dump(self._data, f, ensure_ascii=False)
+                os.replace(tmp_file, self.manifest_file)
+            except IOError as e:
+                self.logger.error(f"Ошибка при сохранении манифеста M3U: {e}")
+
+    def _destination(self, destination: str) -> Dict[str, Any]:
+        """Получить (или создать) запись назначения"""
+        return self._data.setdefault("destinations", {}).setdefault(destination, {"tracks": {}})
+
+    def has_destination(self, destination: str) -> bool:
+        """Проверить, известно ли назначение манифесту"""
+        with self._lock:
+            return destination in self._data.get("destinations", {})
+
+    def record_track(self, destination: str, video: Dict[str, Any], remote_filename: str) -> None:
+        """
+        Записать доставленный трек
+
+        Args:
+            destination: Ключ назначения
+            video: Информация о видео из экстрактора плейлиста
+            remote_filename: Имя файла на сервере
+        """
+        with self._lock:
+            tracks = self._destination(destination)["tracks"]
+            # Файл мог быть ранее учтен под другим ключом (например, после сверки)
+            for track_id in [key for key, track in tracks.items()
+                             if track["file"] == remote_filename and key != video['id']]:
+                del tracks[track_id]
+            previous = tracks.get(video['id'], {})
+            tracks[video['id']] = {
+                "file": remote_filename,
+                "title": video.get('title') or os.path.splitext(remote_filename)[0],
+                "duration": video.get('duration') or -1,
+                "uploader": video.get('uploader') or previous.get("uploader", ""),
+                "added": previous.get("added", datetime.now().isoformat(timespec='seconds')),
+                "position": previous.get("position", len(tracks)),
+            }
+
+    def remove_track(self, destination: str, video_id: str) -> None:
+        """Удалить трек из манифеста назначения"""
+        with self._lock:
+            self._destination(destination)["tracks"].pop(video_id, None)
+
+    def update_order(self, destination: str, videos: List[Dict[str, Any]]) -> None:
+        """
+        Обновить позиции треков по текущему порядку плейлиста YouTube
+
+        Треки, которых больше нет в плейлисте, сохраняют относительный
+        порядок и переносятся в конец.
+        """
+        with self._lock:
+            tracks = self._destination(destination)["tracks"]
+            positions = {video.get('id'): index for index, video in enumerate(videos)}
+
+            missing = sorted(
+                (track_id for track_id in tracks if track_id not in positions),
+                key=lambda track_id: tracks[track_id].get("position", 0)
+            )
+            for track_id, track in tracks.items():
+                if track_id in positions:
+                    track["position"] = positions[track_id]
+            for offset, track_id in enumerate(missing):
+                tracks[track_id]["position"] = len(videos) + offset
+
+    def get_entries(self, destination: str) -> List[Dict[str, Any]]:
+        """Получить треки назначения в порядке плейлиста"""
+        with self._lock:
+            tracks = self._data.get("destinations", {}).get(destination, {}).get("tracks", {})
+            return sorted(
+                (dict(track, id=track_id) for track_id, track in tracks.items()),
+                key=lambda track: (track.get("position", 0), track["file"])
+            )
+
+    def get_all_entries(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Получить треки всех назначений (ключ назначения -> треки)"""
+        with self._lock:
+            return {
+                destination: self.get_entries(destination)
+                for destination in self._data.get("destinations", {})
+            }
+
+    def get_m3u_hash(self, destination: str) -> Optional[str]:
+        """Получить хеш последнего записанного M3U"""
+        with self._lock:
+            return self._data.get("destinations", {}).get(destination, {}).get("m3u_hash")
+
+    def set_m3u_hash(self, destination: str, content_hash: Optional[str]) -> None:
+        """Сохранить хеш записанного M3U"""
+        with self._lock:
+            self._destination(destination)["m3u_hash"] = content_hash
+
+    def get_smart_hash(self, playlist_key: str) -> Optional[str]:
+        """Получить хеш последнего записанного смарт-плейлиста"""
+        with self._lock:
+            return self._data.get("smart_playlists", {}).get(playlist_key)
+
+    def set_smart_hash(self, playlist_key: str, content_hash: Optional[str]) -> None:
+        """Сохранить хеш записанного смарт-плейлиста"""
+        with self._lock:
+            self._data.setdefault("smart_playlists", {})[playlist_key] = content_hash
+
+    def needs_reconcile(self, destination: str, interval_days: float) -> bool:
+        """
+        Проверить, пора ли сверить манифест с содержимым папки на сервере
+
+        Сверка нужна для новых назначений и затем не чаще раза в interval_days.
+        """
+        with self._lock:
+            record = self._data.get("destinations", {}).get(destination)
+            if not record or not record.get("last_reconcile"):
+                return True
+            last_reconcile = datetime.fromisoformat(record["last_reconcile"])
+            return datetime.now() - last_reconcile >= timedelta(days=interval_days)
+
+    def reconcile(
+        self, destination: str, remote_files: Optional[List[str]], known_files: Dict[str, Dict[str, Any]]
+    ) -> bool:
+        """
+        Сверить манифест со списком файлов в папке на сервере
+
+        Если список получить не удалось (None), манифест не меняется, а срок
+        сверки не сдвигается: сверка повторится при следующем запуске.
+
+        Args:
+            destination: Ключ назначения
+            remote_files: Имена MP3 файлов в папке на сервере (None - ошибка получения списка)
+            known_files: Соответствие имени файла видео из плейлиста
+                (по данным трекера) для файлов, отсутствующих в манифесте
+
+        Returns:
+            True, если сверка выполнена
+        """
+        if remote_files is None:
+            self.logger.warning(f"Сверка манифеста {destination} пропущена: нет списка файлов на сервере")
+            return False
+
+        with self._lock:
+            record = self._destination(destination)
+            tracks = record["tracks"]
+            present = set(remote_files)
+
+            # Удаляем треки, файлов которых больше нет на сервере
+            removed = [track_id for track_id, track in tracks.items() if track["file"] not in present]
+            for track_id in removed:
+                del tracks[track_id]
+
+            # Добавляем файлы, о которых манифест не знал
+            listed = {track["file"] for track in tracks.values()}
+            added = 0
+            for remote_file in sorted(present - listed):
+                video = known_files.get(remote_file)
+                if video:
+                    self.record_track(destination, video, remote_file)
+                else:
+                    self.record_track(destination, {'id': f"file:{remote_file}"}, remote_file)
+                added += 1
+
+            record["last_reconcile"] = datetime.now().isoformat()
+            # Принудительно перезаписываем M3U после сверки
+            record["m3u_hash"] = None
+
+        self.logger.info(f"Сверка манифеста {destination}: удалено {len(removed)}, добавлено {added}")
+        return True
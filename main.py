@@ -1,39 +1,91 @@
 """
 Главный файл приложения для синхронизации MP3 из YouTube плейлиста на SMB диск
+
+Команды:
+    python main.py [sync]     - синхронизация (по умолчанию)
+    python main.py reconcile  - сверка трекера с содержимым папок на серверах
+    python main.py status     - состояние трекера и текущий прогресс (без yt-dlp и SMB)
+
+Несколько узлов (общая очередь JOB_QUEUE_FILE):
+    python main.py coordinate [--wait]  - поставить задания в очередь и учесть результаты узлов
+    python main.py worker [--follow]    - обработать задания очереди на этом узле
+
+Профилирование:
+    python main.py --profile                       - профиль всего запуска
+    python main.py --profile-stage upload          - профиль только этапа загрузки на SMB
+    python main.py --profile --profile-memory      - дополнительно отчет о выделениях памяти
+
+Прогресс:
+    python main.py --progress                      - строка прогресса и ETA в терминале
 """
+import argparse
+import json
 import os
 import sys
+from typing import Optional
 from config import (
     DOWNLOAD_ARCHIVE_FILE, TEMP_DOWNLOAD_DIR,
-    YT_DLP_OPTIONS, PLAYLISTS_CONFIG
+    TRACKER_BACKEND, SQLITE_ARCHIVE_FILE, TRACKER_COMMIT_BATCH_SIZE, TRACKER_COMMIT_INTERVAL,
+    PLAYLISTS_CONFIG, MIRROR_MAX_BACKLOG,
+    M3U_MANIFEST_FILE, M3U_RECONCILE_INTERVAL_DAYS, SMART_PLAYLISTS, RECONCILE_MAX_WORKERS,
+    RETRY_BASE_DELAY, RETRY_MAX_DELAY, RETRY_MAX_ATTEMPTS,
+    LOG_LEVEL, LOG_FILE, LOG_FILE_MAX_BYTES, LOG_FILE_BACKUP_COUNT,
+    METRICS_TEXTFILE, METRICS_WRITE_INTERVAL, PROFILE_DIR,
+    PROGRESS_STATUS_FILE, PROGRESS_REFRESH_INTERVAL, PERFORMANCE_PROFILES, SETTINGS_FILE,
+    OPERATION_RETRIES, CIRCUIT_BREAKER_FAILURES, CIRCUIT_BREAKER_RESET,
+    THROTTLE_STATE_FILE, THROTTLE_INITIAL_RATE, THROTTLE_MIN_RATE, THROTTLE_MAX_RATE, THROTTLE_MAX_CONCURRENCY,
+    HASH_ALGORITHM, MIRROR_TRASH_FOLDER, MIRROR_REMOVAL_MAX_FRACTION,
+    JOB_QUEUE_FILE, JOB_LEASE_SECONDS, JOB_CLAIM_BATCH, JOB_MAX_ATTEMPTS, JOB_POLL_INTERVAL,
+    TEMP_SPACE_QUOTA, TEMP_MIN_FREE_SPACE, TEMP_ESTIMATE_KBPS, TEMP_ORPHAN_AGE,
+    TEMP_FAST_DIR, TEMP_FAST_MAX_FILE, TEMP_FAST_QUOTA, SPOOL_MAX_BYTES, DEDUP_BY_CONTENT,
+    YT_DLP_CACHE_DIR, YT_DLP_CACHE_MAX_AGE_DAYS
 )
-from logger import ConsoleLogger
+from logger import QueueLogger
+from interfaces import IDownloadTracker, IJobQueue, ILogger
 from download_tracker import JsonDownloadTracker
-from playlist_extractor import YouTubePlaylistExtractor
-from audio_downloader import YouTubeAudioDownloader
-from smb_uploader import SMBFileUploader
-from youtube_mp3_sync import YouTubeMP3Synchronizer
+from sqlite_tracker import SqliteDownloadTracker
+from compact_tracker import CompactDownloadTracker
+from destinations import get_smb_configs
+from m3u_manifest import M3UManifest
+from video_state import RetryPolicy, STATE_FAILED_PERMANENT
+from profiles import load_playlists, ProfileConfigError
+from resilience import ResilientCaller
+from throttle import AdaptiveThrottle
+from job_queue import SqliteJobQueue
+from temp_space import TempSpaceManager
+from ytdlp_cache import YtDlpCache
+from metrics import (
+    MetricsRecorder, STAGE_ENUMERATION, STAGE_METADATA, STAGE_DOWNLOAD, STAGE_UPLOAD, STAGE_VERIFY, STAGE_M3U
+)
+from tracing import TraceRecorder
+from progress import ProgressTracker
 
 
-def check_smb_configuration() -> bool:
+def check_smb_configuration(playlists) -> bool:
     """Проверить настройки SMB для всех плейлистов"""
     try:
-        for i, playlist_config in enumerate(PLAYLISTS_CONFIG, 1):
-            smb_config = playlist_config.get("smb_config", {})
-            server = smb_config.get("server", "")
-            share = smb_config.get("share", "")
-            username = smb_config.get("username", "")
-            password = smb_config.get("password", "")
-            
-            if not server or not share or not username or not password:
-                print(f"[ERROR] SMB configuration incomplete for playlist {i}!")
+        for i, playlist_config in enumerate(playlists, 1):
+            smb_configs = get_smb_configs(playlist_config)
+            if not smb_configs:
+                print(f"[ERROR] No SMB destinations configured for playlist {i}!")
                 print(f"Playlist: {playlist_config.get('description', 'Unknown')}")
-                print("\nCheck config.py and ensure each playlist has complete smb_config:")
-                print("- server: SMB server name or IP")
-                print("- share: SMB share name")
-                print("- username: SMB username")
-                print("- password: SMB password")
                 return False
+            
+            for smb_config in smb_configs:
+                server = smb_config.get("server", "")
+                share = smb_config.get("share", "")
+                username = smb_config.get("username", "")
+                password = smb_config.get("password", "")
+                
+                if not server or not share or not username or not password:
+                    print(f"[ERROR] SMB configuration incomplete for playlist {i}!")
+                    print(f"Playlist: {playlist_config.get('description', 'Unknown')}")
+                    print("\nCheck config.py and ensure each playlist has complete smb_config:")
+                    print("- server: SMB server name or IP")
+                    print("- share: SMB share name")
+                    print("- username: SMB username")
+                    print("- password: SMB password")
+                    return False
         
         return True
         
@@ -42,22 +94,255 @@ def check_smb_configuration() -> bool:
         return False
 
 
-def main() -> int:
+def create_download_tracker(logger: ILogger, read_only: bool = False) -> Optional[IDownloadTracker]:
+    """
+    Создать трекер загрузок согласно TRACKER_BACKEND
+    
+    read_only - только для чтения (команда status): файлы трекера не
+    создаются и не изменяются, а если базы еще нет, возвращается None
+    """
+    if TRACKER_BACKEND == "json":
+        return JsonDownloadTracker(DOWNLOAD_ARCHIVE_FILE, logger)
+    if TRACKER_BACKEND in ("sqlite", "compact") and read_only:
+        if not os.path.exists(SQLITE_ARCHIVE_FILE):
+            return None
+        # Компактный индекс для чтения не нужен: запросы status выполняет SQLite
+        return SqliteDownloadTracker(SQLITE_ARCHIVE_FILE, logger, read_only=True)
+    if TRACKER_BACKEND in ("sqlite", "compact"):
+        tracker_class = CompactDownloadTracker if TRACKER_BACKEND == "compact" else SqliteDownloadTracker
+        return tracker_class(
+            SQLITE_ARCHIVE_FILE, logger,
+            commit_batch_size=TRACKER_COMMIT_BATCH_SIZE,
+            commit_interval=TRACKER_COMMIT_INTERVAL,
+            import_json_file=DOWNLOAD_ARCHIVE_FILE
+        )
+    raise ValueError(f"Unknown TRACKER_BACKEND: {TRACKER_BACKEND}")
+
+
+def parse_arguments(argv=None) -> argparse.Namespace:
+    """Разобрать аргументы командной строки"""
+    parser = argparse.ArgumentParser(description="YouTube MP3 Synchronizer")
+    parser.add_argument(
+        "command", nargs="?", default="sync", choices=["sync", "reconcile", "status", "coordinate", "worker"],
+        help="sync - синхронизация, reconcile - сверка трекера с папками на серверах, "
+             "status - состояние трекера и прогресс, coordinate - заполнение общей очереди заданий, "
+             "worker - обработка заданий очереди на этом узле"
+    )
+    parser.add_argument("--wait", action="store_true", help="coordinate: дождаться выполнения всех заданий")
+    parser.add_argument("--follow", action="store_true", help="worker: не завершаться на пустой очереди")
+    parser.add_argument("--profile", action="store_true", help="Профилировать запуск (cProfile)")
+    parser.add_argument(
+        "--profile-stage", action="append", metavar="STAGE",
+        choices=[STAGE_ENUMERATION, STAGE_METADATA, STAGE_DOWNLOAD, STAGE_UPLOAD, STAGE_VERIFY, STAGE_M3U],
+        help="Профилировать только указанный этап (можно повторять)"
+    )
+    parser.add_argument("--profile-memory", action="store_true", help="Отчет о выделениях памяти (tracemalloc)")
+    parser.add_argument("--profile-dir", default=PROFILE_DIR, help="Папка для отчетов профилирования")
+    parser.add_argument(
+        "--trace", metavar="FILE",
+        help="Записать временную шкалу этапов каждого видео (Chrome Trace JSON для Perfetto)"
+    )
+    parser.add_argument("--progress", action="store_true", help="Показывать строку прогресса и ETA в терминале")
+    parser.add_argument("--status-file", default=PROGRESS_STATUS_FILE, help="Файл состояния прогресса (JSON)")
+    parser.add_argument(
+        "--settings", default=SETTINGS_FILE, metavar="FILE",
+        help="Файл настроек с профилями и плейлистами (TOML/YAML)"
+    )
+    return parser.parse_args(argv)
+
+
+def create_profiler(args: argparse.Namespace):
+    """Создать профилировщик этапов, если профилирование запрошено"""
+    if not (args.profile or args.profile_stage or args.profile_memory):
+        return None
+    from profiling import StageProfiler
+    return StageProfiler(args.profile_dir, args.profile_stage, args.profile_memory)
+
+
+def run_command(func, profiler, logger) -> None:
+    """Выполнить команду, при необходимости под профилировщиком"""
+    if profiler is None:
+        func()
+        return
+    profiler.run(func)
+    logger.info(f"Отчеты профилирования записаны в {profiler.run_dir}")
+
+
+def print_status(
+    download_tracker: Optional[IDownloadTracker], status_file: Optional[str] = None,
+    job_queue: Optional[IJobQueue] = None
+) -> None:
+    """Вывести состояние трекера, ожидающие повторы, текущий прогресс и очередь заданий"""
+    if download_tracker is None:
+        print("Downloaded videos: no data yet")
+    else:
+        failures = download_tracker.get_failures()
+        due = sum(1 for failure in failures.values() if RetryPolicy.is_due(failure))
+        permanent = sum(1 for failure in failures.values() if failure["state"] == STATE_FAILED_PERMANENT)
+        print(f"Downloaded videos: {len(download_tracker.get_downloaded_list())}")
+        print(f"Failed videos: {len(failures)} (retry due: {due}, permanent: {permanent})")
+    
+    if status_file and os.path.exists(status_file):
+        with open(status_file, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        print(f"Progress ({state.get('updated')}): {ProgressTracker.format_line(state)}")
+    
+    if job_queue is not None:
+        counts = job_queue.counts()
+        print("Job queue: " + ", ".join(f"{state}: {count}" for state, count in counts.items()))
+
+
+def main(argv=None) -> int:
     """Главная функция приложения"""
+    args = parse_arguments(argv)
     try:
         print("YouTube MP3 Synchronizer")
         print("=" * 50)
         
+        # Инициализируем компоненты
+        logger = QueueLogger(
+            level=LOG_LEVEL, log_file=LOG_FILE,
+            max_bytes=LOG_FILE_MAX_BYTES, backup_count=LOG_FILE_BACKUP_COUNT
+        )
+        
+        # Команда status не обращается к YouTube и SMB: тяжелые модули не импортируются
+        if args.command == "status":
+            download_tracker = create_download_tracker(logger, read_only=True)
+            job_queue = None
+            if os.path.exists(JOB_QUEUE_FILE):
+                job_queue = SqliteJobQueue(JOB_QUEUE_FILE, logger, read_only=True)
+            try:
+                print_status(download_tracker, args.status_file, job_queue)
+            finally:
+                if job_queue:
+                    job_queue.close()
+                if download_tracker:
+                    download_tracker.close()
+                logger.close()
+            return 0
+        
+        # Плейлисты и профили производительности проверяются до начала работы
+        try:
+            playlists = load_playlists(
+                PLAYLISTS_CONFIG, PERFORMANCE_PROFILES, args.settings, {"max_backlog": MIRROR_MAX_BACKLOG}
+            )
+        except ProfileConfigError as e:
+            print(f"[ERROR] Invalid settings: {e}")
+            logger.close()
+            return 1
+        
         # Проверяем конфигурацию SMB
-        if not check_smb_configuration():
+        if not check_smb_configuration(playlists):
+            logger.close()
             return 1
         
-        # Инициализируем компоненты
-        logger = ConsoleLogger()
-        download_tracker = JsonDownloadTracker(DOWNLOAD_ARCHIVE_FILE, logger)
-        playlist_extractor = YouTubePlaylistExtractor(logger)
-        audio_downloader = YouTubeAudioDownloader(YT_DLP_OPTIONS, logger)
-        file_uploader = SMBFileUploader(logger)
+        # yt-dlp и smbclient импортируются только командами, которым они нужны
+        from playlist_extractor import YouTubePlaylistExtractor
+        
+        # Трекер, манифест и списки плейлистов ведет координатор: узлу команды
+        # worker нужны только очередь и загрузчик
+        owns_tracker = args.command != "worker"
+        download_tracker = create_download_tracker(logger) if owns_tracker else None
+        # Повторы и предохранители хостов общие для всех плейлистов и компонентов
+        resilience = ResilientCaller(logger, OPERATION_RETRIES, CIRCUIT_BREAKER_FAILURES, CIRCUIT_BREAKER_RESET)
+        # Ограничение частоты запросов к YouTube общее для сверки, плейлистов и загрузок
+        throttle = AdaptiveThrottle(
+            logger, THROTTLE_STATE_FILE, THROTTLE_INITIAL_RATE, THROTTLE_MIN_RATE, THROTTLE_MAX_RATE,
+            THROTTLE_MAX_CONCURRENCY
+        )
+        # Кеш yt-dlp общий для экстрактора и загрузчика и сохраняется между запусками
+        ytdlp_cache = YtDlpCache(YT_DLP_CACHE_DIR, logger, max_age_days=YT_DLP_CACHE_MAX_AGE_DAYS)
+        playlist_extractor = m3u_manifest = None
+        if owns_tracker:
+            playlist_extractor = YouTubePlaylistExtractor(logger, resilience, throttle, ytdlp_cache)
+            playlist_extractor.warm_up()
+            m3u_manifest = M3UManifest(M3U_MANIFEST_FILE, logger)
+        profiler = create_profiler(args)
+        
+        if args.command == "reconcile":
+            from reconciler import TrackerReconciler
+            
+            reconciler = TrackerReconciler(
+                playlist_extractor, download_tracker, logger, m3u_manifest, RECONCILE_MAX_WORKERS, resilience
+            )
+            logger.info("Запускаем сверку...")
+            try:
+                run_command(lambda: reconciler.reconcile(playlists), profiler, logger)
+            finally:
+                throttle.save()
+                download_tracker.close()
+                logger.close()
+            return 0
+        
+        if args.command == "coordinate":
+            from worker import JobCoordinator
+            
+            job_queue = SqliteJobQueue(JOB_QUEUE_FILE, logger, JOB_MAX_ATTEMPTS)
+            coordinator = JobCoordinator(
+                job_queue, playlist_extractor, download_tracker, m3u_manifest, logger,
+                RetryPolicy(RETRY_BASE_DELAY, RETRY_MAX_DELAY, RETRY_MAX_ATTEMPTS)
+            )
+            logger.info(f"Координатор: очередь заданий {JOB_QUEUE_FILE}")
+            try:
+                run_command(lambda: coordinator.run(playlists, args.wait, JOB_POLL_INTERVAL), profiler, logger)
+            finally:
+                throttle.save()
+                job_queue.close()
+                download_tracker.close()
+                logger.close()
+            return 0
+        
+        import config
+        from audio_downloader import YouTubeAudioDownloader
+        from smb_uploader import MirroredSMBUploader
+        from youtube_mp3_sync import YouTubeMP3Synchronizer
+        
+        # Возможности ffmpeg определяются один раз и кешируются (CAPABILITIES_CACHE_FILE)
+        if config.FFMPEG_AVAILABLE:
+            print(f"OK: FFmpeg {config.get_capabilities().get('version') or ''} detected - will convert to MP3")
+        else:
+            print("WARNING: FFmpeg not found - will download best available audio format")
+        
+        tracer = TraceRecorder(args.trace) if args.trace else None
+        progress = ProgressTracker(args.progress, args.status_file, PROGRESS_REFRESH_INTERVAL)
+        metrics = MetricsRecorder(METRICS_TEXTFILE, METRICS_WRITE_INTERVAL, profiler, tracer, progress)
+        resilience.metrics = metrics
+        ytdlp_cache.metrics = metrics
+        throttle.metrics = metrics
+        audio_downloader = YouTubeAudioDownloader(
+            config.YT_DLP_OPTIONS, logger, metrics, resilience, throttle,
+            config.get_capabilities().get("path") if config.FFMPEG_AVAILABLE else None, ytdlp_cache,
+            DEDUP_BY_CONTENT
+        )
+        audio_downloader.warm_up([playlist_config.get("performance") for playlist_config in playlists])
+        file_uploader = MirroredSMBUploader(logger, MIRROR_MAX_BACKLOG, metrics, resilience, HASH_ALGORITHM)
+        temp_space = TempSpaceManager(
+            logger, TEMP_DOWNLOAD_DIR, TEMP_SPACE_QUOTA, TEMP_MIN_FREE_SPACE, TEMP_ESTIMATE_KBPS,
+            TEMP_FAST_DIR, TEMP_FAST_MAX_FILE, TEMP_FAST_QUOTA, metrics
+        )
+        # Файлы прерванных запусков не должны занимать место
+        temp_space.sweep_orphans(TEMP_ORPHAN_AGE)
+        
+        if args.command == "worker":
+            from worker import QueueWorker
+            
+            job_queue = SqliteJobQueue(JOB_QUEUE_FILE, logger, JOB_MAX_ATTEMPTS)
+            queue_worker = QueueWorker(
+                job_queue, audio_downloader, file_uploader, logger, playlists,
+                lease_seconds=JOB_LEASE_SECONDS, batch_size=JOB_CLAIM_BATCH, temp_dir=TEMP_DOWNLOAD_DIR,
+                poll_interval=JOB_POLL_INTERVAL, metrics=metrics, temp_space=temp_space,
+                spool_max_bytes=SPOOL_MAX_BYTES
+            )
+            progress.start()
+            try:
+                run_command(lambda: queue_worker.run(args.follow), profiler, logger)
+            finally:
+                progress.stop()
+                throttle.save()
+                ytdlp_cache.log_summary()
+                job_queue.close()
+                logger.close()
+            return 0
         
         # Создаем синхронизатор
         synchronizer = YouTubeMP3Synchronizer(
@@ -66,12 +351,35 @@ def main() -> int:
             audio_downloader=audio_downloader,
             file_uploader=file_uploader,
             logger=logger,
-            temp_dir=TEMP_DOWNLOAD_DIR
+            temp_dir=TEMP_DOWNLOAD_DIR,
+            m3u_manifest=m3u_manifest,
+            m3u_reconcile_days=M3U_RECONCILE_INTERVAL_DAYS,
+            smart_playlists=SMART_PLAYLISTS,
+            retry_policy=RetryPolicy(RETRY_BASE_DELAY, RETRY_MAX_DELAY, RETRY_MAX_ATTEMPTS),
+            metrics=metrics,
+            playlists=playlists,
+            trash_folder=MIRROR_TRASH_FOLDER,
+            removal_max_fraction=MIRROR_REMOVAL_MAX_FRACTION,
+            temp_space=temp_space,
+            spool_max_bytes=SPOOL_MAX_BYTES
         )
         
         # Запускаем синхронизацию
         logger.info("Запускаем синхронизацию...")
-        synchronizer.sync()
+        progress.start()
+        try:
+            run_command(synchronizer.sync, profiler, logger)
+        finally:
+            progress.stop()
+            throttle.save()
+            ytdlp_cache.log_summary()
+            if tracer:
+                if tracer.write():
+                    logger.info(f"Трассировка записана в {args.trace} (откройте в https://ui.perfetto.dev)")
+                else:
+                    logger.error(f"Не удалось записать трассировку в {args.trace}")
+            download_tracker.close()
+            logger.close()
         
         return 0
         
@@ -0,0 +1,217 @@
+"""
+Сбор метрик синхронизации и экспорт в формате Prometheus (textfile collector)
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Optional, Tuple
+
+from progress import ProgressTracker
+
+# Этапы обработки, время которых учитывается
+STAGE_ENUMERATION = "enumeration"
+STAGE_METADATA = "metadata"
+STAGE_DOWNLOAD = "download"
+STAGE_TRANSCODE = "transcode"
+STAGE_UPLOAD = "upload"
+STAGE_VERIFY = "verify"
+STAGE_M3U = "m3u"
+
+METRIC_PREFIX = "ytsync"
+
+# Описание метрик для экспорта: имя -> (тип, описание)
+METRIC_HELP = {
+    "stage_seconds_total": ("counter", "Time spent in a pipeline stage"),
+    "stage_runs_total": ("counter", "Number of times a pipeline stage ran"),
+    "bytes_uploaded_total": ("counter", "Bytes written to an SMB server"),
+    "uploads_total": ("counter", "Uploads by server and result"),
+    "videos_total": ("counter", "Processed videos by result"),
+    "retries_total": ("counter", "Retried network operations by operation and host"),
+    "circuit_open_total": ("counter", "Times a host was disabled by its circuit breaker"),
+    "rate_limited_total": ("counter", "YouTube rate-limit responses (HTTP 429 or bot check)"),
+    "youtube_request_rate": ("gauge", "Current YouTube request rate limit per minute"),
+    "youtube_concurrency": ("gauge", "Current limit of concurrent YouTube requests"),
+    "temp_reserved_bytes": ("gauge", "Space reserved for downloads in a temp directory"),
+    "temp_space_waits_total": ("counter", "Downloads that waited for temp directory space"),
+    "ytdlp_cache_lookups_total": ("counter", "yt-dlp cache lookups by section and result"),
+    "ytdlp_cache_hit_ratio": ("gauge", "Share of yt-dlp cache lookups served from the cache"),
+    "queue_depth": ("gauge", "Current depth of a work queue"),
+    "queue_depth_max": ("gauge", "Maximum depth of a work queue during the run"),
+    "run_start_timestamp_seconds": ("gauge", "Start time of the current run"),
+    "run_duration_seconds": ("gauge", "Duration of the current run so far"),
+}
+
+LabelSet = Tuple[Tuple[str, str], ...]
+
+
+class StageTimer:
+    """Замер одного выполнения этапа; excluded_seconds вычитается из его времени"""
+
+    def __init__(self):
+        self.excluded_seconds = 0.0
+
+
+class MetricsRecorder:
+    """
+    Потокобезопасный сборщик счетчиков, таймингов этапов и глубины очередей.
+
+    Метрики записываются в файл для textfile collector node_exporter
+    в конце запуска или периодически (write_interval) во время работы.
+    Файл заменяется атомарно, поэтому collector никогда не читает его частично.
+
+    Границы этапов также используются профилировщиком (см. profiling.StageProfiler)
+    и записью временной шкалы (см. tracing.TraceRecorder), а прогресс передач
+    собирается в progress (см. progress.ProgressTracker).
+    """
+
+    def __init__(
+        self,
+        textfile: Optional[str] = None,
+        write_interval: float = 60.0,
+        profiler=None,
+        tracer=None,
+        progress: Optional[ProgressTracker] = None
+    ):
+        """
+        Args:
+            textfile: Путь к файлу .prom (None - метрики только собираются)
+            write_interval: Минимальный интервал периодической записи (секунды)
+            profiler: Профилировщик этапов (None - без профилирования)
+            tracer: Запись временной шкалы этапов (None - без трассировки)
+            progress: Сводный прогресс (None - прогресс не отображается)
+        """
+        self.textfile = textfile
+        self.write_interval = write_interval
+        self.profiler = profiler
+        self.tracer = tracer
+        self.progress = progress or ProgressTracker()
+        self._lock = threading.Lock()
+        self._values: Dict[str, Dict[LabelSet, float]] = {}
+        self._started = time.time()
+        self._last_write = time.monotonic()
+
+    @staticmethod
+    def _labels(labels: Dict[str, str]) -> LabelSet:
+        return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        """Увеличить счетчик"""
+        key = self._labels(labels)
+        with self._lock:
+            series = self._values.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels) -> None:
+        """Установить значение показателя"""
+        with self._lock:
+            self._values.setdefault(name, {})[self._labels(labels)] = value
+
+    def observe_stage(self, stage: str, seconds: float) -> None:
+        """Учесть время выполнения этапа"""
+        self.inc("stage_seconds_total", seconds, stage=stage)
+        self.inc("stage_runs_total", 1, stage=stage)
+
+    @contextmanager
+    def stage(self, stage: str, **tags):
+        """
+        Контекстный менеджер для замера времени этапа
+
+        Возвращает StageTimer: время, записанное в его excluded_seconds
+        (например, вложенный этап), не учитывается в этом этапе.
+        Теги (например, server) попадают только в трассировку.
+        """
+        timer = StageTimer()
+        started = time.perf_counter()
+        try:
+            with self.profiler.stage(stage) if self.profiler else nullcontext():
+                with self.tracer.span(stage, **tags) if self.tracer else nullcontext():
+                    yield timer
+        finally:
+            self.observe_stage(stage, time.perf_counter() - started - timer.excluded_seconds)
+
+    def trace_context(self, span: Optional[str] = None, **tags):
+        """Контекст трассировки: теги добавляются ко всем спанам внутри блока"""
+        return self.tracer.context(span, **tags) if self.tracer else nullcontext()
+
+    def trace_span(self, name: str, started: float, ended: float, **tags) -> None:
+        """Записать в трассировку уже завершенный спан (времена по time.perf_counter)"""
+        if self.tracer:
+            self.tracer.add_span(name, started, ended, **tags)
+
+    def trace_interval(self, name: str, started: float, ended: float, **tags) -> None:
+        """Записать в трассировку интервал ожидания (например, в очереди зеркала)"""
+        if self.tracer:
+            self.tracer.add_interval(name, started, ended, **tags)
+
+    def set_queue_depth(self, queue: str, depth: int) -> None:
+        """Учесть текущую глубину очереди (и максимум за запуск)"""
+        key = self._labels({"queue": queue})
+        with self._lock:
+            self._values.setdefault("queue_depth", {})[key] = depth
+            maximum = self._values.setdefault("queue_depth_max", {})
+            maximum[key] = max(maximum.get(key, 0), depth)
+
+    def get(self, name: str, **labels) -> float:
+        """Получить текущее значение метрики"""
+        with self._lock:
+            return self._values.get(name, {}).get(self._labels(labels), 0)
+
+    def render(self) -> str:
+        """Сформировать метрики в текстовом формате Prometheus"""
+        self.set_gauge("run_start_timestamp_seconds", self._started)
+        self.set_gauge("run_duration_seconds", time.time() - self._started)
+
+        lines = []
+        with self._lock:
+            for name in sorted(self._values):
+                full_name = f"{METRIC_PREFIX}_{name}"
+                metric_type, description = METRIC_HELP.get(name, ("untyped", name))
+                lines.append(f"# HELP {full_name} {description}")
+                lines.append(f"# TYPE {full_name} {metric_type}")
+                for labels, value in sorted(self._values[name].items()):
+                    label_text = ",".join(
+                        f'{key}="{_escape_label(label_value)}"' for key, label_value in labels
+                    )
+                    sample = f"{full_name}{{{label_text}}}" if label_text else full_name
+                    lines.append(f"{sample} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def write(self) -> bool:
+        """
+        Записать метрики в textfile (атомарная замена файла)
+
+        Returns:
+            True если файл записан
+        """
+        if not self.textfile:
+            return False
+
+        content = self.render()
+        tmp_file = f"{self.textfile}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.textfile) or ".", exist_ok=True)
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(tmp_file, self.textfile)
+        except OSError:
+            return False
+        finally:
+            self._last_write = time.monotonic()
+        return True
+
+    def maybe_write(self) -> bool:
+        """Записать метрики, если с прошлой записи прошло write_interval секунд"""
+        if not self.textfile or time.monotonic() - self._last_write < self.write_interval:
+            return False
+        return self.write()
+
+
+def _format_value(value: float) -> str:
+    """Отформатировать значение без потери точности (целые - без дробной части)"""
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _escape_label(value: str) -> str:
+    """Экранировать значение метки по правилам формата Prometheus"""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
@@ -0,0 +1,144 @@
+"""
+Формирование имен файлов для треков
+"""
+import os
+from typing import Any, Dict, List, Optional
+
+# Символы, недопустимые в именах файлов Windows/SMB
+INVALID_FILENAME_CHARS = '<>:"/\\|?*'
+MAX_FILENAME_LENGTH = 100
+
+# Названия удаленных и скрытых видео в плейлистах YouTube: по ним файлы не переименовываются
+UNAVAILABLE_TITLES = {"[Deleted video]", "[Private video]"}
+
+
+def sanitize_filename(filename: str) -> str:
+    """Очистить имя файла от недопустимых символов"""
+    # Заменяем недопустимые символы
+    for char in INVALID_FILENAME_CHARS:
+        filename = filename.replace(char, '_')
+    
+    # Ограничиваем длину
+    if len(filename) > MAX_FILENAME_LENGTH:
+        filename = filename[:MAX_FILENAME_LENGTH]
+    
+    return filename.strip()
+
+
+def base_name(title: str) -> str:
+    """Имя файла трека без расширения (из названия видео)"""
+    return sanitize_filename(title) or "unknown"
+
+
+def collision_name(title: str, video_id: str) -> str:
+    """Имя без расширения для трека, чье название уже занято другим видео"""
+    return f"{base_name(title)} [{sanitize_filename(video_id)}]"
+
+
+class NamingIndex:
+    """
+    Индекс имен файлов в назначениях: ID видео -> имя файла на сервере.
+
+    Строится по доставкам из трекера. Имя трека - очищенное название видео;
+    если в папке назначения это имя (без учета регистра, как на SMB) уже
+    принадлежит другому видео, к нему добавляется ID видео в скобках. Так
+    одинаковые названия не перезаписывают друг друга, а имена не зависят
+    от того, в каком порядке обрабатываются видео в следующих запусках.
+    """
+
+    def __init__(self, download_tracker, destinations: List[str]):
+        """
+        Args:
+            download_tracker: Трекер загрузок (IDownloadTracker)
+            destinations: Ключи назначений плейлиста
+        """
+        self._files: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._owners: Dict[str, Dict[str, str]] = {}
+        for destination in destinations:
+            deliveries = download_tracker.get_deliveries(destination)
+            self._files[destination] = deliveries
+            self._owners[destination] = {
+                delivery["file"].lower(): video_id for video_id, delivery in deliveries.items()
+            }
+
+    def get_delivery(self, video_id: str, destination: str) -> Optional[Dict[str, Any]]:
+        """Доставка видео в назначение: {file, size} или None"""
+        return self._files.get(destination, {}).get(video_id)
+
+    def get_deliveries(self, destination: str) -> Dict[str, Dict[str, Any]]:
+        """Все доставки в назначение: ID видео -> {file, size}"""
+        return dict(self._files.get(destination, {}))
+
+    def is_shared(self, video_id: str, destination: str) -> bool:
+        """Ссылаются ли на файл видео в назначении другие видео (дубликаты по звуку)"""
+        delivery = self.get_delivery(video_id, destination)
+        if not delivery:
+            return False
+        name = delivery["file"].lower()
+        return any(
+            other_id != video_id and other["file"].lower() == name
+            for other_id, other in self._files.get(destination, {}).items()
+        )
+
+    def matches_title(self, video: Dict[str, Any], filename: str) -> bool:
+        """
+        Соответствует ли имя файла текущему названию видео
+
+        Для видео без названия (удаленных, скрытых) имя считается верным.
+        """
+        title = video.get('title', '')
+        if not title or title in UNAVAILABLE_TITLES:
+            return True
+        stem = os.path.splitext(filename)[0]
+        return stem in (base_name(title), collision_name(title, video['id']))
+
+    def _is_free(self, name: str, video_id: str, destinations: List[str]) -> bool:
+        return all(
+            self._owners.get(destination, {}).get(name.lower(), video_id) == video_id
+            for destination in destinations
+        )
+
+    def name_for(self, video: Dict[str, Any], destinations: List[str], extension: str = ".mp3") -> str:
+        """
+        Имя файла для видео, свободное во всех указанных назначениях
+
+        Args:
+            video: Информация о видео (id, title)
+            destinations: Назначения, в которые будет записан файл
+            extension: Расширение файла (с точкой)
+        """
+        title = video.get('title', '')
+        name = base_name(title) + extension
+        if self._is_free(name, video['id'], destinations):
+            return name
+        return collision_name(title, video['id']) + extension
+
+    def assign(self, video: Dict[str, Any], destinations: List[str], extension: str = ".mp3") -> str:
+        """Выбрать имя (см. name_for) и закрепить его за видео до конца запуска"""
+        name = self.name_for(video, destinations, extension)
+        for destination in destinations:
+            self._owners.setdefault(destination, {})[name.lower()] = video['id']
+        return name
+
+    def move(self, video_id: str, destination: str, old_name: str, new_name: str) -> None:
+        """Учесть переименование файла в назначении"""
+        owners = self._owners.setdefault(destination, {})
+        if owners.get(old_name.lower()) == video_id:
+            del owners[old_name.lower()]
+        owners[new_name.lower()] = video_id
+        delivery = self._files.setdefault(destination, {}).get(video_id)
+        if delivery is not None:
+            delivery["file"] = new_name
+
+    def forget(self, video_id: str, destination: str) -> None:
+        """Учесть удаление файла видео из назначения"""
+        delivery = self._files.get(destination, {}).pop(video_id, None)
+        owners = self._owners.get(destination, {})
+        if delivery and owners.get(delivery["file"].lower()) == video_id:
+            name = delivery["file"].lower()
+            # Файл, на который ссылаются другие видео, остается занятым
+            others = [other_id for other_id, other in self._files[destination].items() if other["file"].lower() == name]
+            if others:
+                owners[name] = others[0]
+            else:
+                del owners[name]
@@ -1,49 +1,84 @@
 """
 Реализация извлечения информации о плейлисте YouTube
 """
+import threading
 import yt_dlp
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from interfaces import IPlaylistExtractor, ILogger
+from resilience import ResilientCaller, YOUTUBE_HOST
+from throttle import AdaptiveThrottle
+from ytdlp_cache import YtDlpCache
 
 
 class YouTubePlaylistExtractor(IPlaylistExtractor):
     """Извлечение информации о плейлисте YouTube с помощью yt-dlp"""
     
-    def __init__(self, logger: ILogger):
+    def __init__(
+        self,
+        logger: ILogger,
+        resilience: Optional[ResilientCaller] = None,
+        throttle: Optional[AdaptiveThrottle] = None,
+        cache: Optional[YtDlpCache] = None
+    ):
         self.logger = logger
+        self.resilience = resilience or ResilientCaller(logger)
+        self.throttle = throttle or AdaptiveThrottle(logger)
         self.ydl_opts = {
             'quiet': True,
             'no_warnings': True,
             'extract_flat': True,  # Получаем только метаданные без загрузки
         }
+        self.cache = cache
+        if cache is not None:
+            self.ydl_opts = cache.options(self.ydl_opts)
+        # Экземпляр YoutubeDL переиспользуется между плейлистами (свой в каждом потоке)
+        self._local = threading.local()
+    
+    def _ydl(self):
+        """Прогретый экземпляр YoutubeDL текущего потока"""
+        ydl = getattr(self._local, "ydl", None)
+        if ydl is None:
+            ydl = yt_dlp.YoutubeDL(self.ydl_opts)
+            if self.cache is not None:
+                self.cache.instrument(ydl)
+            self._local.ydl = ydl
+        return ydl
+    
+    def warm_up(self) -> None:
+        """Заранее создать экземпляр YoutubeDL и подготовить кеш"""
+        if self.cache is not None:
+            self.cache.warm_up(self._ydl())
     
     def get_video_list(self, playlist_url: str) -> List[Dict[str, Any]]:
         """Получить список видео из плейлиста"""
         try:
             self.logger.info(f"Извлекаем информацию о плейлисте: {playlist_url}")
             
-            with yt_dlp.YoutubeDL(self.ydl_opts) as ydl:
-                playlist_info = ydl.extract_info(playlist_url, download=False)
-                
-                if not playlist_info or 'entries' not in playlist_info:
-                    self.logger.error("Не удалось получить информацию о плейлисте")
-                    return []
-                
-                videos = []
-                for entry in playlist_info['entries']:
-                    if entry:  # Проверяем, что entry не None
-                        video_info = {
-                            'id': entry.get('id', ''),
-                            'title': entry.get('title', 'Неизвестное название'),
-                            'url': entry.get('url', ''),
-                            'duration': entry.get('duration', 0),
-                            'uploader': entry.get('uploader', 'Неизвестный автор')
-                        }
-                        videos.append(video_info)
-                
-                self.logger.info(f"Найдено {len(videos)} видео в плейлисте")
-                return videos
-                
+            ydl = self._ydl()
+            playlist_info = self.resilience.call(
+                "youtube_playlist", YOUTUBE_HOST,
+                self.throttle.call, ydl.extract_info, playlist_url, download=False
+            )
+            
+            if not playlist_info or 'entries' not in playlist_info:
+                self.logger.error("Не удалось получить информацию о плейлисте")
+                return []
+            
+            videos = []
+            for entry in playlist_info['entries']:
+                if entry:  # Проверяем, что entry не None
+                    video_info = {
+                        'id': entry.get('id', ''),
+                        'title': entry.get('title', 'Неизвестное название'),
+                        'url': entry.get('url', ''),
+                        'duration': entry.get('duration', 0),
+                        'uploader': entry.get('uploader', 'Неизвестный автор')
+                    }
+                    videos.append(video_info)
+            
+            self.logger.info(f"Найдено {len(videos)} видео в плейлисте")
+            return videos
+            
         except Exception as e:
             self.logger.error(f"Ошибка при извлечении плейлиста: {e}")
             return []
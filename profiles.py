@@ -0,0 +1,269 @@
+"""
+Профили производительности плейлистов и загрузка внешнего файла настроек (TOML/YAML)
+"""
+import copy
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+from destinations import get_smb_configs
+
+# Настройки профиля по умолчанию (совпадают с прежним глобальным поведением)
+DEFAULT_PROFILE = {
+    # Кодирование (на уровне плейлиста: файл скачивается один раз для всех серверов)
+    "format": "bestaudio/best",       # Формат yt-dlp
+    "quality": "192",                 # Битрейт MP3 в кбит/с или VBR 0-9
+    # Загрузка на сервер (можно переопределить для отдельного сервера)
+    "upload_workers": 1,              # Параллельных загрузок на одно зеркало
+    "max_backlog": 4,                 # Максимум файлов в очереди одного зеркала
+    "write_chunk_size": 1024 * 1024,  # Размер блока записи на SMB
+    "read_chunk_size": 1024 * 1024,   # Размер блока чтения при проверке и хешировании
+    "verify": "hash",                 # Проверка после записи: hash, size или none
+}
+
+# Ключи, которые можно переопределить для отдельного сервера
+SERVER_KEYS = {"upload_workers", "max_backlog", "write_chunk_size", "read_chunk_size", "verify"}
+
+VERIFY_POLICIES = ("hash", "size", "none")
+
+# Ссылка на переменную окружения в значении файла настроек
+_ENV_REFERENCE = re.compile(r"\$\{(\w+)\}")
+
+
+class ProfileConfigError(ValueError):
+    """Ошибка в профилях или файле настроек"""
+
+
+def _check_int(minimum: int, maximum: int):
+    def check(name: str, value: Any) -> None:
+        if isinstance(value, bool) or not isinstance(value, int) or not minimum <= value <= maximum:
+            raise ProfileConfigError(f"{name}: ожидается целое число от {minimum} до {maximum}, получено {value!r}")
+    return check
+
+
+def _check_format(name: str, value: Any) -> None:
+    if not isinstance(value, str) or not value:
+        raise ProfileConfigError(f"{name}: ожидается непустая строка формата yt-dlp")
+
+
+def _check_quality(name: str, value: Any) -> None:
+    text = str(value)
+    if not text.isdigit() or not (int(text) <= 9 or 32 <= int(text) <= 320):
+        raise ProfileConfigError(f"{name}: ожидается битрейт 32-320 или VBR 0-9, получено {value!r}")
+
+
+def _check_verify(name: str, value: Any) -> None:
+    if value not in VERIFY_POLICIES:
+        raise ProfileConfigError(f"{name}: ожидается одно из {', '.join(VERIFY_POLICIES)}, получено {value!r}")
+
+
+# Проверки значений: ключ -> функция (имя для сообщения, значение)
+_VALIDATORS = {
+    "format": _check_format,
+    "quality": _check_quality,
+    "upload_workers": _check_int(1, 32),
+    "max_backlog": _check_int(1, 10000),
+    "write_chunk_size": _check_int(4096, 64 * 1024 * 1024),
+    "read_chunk_size": _check_int(4096, 64 * 1024 * 1024),
+    "verify": _check_verify,
+}
+
+
+def validate_settings(settings: Dict[str, Any], where: str, allowed=None) -> Dict[str, Any]:
+    """
+    Проверить набор настроек профиля
+
+    Args:
+        settings: Настройки (часть ключей DEFAULT_PROFILE)
+        where: Где заданы настройки (для сообщения об ошибке)
+        allowed: Допустимые ключи (None - все ключи профиля)
+
+    Returns:
+        Те же настройки (quality приводится к строке)
+    """
+    if not isinstance(settings, dict):
+        raise ProfileConfigError(f"{where}: ожидается таблица настроек")
+    allowed = set(DEFAULT_PROFILE) if allowed is None else allowed
+    for key, value in settings.items():
+        if key not in allowed:
+            hint = " (на уровне сервера допустимы только настройки загрузки)" if key in DEFAULT_PROFILE else ""
+            raise ProfileConfigError(f"{where}: неизвестный параметр '{key}'{hint}")
+        _VALIDATORS[key](f"{where}.{key}", value)
+    if "quality" in settings:
+        settings = dict(settings, quality=str(settings["quality"]))
+    return settings
+
+
+class PerformanceProfiles:
+    """
+    Именованные профили производительности и их применение к плейлистам.
+
+    Итоговые настройки плейлиста: DEFAULT_PROFILE с глобальными настройками
+    (defaults и профиль "default"), затем профиль плейлиста ("profile") и его
+    переопределения ("overrides"). Для каждого сервера
+    поверх этого применяются профиль и переопределения из smb_config
+    (только настройки загрузки). Результат записывается в ключ "performance"
+    плейлиста и каждого smb_config.
+    """
+
+    def __init__(
+        self,
+        profiles: Optional[Dict[str, Dict[str, Any]]] = None,
+        defaults: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Args:
+            profiles: Профили: имя -> настройки (проверяются при создании)
+            defaults: Глобальные настройки из config.py (например, max_backlog)
+        """
+        self.profiles = {}
+        for name, settings in (profiles or {}).items():
+            self.profiles[name] = validate_settings(settings, f"profiles.{name}")
+        self.defaults = dict(DEFAULT_PROFILE)
+        self.defaults.update(validate_settings(defaults or {}, "defaults"))
+        self.defaults.update(self.profiles.get("default", {}))
+
+    def _lookup(self, name: Optional[str], where: str) -> Dict[str, Any]:
+        if name is None:
+            return {}
+        if name not in self.profiles:
+            known = ", ".join(sorted(self.profiles)) or "нет"
+            raise ProfileConfigError(f"{where}: неизвестный профиль '{name}' (доступны: {known})")
+        return self.profiles[name]
+
+    def apply(self, playlist_config: Dict[str, Any], where: str = "playlist") -> Dict[str, Any]:
+        """
+        Вычислить настройки плейлиста и его серверов
+
+        Returns:
+            Копия конфигурации плейлиста с ключами "performance"
+        """
+        playlist = dict(playlist_config)
+        performance = dict(self.defaults)
+        performance.update(self._lookup(playlist.get("profile"), f"{where}.profile"))
+        performance.update(validate_settings(playlist.get("overrides", {}), f"{where}.overrides"))
+        playlist["performance"] = performance
+
+        smb_configs = []
+        for index, smb_config in enumerate(get_smb_configs(playlist)):
+            server_where = f"{where}.smb_config[{index}]"
+            server_profile = self._lookup(smb_config.get("profile"), f"{server_where}.profile")
+            server_performance = dict(performance)
+            server_performance.update({key: value for key, value in server_profile.items() if key in SERVER_KEYS})
+            server_performance.update(
+                validate_settings(smb_config.get("overrides", {}), f"{server_where}.overrides", SERVER_KEYS)
+            )
+            smb_configs.append(dict(smb_config, performance=server_performance))
+        playlist["smb_config"] = smb_configs
+        return playlist
+
+    def apply_all(self, playlists: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Применить профили ко всем плейлистам (ошибки - ProfileConfigError)"""
+        return [self.apply(playlist, f"playlists[{index}]") for index, playlist in enumerate(playlists)]
+
+
+def yt_dlp_options(base_options: Dict[str, Any], performance: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Опции yt-dlp с учетом настроек кодирования профиля
+
+    Args:
+        base_options: Базовые опции (config.YT_DLP_OPTIONS)
+        performance: Настройки профиля плейлиста (None - базовые опции)
+    """
+    options = copy.deepcopy(base_options)
+    if not performance:
+        return options
+    # Без ffmpeg формат выбирается по наличию конвертации (см. config), его не меняем
+    if options.get("postprocessors"):
+        options["format"] = performance["format"]
+        for postprocessor in options["postprocessors"]:
+            if postprocessor.get("key") == "FFmpegExtractAudio":
+                postprocessor["preferredquality"] = performance["quality"]
+    return options
+
+
+def load_settings_file(path: str) -> Dict[str, Any]:
+    """
+    Прочитать файл настроек (.toml или .yaml/.yml)
+
+    Строковые значения вида "${ИМЯ}" заменяются переменными окружения
+    (неустановленная переменная - пустая строка), поэтому пароли можно
+    хранить в .env, а не в файле настроек.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    try:
+        if extension == ".toml":
+            try:
+                import tomllib
+            except ImportError:  # Python < 3.11
+                import tomli as tomllib
+            with open(path, "rb") as f:
+                data = tomllib.load(f)
+        elif extension in (".yaml", ".yml"):
+            try:
+                import yaml
+            except ImportError:
+                raise ProfileConfigError(f"{path}: для YAML нужен пакет PyYAML (pip install pyyaml)")
+            with open(path, "r", encoding="utf-8") as f:
+                data = yaml.safe_load(f) or {}
+        else:
+            raise ProfileConfigError(f"{path}: поддерживаются файлы .toml, .yaml и .yml")
+    except ProfileConfigError:
+        raise
+    except Exception as e:
+        raise ProfileConfigError(f"{path}: не удалось прочитать файл: {e}")
+
+    if not isinstance(data, dict):
+        raise ProfileConfigError(f"{path}: ожидается таблица верхнего уровня")
+    unknown = set(data) - {"profiles", "playlists"}
+    if unknown:
+        raise ProfileConfigError(f"{path}: неизвестные разделы: {', '.join(sorted(unknown))}")
+    return _expand_env(data)
+
+
+def _expand_env(value: Any) -> Any:
+    """Подставить переменные окружения в строковые значения"""
+    if isinstance(value, str):
+        return _ENV_REFERENCE.sub(lambda match: os.environ.get(match.group(1), ""), value)
+    if isinstance(value, list):
+        return [_expand_env(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _expand_env(item) for key, item in value.items()}
+    return value
+
+
+def load_playlists(
+    playlists: List[Dict[str, Any]],
+    profiles: Dict[str, Dict[str, Any]],
+    settings_file: Optional[str] = None,
+    defaults: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Собрать итоговую конфигурацию плейлистов с профилями
+
+    Профили из файла дополняют и переопределяют профили из config.py;
+    плейлисты из файла (если заданы) заменяют PLAYLISTS_CONFIG.
+
+    Args:
+        playlists: Плейлисты из config.py
+        profiles: Профили из config.py
+        settings_file: Внешний файл настроек (None или отсутствующий файл - не используется)
+        defaults: Глобальные настройки из config.py
+
+    Returns:
+        Плейлисты с ключами "performance" (ошибки - ProfileConfigError)
+    """
+    profiles = dict(profiles)
+    if settings_file and os.path.exists(settings_file):
+        data = load_settings_file(settings_file)
+        profiles.update(data.get("profiles", {}))
+        if "playlists" in data:
+            playlists = data["playlists"]
+            if not isinstance(playlists, list):
+                raise ProfileConfigError(f"{settings_file}: playlists должен быть списком")
+            for index, playlist in enumerate(playlists):
+                missing = [key for key in ("url", "folder", "smb_config") if key not in playlist]
+                if missing:
+                    raise ProfileConfigError(f"playlists[{index}]: не заданы {', '.join(missing)}")
+
+    return PerformanceProfiles(profiles, defaults).apply_all(playlists)
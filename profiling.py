@@ -0,0 +1,208 @@
+"""
+Профилирование запуска синхронизации (cProfile и tracemalloc)
+"""
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional
+
+# Имя профиля для кода вне этапов
+RUN_PROFILE = "other"
+
+
+class StageProfiler:
+    """
+    Профилировщик этапов синхронизации.
+
+    Каждый этап (см. metrics.STAGE_*) профилируется отдельным cProfile в том
+    потоке, где он выполняется, поэтому учитываются и загрузки в потоках
+    зеркал. В одном потоке одновременно активен только один профиль: при
+    входе в этап профиль объемлющего кода приостанавливается. Python 3.12+
+    допускает один активный профиль на процесс: этап, начавшийся при чужом
+    активном профиле, только учитывается по времени (столбец unprofiled
+    сводки), а сам этап выполняется как обычно.
+
+    Если указан список этапов, профилируются только они; иначе профилируется
+    весь запуск (код вне этапов попадает в профиль "other").
+    """
+
+    def __init__(
+        self,
+        output_dir: str,
+        stages: Optional[Iterable[str]] = None,
+        trace_memory: bool = False,
+        top: int = 30
+    ):
+        """
+        Args:
+            output_dir: Базовая папка; отчеты пишутся в ее подпапку с датой запуска
+            stages: Этапы для профилирования (None - все этапы и код вне их)
+            trace_memory: Отслеживать выделения памяти (tracemalloc)
+            top: Количество строк в текстовых отчетах
+        """
+        self.run_dir = os.path.join(output_dir, datetime.now().strftime("%Y%m%d-%H%M%S"))
+        self.stages = set(stages) if stages else None
+        self.trace_memory = trace_memory
+        self.top = top
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._profiles: Dict[str, List[cProfile.Profile]] = {}
+        self._stage_seconds: Dict[str, float] = {}
+        self._stage_calls: Dict[str, int] = {}
+        self._unprofiled: Dict[str, int] = {}
+
+    def _active(self) -> List[cProfile.Profile]:
+        """Стек профилей текущего потока"""
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    @staticmethod
+    def _enable(profile: cProfile.Profile) -> bool:
+        """Включить профиль; False, если уже активен другой профилировщик (Python 3.12+)"""
+        try:
+            profile.enable()
+        except ValueError:
+            return False
+        return True
+
+    @contextmanager
+    def _profile(self, name: str):
+        """Профилировать блок, приостановив профиль объемлющего кода"""
+        stack = self._active()
+        if stack:
+            stack[-1].disable()
+        profile = cProfile.Profile()
+        started = time.perf_counter()
+        # Ошибка профилировщика не должна прерывать сам этап
+        if self._enable(profile):
+            stack.append(profile)
+        else:
+            profile = None
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+                stack.pop()
+            elapsed = time.perf_counter() - started
+            if stack:
+                self._enable(stack[-1])
+            with self._lock:
+                if profile is not None:
+                    self._profiles.setdefault(name, []).append(profile)
+                else:
+                    self._unprofiled[name] = self._unprofiled.get(name, 0) + 1
+                self._stage_seconds[name] = self._stage_seconds.get(name, 0.0) + elapsed
+                self._stage_calls[name] = self._stage_calls.get(name, 0) + 1
+
+    @contextmanager
+    def stage(self, stage: str):
+        """Профилировать этап, если он выбран"""
+        if self.stages is not None and stage not in self.stages:
+            yield
+            return
+        with self._profile(stage):
+            yield
+
+    def run(self, func: Callable[[], None]) -> None:
+        """
+        Выполнить запуск под профилировщиком и записать отчеты
+
+        Args:
+            func: Функция запуска (например, synchronizer.sync)
+        """
+        if self.trace_memory:
+            tracemalloc.start(25)
+        try:
+            if self.stages is None:
+                with self._profile(RUN_PROFILE):
+                    func()
+            else:
+                func()
+        finally:
+            self.write_reports()
+            if self.trace_memory:
+                tracemalloc.stop()
+
+    def write_reports(self) -> str:
+        """
+        Записать профили этапов, сводку и отчет о выделениях памяти
+
+        Returns:
+            Путь к папке с отчетами
+        """
+        os.makedirs(self.run_dir, exist_ok=True)
+        # Снимок памяти делается до построения отчетов cProfile, чтобы они в него не попали
+        memory_summary = None
+        if self.trace_memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            memory_summary = f"\nmemory: current {current / 1024 / 1024:.1f} MB, peak {peak / 1024 / 1024:.1f} MB"
+            self._write_allocations(os.path.join(self.run_dir, "allocations.txt"))
+
+        with self._lock:
+            profiles = {name: list(items) for name, items in self._profiles.items()}
+            names = sorted(self._stage_calls)
+
+        combined = None
+        summary = [f"{'stage':<12} {'calls':>7} {'seconds':>10} {'unprofiled':>11}"]
+        for name in names:
+            summary.append(
+                f"{name:<12} {self._stage_calls[name]:>7} {self._stage_seconds[name]:>10.3f} "
+                f"{self._unprofiled.get(name, 0):>11}"
+            )
+            if name not in profiles:
+                continue
+            stats = pstats.Stats(*profiles[name])
+            stats.dump_stats(os.path.join(self.run_dir, f"{name}.prof"))
+            self._write_text(os.path.join(self.run_dir, f"{name}.txt"), stats)
+            if combined is None:
+                combined = pstats.Stats(*profiles[name])
+            else:
+                combined.add(*profiles[name])
+
+        # Общий профиль всех этапов для просмотра в snakeviz / pstats
+        if combined is not None:
+            combined.dump_stats(os.path.join(self.run_dir, "sync.prof"))
+            self._write_text(os.path.join(self.run_dir, "sync.txt"), combined)
+
+        if memory_summary:
+            summary.append(memory_summary)
+
+        with open(os.path.join(self.run_dir, "summary.txt"), "w", encoding="utf-8") as f:
+            f.write("\n".join(summary) + "\n")
+        return self.run_dir
+
+    def _write_text(self, path: str, stats: pstats.Stats) -> None:
+        """Записать текстовый отчет: по суммарному и по собственному времени"""
+        stream = io.StringIO()
+        stats.stream = stream
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top)
+        stats.sort_stats(pstats.SortKey.TIME).print_stats(self.top)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(stream.getvalue())
+
+    def _write_allocations(self, path: str) -> None:
+        """Записать места с наибольшим объемом выделенной памяти"""
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, cProfile.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"Top {self.top} allocations by line\n\n")
+            for index, stat in enumerate(snapshot.statistics("lineno")[:self.top], 1):
+                f.write(f"#{index}: {stat.traceback[0].filename}:{stat.traceback[0].lineno} "
+                        f"{stat.size / 1024:.1f} KiB in {stat.count} blocks\n")
+            f.write(f"\nTop {min(self.top, 10)} allocation stacks\n\n")
+            for stat in snapshot.statistics("traceback")[:min(self.top, 10)]:
+                f.write(f"{stat.size / 1024:.1f} KiB in {stat.count} blocks\n")
+                for line in stat.traceback.format(limit=8):
+                    f.write(f"{line}\n")
+                f.write("\n")
@@ -0,0 +1,243 @@
+"""
+Сводный прогресс синхронизации: передачи, оставшиеся треки и ETA
+"""
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional, TextIO
+
+# Сглаживание измеренной скорости этапов (доля нового замера)
+RATE_SMOOTHING = 0.3
+
+
+class Transfer:
+    """Одна передача файла (загрузка с YouTube или запись на сервер)"""
+
+    __slots__ = ("stage", "name", "server", "total", "done", "started", "last_done", "last_time", "speed")
+
+    def __init__(self, stage: str, name: str, server: str, total: int):
+        self.stage = stage
+        self.name = name
+        self.server = server
+        self.total = total
+        self.done = 0
+        self.started = time.monotonic()
+        self.last_done = 0
+        self.last_time = self.started
+        self.speed = 0.0
+
+
+class ProgressTracker:
+    """
+    Единая точка учета прогресса для всех потоков.
+
+    Рабочие потоки только обновляют счетчики байтов (без блокировок и
+    форматирования), а отображение и файл состояния формируются отдельным
+    потоком раз в refresh_interval секунд. Поэтому стоимость обновления
+    не зависит от количества одновременных передач.
+
+    ETA считается по измеренной скорости этапов: для каждого этапа
+    (загрузка, запись на каждый сервер) известно среднее время на трек,
+    а конвейер обрабатывает треки со скоростью самого медленного этапа.
+    """
+
+    def __init__(
+        self,
+        display: bool = False,
+        status_file: Optional[str] = None,
+        refresh_interval: float = 1.0,
+        stream: Optional[TextIO] = None
+    ):
+        """
+        Args:
+            display: Показывать строку прогресса в терминале
+            status_file: Файл состояния в формате JSON (None - не записывать)
+            refresh_interval: Период обновления отображения и файла (секунды)
+            stream: Поток вывода строки прогресса (по умолчанию stderr)
+        """
+        self.display = display
+        self.status_file = status_file
+        self.refresh_interval = refresh_interval
+        self.stream = stream or sys.stderr
+        self._lock = threading.Lock()
+        self._transfers: Dict[int, Transfer] = {}
+        self._next_id = 0
+        self._rates: Dict[str, float] = {}
+        self._track_bytes = 0.0
+        self._playlist = ""
+        self._playlist_index = (0, 0)
+        self._tracks_total = 0
+        self._tracks_done = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        """Нужно ли вообще собирать прогресс"""
+        return self.display or bool(self.status_file)
+
+    def start(self) -> None:
+        """Запустить поток обновления отображения"""
+        if not self.enabled or self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="progress", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Остановить поток обновления и вывести итоговое состояние"""
+        if not self._thread:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.refresh()
+        if self.display:
+            self.stream.write("\n")
+            self.stream.flush()
+
+    def set_playlist(self, index: int, count: int, name: str, tracks_total: int) -> None:
+        """Начать учет плейлиста"""
+        with self._lock:
+            self._playlist = name
+            self._playlist_index = (index, count)
+            self._tracks_total = tracks_total
+            self._tracks_done = 0
+
+    def track_done(self) -> None:
+        """Отметить обработку трека"""
+        with self._lock:
+            self._tracks_done += 1
+
+    def start_transfer(self, stage: str, name: str, total: int = 0, server: str = "") -> int:
+        """
+        Начать учет передачи
+
+        Returns:
+            Идентификатор передачи для update_transfer/finish_transfer
+        """
+        if not self.enabled:
+            return 0
+        with self._lock:
+            self._next_id += 1
+            self._transfers[self._next_id] = Transfer(stage, name, server, total)
+            return self._next_id
+
+    def update_transfer(self, transfer_id: int, done: int, total: Optional[int] = None) -> None:
+        """Обновить количество переданных байт (дешевый вызов для горячего цикла)"""
+        transfer = self._transfers.get(transfer_id)
+        if transfer is None:
+            return
+        transfer.done = done
+        if total:
+            transfer.total = total
+
+    def finish_transfer(self, transfer_id: int) -> None:
+        """Завершить передачу и учесть измеренную скорость этапа"""
+        with self._lock:
+            transfer = self._transfers.pop(transfer_id, None)
+            if transfer is None or not transfer.done:
+                return
+            elapsed = max(time.monotonic() - transfer.started, 1e-6)
+            key = self._stage_key(transfer)
+            rate = transfer.done / elapsed
+            previous = self._rates.get(key)
+            self._rates[key] = rate if previous is None else previous + RATE_SMOOTHING * (rate - previous)
+            if transfer.stage == "download":
+                self._track_bytes = transfer.done if not self._track_bytes else (
+                    self._track_bytes + RATE_SMOOTHING * (transfer.done - self._track_bytes)
+                )
+
+    @staticmethod
+    def _stage_key(transfer: Transfer) -> str:
+        return f"{transfer.stage}:{transfer.server}" if transfer.server else transfer.stage
+
+    def _eta(self, transfers) -> Optional[float]:
+        """Оценить оставшееся время по скорости самого медленного этапа"""
+        if not self._rates or not self._track_bytes:
+            return None
+        seconds_per_track = max(self._track_bytes / rate for rate in self._rates.values())
+        remaining_tracks = max(self._tracks_total - self._tracks_done, 0)
+
+        # Дописывание уже начатых передач (зеркала пишут параллельно)
+        in_flight = 0.0
+        for transfer in transfers:
+            rate = self._rates.get(self._stage_key(transfer))
+            if rate and transfer.total > transfer.done:
+                in_flight = max(in_flight, (transfer.total - transfer.done) / rate)
+        return remaining_tracks * seconds_per_track + in_flight
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Получить текущее состояние (для файла состояния)"""
+        now = time.monotonic()
+        with self._lock:
+            transfers = list(self._transfers.values())
+            for transfer in transfers:
+                elapsed = now - transfer.last_time
+                if elapsed >= 0.5:
+                    transfer.speed = (transfer.done - transfer.last_done) / elapsed
+                    transfer.last_done, transfer.last_time = transfer.done, now
+            eta = self._eta(transfers)
+            return {
+                "updated": datetime.now().isoformat(timespec="seconds"),
+                "playlist": self._playlist,
+                "playlist_index": self._playlist_index[0],
+                "playlist_count": self._playlist_index[1],
+                "tracks_total": self._tracks_total,
+                "tracks_done": self._tracks_done,
+                "eta_seconds": round(eta) if eta is not None else None,
+                "throughput": {key: round(rate) for key, rate in self._rates.items()},
+                "transfers": [
+                    {
+                        "stage": transfer.stage, "name": transfer.name, "server": transfer.server,
+                        "done": transfer.done, "total": transfer.total, "speed": round(transfer.speed),
+                    }
+                    for transfer in transfers
+                ],
+            }
+
+    def refresh(self) -> None:
+        """Обновить строку прогресса и файл состояния"""
+        state = self.snapshot()
+        if self.display:
+            self.stream.write("\r\x1b[K" + self.format_line(state))
+            self.stream.flush()
+        if self.status_file:
+            self._write_status(state)
+
+    @staticmethod
+    def format_line(state: Dict[str, Any]) -> str:
+        """Сформировать компактную строку прогресса"""
+        parts = [
+            f"[{state['playlist_index']}/{state['playlist_count']}] "
+            f"треки {state['tracks_done']}/{state['tracks_total']}"
+        ]
+        for transfer in state["transfers"]:
+            arrow = "↓" if transfer["stage"] == "download" else f"↑{transfer['server']}"
+            if transfer["total"]:
+                done = f"{transfer['done'] * 100 // transfer['total']}%"
+            else:
+                done = f"{transfer['done'] / 1048576:.1f} MB"
+            parts.append(f"{arrow} {done} {transfer['speed'] / 1048576:.1f} MB/s")
+        if state["eta_seconds"] is not None:
+            minutes, seconds = divmod(state["eta_seconds"], 60)
+            parts.append(f"ETA {minutes}m{seconds:02d}s")
+        return " | ".join(parts)
+
+    def _write_status(self, state: Dict[str, Any]) -> None:
+        """Записать файл состояния (атомарная замена)"""
+        tmp_file = f"{self.status_file}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.status_file) or ".", exist_ok=True)
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(state, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, self.status_file)
+        except OSError:
+            pass
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.refresh_interval):
+            self.refresh()
@@ -0,0 +1,158 @@
+"""
+Сверка трекера загрузок с содержимым папок на SMB серверах
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
+from interfaces import IPlaylistExtractor, IDownloadTracker, ILogger
+from destinations import get_smb_configs, destination_key
+from m3u_manifest import M3UManifest
+from naming import base_name, collision_name
+from smb_uploader import SMBFileUploader
+from resilience import ResilientCaller
+
+
+class TrackerReconciler:
+    """
+    Сверка записей трекера с файлами на серверах.
+
+    Каждая папка назначения читается одним листингом (имена и размеры),
+    папки обрабатываются параллельно. По результатам сверки:
+    - отсутствующие файлы и файлы с неверным размером ставятся в очередь
+      на повторную загрузку (снимается отметка о доставке);
+    - файлы видео из плейлиста, которые есть на сервере, но не учтены
+      трекером, принимаются как доставленные.
+    """
+
+    def __init__(
+        self,
+        playlist_extractor: IPlaylistExtractor,
+        download_tracker: IDownloadTracker,
+        logger: ILogger,
+        m3u_manifest: Optional[M3UManifest] = None,
+        max_workers: int = 8,
+        resilience: Optional[ResilientCaller] = None
+    ):
+        self.playlist_extractor = playlist_extractor
+        self.download_tracker = download_tracker
+        self.logger = logger
+        self.m3u_manifest = m3u_manifest
+        self.max_workers = max_workers
+        # Общий предохранитель: папки недоступного сервера не ждут таймаута каждая
+        self.resilience = resilience or ResilientCaller(logger)
+
+    def reconcile(self, playlists_config: List[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Сверить трекер со всеми назначениями плейлистов
+
+        Args:
+            playlists_config: Конфигурация плейлистов (PLAYLISTS_CONFIG)
+
+        Returns:
+            Итоги сверки: requeued, adopted, verified, unreachable
+        """
+        # Собираем уникальные папки назначения и плейлисты, которые в них пишут
+        folders: Dict[str, Dict[str, Any]] = {}
+        for playlist_config in playlists_config:
+            for smb_config in get_smb_configs(playlist_config):
+                destination = destination_key(smb_config, playlist_config["folder"])
+                folder = folders.setdefault(destination, {
+                    "smb_config": smb_config, "folder": playlist_config["folder"], "urls": []
+                })
+                folder["urls"].append(playlist_config["url"])
+
+        urls = sorted({url for folder in folders.values() for url in folder["urls"]})
+        self.logger.info(f"Сверка: {len(folders)} папок, {len(urls)} плейлистов")
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            # Плейлисты и папки перечисляются параллельно
+            videos_future = {url: executor.submit(self.playlist_extractor.get_video_list, url) for url in urls}
+            listing_future = {
+                destination: executor.submit(self._list_folder, folder["smb_config"], folder["folder"])
+                for destination, folder in folders.items()
+            }
+            playlist_videos = {url: future.result() for url, future in videos_future.items()}
+            listings = {destination: future.result() for destination, future in listing_future.items()}
+
+        totals = {"requeued": 0, "adopted": 0, "verified": 0, "unreachable": 0}
+        for destination, folder in folders.items():
+            listing = listings[destination]
+            if listing is None:
+                totals["unreachable"] += 1
+                continue
+            videos = [video for url in folder["urls"] for video in playlist_videos[url]]
+            for key, value in self._reconcile_folder(destination, listing, videos).items():
+                totals[key] += value
+
+        self.download_tracker.flush()
+        if self.m3u_manifest:
+            self.m3u_manifest.save()
+
+        self.logger.info(
+            f"Сверка завершена: подтверждено {totals['verified']}, поставлено в очередь {totals['requeued']}, "
+            f"принято {totals['adopted']}, недоступных папок {totals['unreachable']}"
+        )
+        return totals
+
+    def _list_folder(self, smb_config: Dict[str, Any], folder: str) -> Optional[Dict[str, int]]:
+        """Прочитать содержимое папки назначения (None если сервер недоступен)"""
+        uploader = SMBFileUploader(self.logger, resilience=self.resilience)
+        if not uploader.connect(smb_config, folder):
+            return None
+        try:
+            return self.resilience.call("smb_read", smb_config['server'], uploader.list_remote_files)
+        except Exception as e:
+            self.logger.error(f"Не удалось прочитать папку {destination_key(smb_config, folder)}: {e}")
+            return None
+        finally:
+            uploader.disconnect()
+
+    def _reconcile_folder(
+        self,
+        destination: str,
+        listing: Dict[str, int],
+        videos: List[Dict[str, Any]]
+    ) -> Dict[str, int]:
+        """Сверить одну папку назначения с записями трекера"""
+        result = {"requeued": 0, "adopted": 0, "verified": 0}
+        deliveries = self.download_tracker.get_deliveries(destination)
+
+        # Учтенные доставки: файл должен существовать и иметь записанный размер
+        for video_id, delivery in deliveries.items():
+            remote_size = listing.get(delivery["file"])
+            if remote_size is not None and (not delivery["size"] or remote_size == delivery["size"]):
+                result["verified"] += 1
+                continue
+
+            reason = "отсутствует" if remote_size is None else f"размер {remote_size} != {delivery['size']}"
+            self.logger.warning(f"{destination}: {delivery['file']} {reason}, ставим в очередь")
+            self.download_tracker.remove_delivery(video_id, destination)
+            if self.m3u_manifest:
+                self.m3u_manifest.remove_track(destination, video_id)
+            result["requeued"] += 1
+
+        # Видео без учтенной доставки: принимаем найденные файлы
+        for video in videos:
+            video_id = video.get('id', '')
+            if not video_id or video_id in deliveries:
+                continue
+
+            title = video.get('title', '')
+            candidates = [self.download_tracker.get_delivered_file(video_id, destination),
+                          f"{base_name(title)}.mp3", f"{collision_name(title, video_id)}.mp3"]
+            remote_file = next((name for name in candidates if name and name in listing), None)
+            if remote_file:
+                self.download_tracker.mark_delivered(video_id, destination, remote_file, listing[remote_file])
+                if self.m3u_manifest:
+                    self.m3u_manifest.record_track(destination, video, remote_file)
+                result["adopted"] += 1
+            elif self.download_tracker.is_delivered(video_id, destination):
+                # Старая запись считается доставленной везде, но файла нет
+                self.logger.warning(f"{destination}: файл для {video_id} не найден, ставим в очередь")
+                self.download_tracker.remove_delivery(video_id, destination)
+                result["requeued"] += 1
+
+        self.logger.info(
+            f"{destination}: подтверждено {result['verified']}, в очередь {result['requeued']}, "
+            f"принято {result['adopted']}"
+        )
+        return result
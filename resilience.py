@@ -0,0 +1,209 @@
+"""
+Повторные попытки с экспоненциальной задержкой и предохранитель (circuit breaker) по хостам
+"""
+import random
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from interfaces import ILogger
+from video_state import is_permanent_error
+
+# Ошибки SMB, которые не исчезнут при повторной попытке (учетные данные, права, путь)
+PERMANENT_SMB_PATTERNS = re.compile(
+    r"STATUS_LOGON_FAILURE|STATUS_ACCESS_DENIED|STATUS_ACCOUNT_|STATUS_BAD_NETWORK_NAME|"
+    r"STATUS_OBJECT_PATH_NOT_FOUND|STATUS_OBJECT_NAME_NOT_FOUND|STATUS_PASSWORD_|STATUS_DISK_FULL",
+    re.IGNORECASE
+)
+
+# Настройки повторов по типам операций: attempts, base_delay, max_delay (секунды)
+DEFAULT_OPERATION_RETRIES = {
+    "youtube_playlist": {"attempts": 3, "base_delay": 2.0, "max_delay": 30.0},
+    "youtube_metadata": {"attempts": 3, "base_delay": 2.0, "max_delay": 30.0},
+    "youtube_download": {"attempts": 2, "base_delay": 5.0, "max_delay": 60.0},
+    "smb_connect": {"attempts": 2, "base_delay": 1.0, "max_delay": 5.0},
+    "smb_write": {"attempts": 3, "base_delay": 1.0, "max_delay": 10.0},
+    "smb_read": {"attempts": 3, "base_delay": 1.0, "max_delay": 10.0},
+}
+
+# Хост предохранителя для всех запросов к YouTube
+YOUTUBE_HOST = "youtube"
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half-open"
+
+
+class CircuitOpenError(Exception):
+    """Хост отключен предохранителем: операция не выполнялась"""
+
+
+def is_retryable(error: Exception) -> bool:
+    """Имеет ли смысл повторять операцию после этой ошибки"""
+    if isinstance(error, CircuitOpenError):
+        return False
+    message = str(error)
+    return not (is_permanent_error(message) or PERMANENT_SMB_PATTERNS.search(message))
+
+
+class CircuitBreaker:
+    """
+    Предохранитель одного хоста.
+
+    После failure_threshold ошибок подряд хост считается недоступным и
+    операции с ним сразу завершаются CircuitOpenError. Через reset_timeout
+    секунд пропускается одна пробная операция: успех восстанавливает хост,
+    ошибка снова отключает его.
+    """
+
+    def __init__(self, failure_threshold: int = 4, reset_timeout: float = 300.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CIRCUIT_CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Можно ли выполнить операцию сейчас"""
+        with self._lock:
+            if self.state == CIRCUIT_CLOSED:
+                return True
+            if self.state == CIRCUIT_OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = CIRCUIT_HALF_OPEN
+            if self.state == CIRCUIT_HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = CIRCUIT_CLOSED
+            self.failures = 0
+            self._trial_running = False
+
+    def record_failure(self) -> bool:
+        """
+        Учесть ошибку
+
+        Returns:
+            True если предохранитель только что сработал
+        """
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.state == CIRCUIT_HALF_OPEN or (
+                self.state == CIRCUIT_CLOSED and self.failures >= self.failure_threshold
+            ):
+                self.state = CIRCUIT_OPEN
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+
+class ResilientCaller:
+    """
+    Выполнение сетевых операций с повторами и предохранителями по хостам.
+
+    Для каждого типа операции свои настройки повторов; задержка растет
+    экспоненциально и выбирается случайно в пределах [0, задержка] (full jitter),
+    чтобы параллельные потоки не повторяли запросы одновременно. Ошибки
+    учитываются предохранителем хоста: недоступный сервер быстро отключается,
+    а работа с остальными серверами продолжается.
+
+    Постоянные ошибки (видео удалено, неверный пароль) не повторяются и не
+    учитываются предохранителем.
+    """
+
+    def __init__(
+        self,
+        logger: ILogger,
+        operations: Optional[Dict[str, Dict[str, float]]] = None,
+        failure_threshold: int = 4,
+        reset_timeout: float = 300.0,
+        metrics=None,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        """
+        Args:
+            logger: Логгер
+            operations: Настройки повторов по типам операций (дополняют DEFAULT_OPERATION_RETRIES)
+            failure_threshold: Ошибок подряд до отключения хоста
+            reset_timeout: Через сколько секунд пробовать отключенный хост снова
+            metrics: Сборщик метрик (повторы и срабатывания предохранителей)
+            sleep: Функция ожидания (для бенчмарков и проверок)
+        """
+        self.logger = logger
+        self.operations = {name: dict(settings) for name, settings in DEFAULT_OPERATION_RETRIES.items()}
+        for name, settings in (operations or {}).items():
+            self.operations.setdefault(name, {}).update(settings)
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.metrics = metrics
+        self._sleep = sleep
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, host: str) -> CircuitBreaker:
+        """Предохранитель хоста"""
+        with self._lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return self._breakers[host]
+
+    def is_available(self, host: str) -> bool:
+        """Не отключен ли хост предохранителем (без пробной операции)"""
+        breaker = self.breaker(host)
+        return breaker.state != CIRCUIT_OPEN or time.monotonic() - breaker.opened_at >= breaker.reset_timeout
+
+    def delay(self, operation: str, attempt: int) -> float:
+        """Задержка перед повтором номер attempt (с 1)"""
+        settings = self.operations.get(operation, {})
+        cap = min(settings.get("max_delay", 30.0), settings.get("base_delay", 1.0) * 2 ** (attempt - 1))
+        return random.uniform(0, cap)
+
+    def call(self, operation: str, host: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Выполнить операцию с повторами
+
+        Args:
+            operation: Тип операции (ключ настроек повторов)
+            host: Хост (сервер SMB или "youtube") для предохранителя
+
+        Returns:
+            Результат func
+
+        Raises:
+            CircuitOpenError: Хост отключен предохранителем
+            Exception: Последняя ошибка операции
+        """
+        attempts = max(1, int(self.operations.get(operation, {}).get("attempts", 1)))
+        breaker = self.breaker(host)
+        for attempt in range(1, attempts + 1):
+            if not breaker.allow():
+                raise CircuitOpenError(f"{host} временно отключен после ошибок подряд ({operation})")
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                if not is_retryable(e):
+                    # Хост ответил (ошибка относится к запросу, а не к доступности)
+                    breaker.record_success()
+                    raise
+                if breaker.record_failure():
+                    self.logger.warning(
+                        f"{host} отключен на {self.reset_timeout:.0f} с после {breaker.failures} ошибок подряд: {e}"
+                    )
+                    if self.metrics:
+                        self.metrics.inc("circuit_open_total", host=host)
+                if attempt == attempts or breaker.state == CIRCUIT_OPEN:
+                    raise
+                delay = self.delay(operation, attempt)
+                self.logger.warning(f"{operation} на {host}: ошибка ({e}), повтор {attempt}/{attempts - 1} через {delay:.1f} с")
+                if self.metrics:
+                    self.metrics.inc("retries_total", operation=operation, host=host)
+                self._sleep(delay)
+            else:
+                breaker.record_success()
+                return result
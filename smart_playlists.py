@@ -0,0 +1,122 @@
+"""
+Генератор смарт-плейлистов по всем папкам библиотеки
+"""
+import glob
+import posixpath
+from collections import Counter
+from typing import List, Dict, Any
+from interfaces import ILogger
+from catalogue import TrackCatalogue
+from destinations import destination_key
+from m3u_manager import M3UPlaylistManager
+from m3u_manifest import M3UManifest
+from naming import sanitize_filename
+
+
+class SmartPlaylistGenerator:
+    """
+    Создание M3U8 плейлистов по правилам на основе каталога треков.
+
+    Каталог строится один раз, после чего за один проход вычисляются и
+    записываются все смарт-плейлисты. Плейлист перезаписывается только если
+    его содержимое изменилось.
+    """
+
+    def __init__(self, m3u_manager: M3UPlaylistManager, manifest: M3UManifest, logger: ILogger):
+        self.m3u_manager = m3u_manager
+        self.manifest = manifest
+        self.logger = logger
+
+    def generate(self, smart_playlists: List[Dict[str, Any]]) -> int:
+        """
+        Сгенерировать все смарт-плейлисты
+
+        Каждый элемент smart_playlists содержит:
+            name: Имя файла (.m3u8); для group_by допускается шаблон "{group}"
+            smb_config: SMB шара, на которой лежат треки и будет записан плейлист
+            folder: Папка для плейлиста на этой шаре
+            rules: Правила выборки (см. TrackCatalogue.query)
+            group_by: "uploader" или "folder" - по плейлисту на каждую группу
+                (группа папки - ее полный путь на шаре, "/" в имени файла заменяется на "_")
+
+        Args:
+            smart_playlists: Конфигурация смарт-плейлистов
+
+        Returns:
+            Количество записанных (измененных) плейлистов
+        """
+        catalogue = TrackCatalogue.from_manifest(self.manifest)
+        self.logger.info(f"Каталог содержит {len(catalogue.tracks)} треков, генерируем смарт-плейлисты")
+
+        written = 0
+        for smart_config in smart_playlists:
+            try:
+                written += self._generate_one(catalogue, smart_config)
+            except Exception as e:
+                self.logger.error(f"Ошибка при создании смарт-плейлиста {smart_config.get('name')}: {e}")
+
+        self.manifest.save()
+        self.logger.info(f"Смарт-плейлисты обновлены: {written}")
+        return written
+
+    def _generate_one(self, catalogue: TrackCatalogue, smart_config: Dict[str, Any]) -> int:
+        """Сгенерировать один смарт-плейлист (или группу плейлистов)"""
+        smb_config = smart_config["smb_config"]
+        server, share = smb_config["server"], smb_config["share"]
+        rules = dict(smart_config.get("rules", {}))
+        group_by = smart_config.get("group_by")
+
+        if group_by == "uploader":
+            groups = {uploader: dict(rules, uploader=uploader) for uploader in catalogue.get_uploaders(server, share)}
+        elif group_by == "folder":
+            # Группа - полный путь: одноименные папки в разных местах не сливаются,
+            # правило папки экранируется, чтобы скобки в имени не читались как маска
+            folders = sorted({track["folder"] for track in catalogue.query(rules, server, share)})
+            groups = {folder: dict(rules, folder=glob.escape(folder)) for folder in folders}
+        else:
+            groups = {None: rules}
+
+        names = {
+            group: smart_config["name"] if group is None else smart_config["name"].format(group=sanitize_filename(group))
+            for group in groups
+        }
+        collisions = sorted(name for name, count in Counter(names.values()).items() if count > 1)
+        if collisions:
+            self.logger.error(
+                f"Смарт-плейлист {smart_config['name']}: разные группы получают одно имя файла "
+                f"({', '.join(collisions)}), пропускаем"
+            )
+            return 0
+
+        written = 0
+        for group, group_rules in groups.items():
+            tracks = catalogue.query(group_rules, server, share)
+            name = names[group]
+            if not tracks:
+                self.logger.info(f"Смарт-плейлист пуст, пропускаем: {name}")
+                continue
+            written += self._write(smb_config, smart_config["folder"], name, tracks)
+        return written
+
+    def _write(self, smb_config: Dict[str, Any], folder: str, name: str, tracks: List[Dict[str, Any]]) -> int:
+        """Записать смарт-плейлист с относительными путями к трекам"""
+        playlist_folder = folder.replace('\\', '/').strip('/')
+        entries = [
+            {
+                "file": posixpath.relpath(posixpath.join(track["folder"], track["file"]), playlist_folder),
+                "title": track["title"],
+                "duration": track["duration"],
+            }
+            for track in tracks
+        ]
+
+        playlist_key = f"{destination_key(smb_config, folder)}/{name}"
+        previous_hash = self.manifest.get_smart_hash(playlist_key)
+        content_hash = self.m3u_manager.write_m3u_playlist(
+            smb_config, folder, name, entries, previous_hash, create_folder=True
+        )
+        if not content_hash:
+            return 0
+
+        self.manifest.set_smart_hash(playlist_key, content_hash)
+        return int(content_hash != previous_hash)
@@ -2,18 +2,43 @@
 Реализация загрузки файлов на SMB сервер
 """
 import os
+import errno
 import logging
-import hashlib
+import threading
+import time
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Dict, Callable, Optional, Union
 import smbclient
 import smbclient.shutil
-from interfaces import IFileUploader, ILogger
+from interfaces import IFileUploader, IMirroredFileUploader, ILogger
+from logger import ProgressLogger, is_debug_enabled
+from metrics import MetricsRecorder, STAGE_UPLOAD, STAGE_VERIFY
+from destinations import destination_key
+from profiles import DEFAULT_PROFILE
+from resilience import ResilientCaller
+from hashing import hash_file, hash_stream, resolve_algorithm, submit_hash_bytes, submit_hash_file
 
 
 class SMBFileUploader(IFileUploader):
     """Класс для загрузки файлов на SMB сервер с поддержкой множественных конфигураций"""
 
-    def __init__(self, logger: ILogger):
+    # Минимальный интервал между сообщениями о прогрессе чтения (секунды)
+    PROGRESS_LOG_INTERVAL = 5.0
+
+    def __init__(
+        self,
+        logger: ILogger,
+        metrics: Optional[MetricsRecorder] = None,
+        resilience: Optional[ResilientCaller] = None,
+        hash_algorithm: str = "auto"
+    ):
         self.logger = logger
+        self.metrics = metrics or MetricsRecorder()
+        # Повторы и предохранитель сервера (общие для всех подключений к нему)
+        self.resilience = resilience or ResilientCaller(logger)
+        # Алгоритм проверки целостности (см. hashing.resolve_algorithm)
+        self.hash_algorithm = resolve_algorithm(hash_algorithm)
         self.current_connection = None
         self.current_config = None
 
@@ -46,7 +71,8 @@ class SMBFileUploader(IFileUploader):
             # Это автоматически обрабатывает чанки и все сложности SMB протокола
             smbclient.shutil.copyfile(local_path, full_remote_path)
             
-            self.logger.info("Файл записан, проверяем целостность...")
+            if is_debug_enabled(self.logger):
+                self.logger.debug("Файл записан, проверяем целостность...")
             
             # Проверяем целостность файла
             if not self._verify_file_integrity(local_path, full_remote_path):
@@ -64,6 +90,190 @@ class SMBFileUploader(IFileUploader):
             self.logger.error(f"Ошибка при загрузке файла: {e}")
             return False
 
+    def upload_buffer(self, data: bytes, remote_filename: str, expected_hash: Union[str, Future]) -> bool:
+        """
+        Загружает на SMB сервер уже прочитанное содержимое файла
+        
+        Args:
+            data: Содержимое файла
+            remote_filename: Имя файла на SMB сервере
+            expected_hash: Хеш содержимого для проверки целостности (алгоритм
+                hash_algorithm) или Future с ним, если хеш еще вычисляется
+            
+        Returns:
+            True если файл записан и прошел проверку
+        """
+        if not self.current_config:
+            self.logger.error("SMB подключение не настроено. Вызовите connect() сначала.")
+            return False
+        
+        full_remote_path = os.path.join(self.current_config['full_path'], remote_filename).replace('/', '\\')
+        try:
+            self.logger.info(f"Загружаем файл: {remote_filename} -> {full_remote_path}")
+            
+            server = self.current_config['server']
+            performance = self.current_config['performance']
+            chunk_size = performance['write_chunk_size']
+            view = memoryview(data)
+            progress = self.metrics.progress
+            transfer_id = progress.start_transfer("upload", remote_filename, len(data), server)
+            
+            def write() -> None:
+                # Повтор перезаписывает файл целиком (режим 'wb')
+                with smbclient.open_file(full_remote_path, mode='wb') as f:
+                    for offset in range(0, len(view), chunk_size):
+                        f.write(view[offset:offset + chunk_size])
+                        progress.update_transfer(transfer_id, offset + chunk_size)
+            
+            try:
+                with self.metrics.stage(STAGE_UPLOAD, server=server):
+                    self.resilience.call("smb_write", server, write)
+            finally:
+                progress.finish_transfer(transfer_id)
+            self.metrics.inc("bytes_uploaded_total", len(data), server=server)
+            
+            with self.metrics.stage(STAGE_VERIFY, server=server):
+                verified = self.resilience.call(
+                    "smb_read", server,
+                    self._verify_upload, full_remote_path, len(data), expected_hash, performance['verify']
+                )
+            if verified:
+                self.metrics.inc("uploads_total", server=server, result="ok")
+                return True
+            
+            self.metrics.inc("uploads_total", server=server, result="failed")
+            self.logger.error(f"❌ Файл на {self.current_config['server']} не прошел проверку - удаляем файл")
+            try:
+                smbclient.remove(full_remote_path)
+            except Exception as e:
+                self.logger.warning(f"Не удалось удалить поврежденный файл: {e}")
+            return False
+            
+        except Exception as e:
+            self.logger.error(f"Ошибка при загрузке файла на {self.current_config['server']}: {e}")
+            self.metrics.inc("uploads_total", server=self.current_config['server'], result="failed")
+            return False
+
+    @staticmethod
+    def _open_session(server: str, username: str, password: str, base_path: str) -> None:
+        """Зарегистрировать сессию и проверить доступ к шаре"""
+        smbclient.register_session(server, username=username, password=password)
+        smbclient.listdir(base_path)
+
+    def _verify_upload(self, remote_path: str, size: int, expected_hash: Union[str, Future], policy: str) -> bool:
+        """
+        Проверить записанный файл согласно политике профиля
+        
+        Args:
+            remote_path: Путь к файлу на SMB сервере
+            size: Ожидаемый размер
+            expected_hash: Ожидаемый хеш (или Future с ним)
+            policy: hash - чтение и сравнение хеша, size - сравнение размера, none - без проверки
+        """
+        if policy == "none":
+            return True
+        if policy == "size":
+            remote_size = smbclient.stat(remote_path).st_size
+            if remote_size != size:
+                self.logger.error(f"Размер файла на сервере {remote_size} байт, ожидалось {size}")
+            return remote_size == size
+        remote_hash = self._calculate_remote_file_hash(remote_path)
+        if isinstance(expected_hash, Future):
+            expected_hash = expected_hash.result()
+        if remote_hash != expected_hash:
+            self.logger.error("❌ Хеши не совпадают - файл поврежден при загрузке!")
+            return False
+        if is_debug_enabled(self.logger):
+            self.logger.debug("✅ Хеши совпадают - файл загружен корректно!")
+        return True
+
+    def list_remote_files(self, extension: str = '.mp3') -> Dict[str, int]:
+        """
+        Получить файлы папки на SMB сервере с размерами за один запрос
+        
+        Размеры берутся из результата листинга каталога, поэтому отдельные
+        запросы stat для каждого файла не выполняются.
+        
+        Args:
+            extension: Расширение файлов (без учета регистра)
+            
+        Returns:
+            Словарь имя файла -> размер в байтах
+        """
+        files = {}
+        for entry in smbclient.scandir(self.current_config['full_path']):
+            if entry.is_file() and entry.name.lower().endswith(extension):
+                files[entry.name] = entry.stat().st_size
+        return files
+
+    def remove_remote_files(self, names: List[str], trash_folder: Optional[str] = None) -> List[str]:
+        """
+        Удалить файлы из папки на SMB сервере или перенести их в папку корзины
+        
+        Все операции выполняются подряд в текущей сессии; папка корзины
+        создается один раз. Файл, которого уже нет на сервере, считается удаленным.
+        
+        Args:
+            names: Имена файлов в папке
+            trash_folder: Подпапка корзины (None - удалить безвозвратно)
+            
+        Returns:
+            Имена удаленных (перенесенных) файлов
+        """
+        if not self.current_config:
+            self.logger.error("SMB подключение не настроено. Вызовите connect() сначала.")
+            return []
+        
+        server = self.current_config['server']
+        folder = self.current_config['full_path']
+        trash_path = os.path.join(folder, trash_folder).replace('/', '\\') if trash_folder else None
+        if trash_path:
+            try:
+                self.resilience.call("smb_write", server, smbclient.makedirs, trash_path, exist_ok=True)
+            except Exception as e:
+                self.logger.error(f"Не удалось создать папку корзины {trash_path}: {e}")
+                return []
+        
+        removed = []
+        for name in names:
+            path = os.path.join(folder, name).replace('/', '\\')
+            try:
+                if trash_path:
+                    # Файл с тем же именем в корзине заменяется
+                    trash_file = os.path.join(trash_path, name).replace('/', '\\')
+                    self.resilience.call("smb_write", server, smbclient.replace, path, trash_file)
+                else:
+                    self.resilience.call("smb_write", server, smbclient.remove, path)
+                removed.append(name)
+            except Exception as e:
+                if getattr(e, "errno", None) == errno.ENOENT:
+                    removed.append(name)
+                else:
+                    self.logger.error(f"Не удалось удалить {name} на {server}: {e}")
+        return removed
+
+    def rename_remote_file(self, old_name: str, new_name: str) -> bool:
+        """
+        Переименовать файл в папке на SMB сервере (без повторной загрузки)
+        
+        Returns:
+            True если файл переименован
+        """
+        if not self.current_config:
+            self.logger.error("SMB подключение не настроено. Вызовите connect() сначала.")
+            return False
+        
+        server = self.current_config['server']
+        old_path = os.path.join(self.current_config['full_path'], old_name).replace('/', '\\')
+        new_path = os.path.join(self.current_config['full_path'], new_name).replace('/', '\\')
+        try:
+            self.resilience.call("smb_write", server, smbclient.rename, old_path, new_path)
+            self.logger.info(f"Файл переименован на {server}: {old_name} -> {new_name}")
+            return True
+        except Exception as e:
+            self.logger.error(f"Не удалось переименовать {old_name} на {server}: {e}")
+            return False
+
     def disconnect(self) -> None:
         """Отключается от SMB сервера"""
         try:
@@ -96,16 +306,19 @@ class SMBFileUploader(IFileUploader):
             
             self.logger.info(f"Подключаемся к SMB серверу: {server}")
             
-            # Настраиваем глобальные учетные данные для smbclient
-            smbclient.ClientConfig(username=username, password=password, domain=domain)
+            # Регистрируем сессию с учетными данными этого сервера.
+            # В отличие от глобального ClientConfig это позволяет работать
+            # с несколькими серверами (зеркалами) одновременно
+            if domain:
+                username = f"{domain}\\{username}"
             
             # Формируем базовый путь к SMB ресурсу
             base_path = f"\\\\{server}\\{share}"
             full_path = os.path.join(base_path, folder_path).replace('/', '\\')
             
-            # Тестируем подключение
+            # Тестируем подключение (с повторами; недоступный сервер отключается предохранителем)
             try:
-                smbclient.listdir(base_path)
+                self.resilience.call("smb_connect", server, self._open_session, server, username, password, base_path)
                 self.logger.info("Подключение к SMB серверу успешно установлено")
                 
                 # Создаем структуру папок если не существует
@@ -118,7 +331,9 @@ class SMBFileUploader(IFileUploader):
                     'username': username,
                     'password': password,
                     'base_path': base_path,
-                    'full_path': full_path
+                    'full_path': full_path,
+                    # Настройки загрузки из профиля производительности (см. profiles.py)
+                    'performance': smb_config.get('performance', DEFAULT_PROFILE)
                 }
                 
                 return True
@@ -133,7 +348,7 @@ class SMBFileUploader(IFileUploader):
 
     def _verify_file_integrity(self, local_path: str, remote_path: str) -> bool:
         """
-        Проверяет целостность файла путем сравнения MD5 хешей
+        Проверяет целостность файла путем сравнения хешей
         
         Args:
             local_path: Путь к локальному файлу
@@ -143,16 +358,16 @@ class SMBFileUploader(IFileUploader):
             True если файлы идентичны
         """
         try:
-            # Вычисляем хеш локального файла
-            local_hash = self._calculate_file_hash(local_path)
-            self.logger.info(f"Хеш локального файла: {local_hash}")
-            
-            # Вычисляем хеш файла на SMB
+            # Хеш локального файла вычисляется в пуле хеширования, пока читается файл на SMB
+            local_future = submit_hash_file(local_path, self.hash_algorithm, self._read_chunk_size())
             remote_hash = self._calculate_remote_file_hash(remote_path)
-            self.logger.info(f"Хеш файла на SMB: {remote_hash}")
+            local_hash = local_future.result()
+            if is_debug_enabled(self.logger):
+                self.logger.debug(f"Хеш локального файла: {local_hash}, хеш файла на SMB: {remote_hash}")
             
             if local_hash == remote_hash:
-                self.logger.info("✅ Хеши совпадают - файл загружен корректно!")
+                if is_debug_enabled(self.logger):
+                    self.logger.debug("✅ Хеши совпадают - файл загружен корректно!")
                 return True
             else:
                 self.logger.error("❌ Хеши не совпадают - файл поврежден при загрузке!")
@@ -162,34 +377,37 @@ class SMBFileUploader(IFileUploader):
             self.logger.error(f"Ошибка при проверке целостности файла: {e}")
             return False
 
+    def _read_chunk_size(self) -> int:
+        """Размер блока чтения из профиля подключения"""
+        performance = self.current_config['performance'] if self.current_config else DEFAULT_PROFILE
+        return performance['read_chunk_size']
+
     def _calculate_file_hash(self, file_path: str) -> str:
-        """Вычисляет MD5 хеш локального файла"""
-        hash_md5 = hashlib.md5()
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-        return hash_md5.hexdigest()
+        """Вычисляет хеш локального файла"""
+        return hash_file(file_path, self.hash_algorithm, self._read_chunk_size())
 
     def _calculate_remote_file_hash(self, remote_path: str) -> str:
-        """Вычисляет MD5 хеш файла на SMB сервере"""
-        hash_md5 = hashlib.md5()
-        
-        self.logger.info("Начинаем чтение файла с SMB для вычисления хеша...")
+        """Вычисляет хеш файла на SMB сервере (чтение и хеширование идут параллельно)"""
+        debug = is_debug_enabled(self.logger)
+        if debug:
+            self.logger.debug(f"Начинаем чтение файла с SMB для вычисления хеша: {remote_path}")
         
         # Используем smbclient для чтения файла
+        # О прогрессе сообщаем только при медленном чтении (не чаще PROGRESS_LOG_INTERVAL)
+        progress = ProgressLogger(self.logger, self.PROGRESS_LOG_INTERVAL)
+        total_read = 0
+        
+        def on_progress(read: int) -> None:
+            nonlocal total_read
+            total_read = read
+            progress.update(lambda: f"Прочитано с SMB: {read} байт")
+        
         with smbclient.open_file(remote_path, mode='rb') as f:
-            total_read = 0
-            while True:
-                chunk_data = f.read(8192)
-                if not chunk_data:
-                    break
-                hash_md5.update(chunk_data)
-                total_read += len(chunk_data)
-                if total_read % (80 * 1024) == 0:  # Логируем каждые 80KB
-                    self.logger.info(f"Прочитано: {total_read} байт")
-        
-        self.logger.info(f"Чтение завершено, всего прочитано: {total_read} байт")
-        return hash_md5.hexdigest()
+            remote_hash = hash_stream(f, self.hash_algorithm, self._read_chunk_size(), on_progress)
+        
+        if debug:
+            self.logger.debug(f"Чтение завершено, всего прочитано: {total_read} байт")
+        return remote_hash
 
     def _create_directory_structure(self, full_path: str):
         """Создает структуру папок на SMB сервере если она не существует"""
@@ -206,3 +424,238 @@ class SMBFileUploader(IFileUploader):
         except Exception as e:
             # Папка может уже существовать, это нормально
             self.logger.info(f"Папка {full_path} уже существует или создана: {e}")
+
+
+class MirroredSMBUploader(IMirroredFileUploader):
+    """
+    Загрузка файлов сразу на несколько SMB серверов (зеркал).
+    
+    Локальный файл читается один раз, после чего содержимое параллельно
+    записывается на все зеркала. У каждого зеркала своя очередь загрузок,
+    поэтому медленное зеркало не задерживает остальные, а недоступное
+    исключается при подключении.
+    """
+
+    def __init__(
+        self,
+        logger: ILogger,
+        max_backlog: int = 4,
+        metrics: Optional[MetricsRecorder] = None,
+        resilience: Optional[ResilientCaller] = None,
+        hash_algorithm: str = "auto"
+    ):
+        """
+        Args:
+            logger: Логгер
+            max_backlog: Максимум файлов в очереди одного зеркала; при
+                переполнении постановка в очередь ждет, пока зеркало не
+                освободит место (если в профиле сервера не задан свой
+                max_backlog)
+            metrics: Сборщик метрик (объем по серверам, глубина очередей)
+            resilience: Повторы и предохранители серверов (общие для всех плейлистов,
+                поэтому недоступный сервер не задерживает следующие плейлисты)
+            hash_algorithm: Алгоритм проверки целостности (см. hashing.py)
+        """
+        self.logger = logger
+        self.max_backlog = max_backlog
+        self.metrics = metrics or MetricsRecorder()
+        self.resilience = resilience or ResilientCaller(logger, metrics=self.metrics)
+        self.hash_algorithm = resolve_algorithm(hash_algorithm)
+        self._mirrors: Dict[str, SMBFileUploader] = {}
+        self._executors: Dict[str, ThreadPoolExecutor] = {}
+        self._pending: Dict[str, int] = {}
+        self._slots: Dict[str, threading.Semaphore] = {}
+        self._futures = []
+        self._lock = threading.Lock()
+
+    def connect(self, smb_config, folder_path: str) -> bool:
+        """
+        Подключается ко всем назначениям плейлиста
+        
+        Args:
+            smb_config: Конфигурация SMB или список конфигураций (зеркала)
+            folder_path: Путь к папке на SMB серверах
+            
+        Returns:
+            True если удалось подключиться хотя бы к одному назначению
+        """
+        configs = smb_config if isinstance(smb_config, list) else [smb_config]
+        configs_by_key = {destination_key(config, folder_path): config for config in configs}
+        uploaders = {
+            key: SMBFileUploader(self.logger, self.metrics, self.resilience, self.hash_algorithm)
+            for key in configs_by_key
+        }
+        
+        # Подключаемся параллельно, чтобы недоступный сервер не задерживал остальные
+        with ThreadPoolExecutor(max_workers=len(configs_by_key)) as executor:
+            futures = {
+                key: executor.submit(uploaders[key].connect, config, folder_path)
+                for key, config in configs_by_key.items()
+            }
+        results = {key: future.result() for key, future in futures.items()}
+        
+        for key, connected in results.items():
+            if connected:
+                # Параллельность и размер очереди зеркала задаются профилем сервера
+                performance = configs_by_key[key].get('performance', {})
+                workers = performance.get('upload_workers', 1)
+                self._mirrors[key] = uploaders[key]
+                self._executors[key] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"mirror-{key}")
+                self._slots[key] = threading.Semaphore(performance.get('max_backlog', self.max_backlog))
+                self._pending[key] = 0
+            else:
+                self.logger.warning(f"Зеркало недоступно, пропускаем: {key}")
+        
+        return bool(self._mirrors)
+
+    def get_destinations(self) -> List[str]:
+        """Получить ключи подключенных назначений"""
+        return list(self._mirrors.keys())
+
+    def upload_file(self, local_path: str, remote_filename: str) -> bool:
+        """Загружает файл на все подключенные зеркала и ждет результата"""
+        results = {}
+        
+        def collect(destination: str, success: bool, size: int) -> None:
+            results[destination] = success
+        
+        self.upload_to_destinations(local_path, remote_filename, self.get_destinations(), collect)
+        self.wait_for_uploads()
+        return bool(results) and all(results.values())
+
+    def upload_to_destinations(
+        self,
+        local_path: str,
+        remote_filename: str,
+        destinations: List[str],
+        on_result: Optional[Callable[[str, bool, int], None]] = None
+    ) -> int:
+        """
+        Ставит файл в очередь загрузки на указанные зеркала
+        
+        Файл читается с диска один раз, поэтому после возврата из метода
+        локальный файл можно удалять.
+        
+        Args:
+            local_path: Путь к локальному файлу
+            remote_filename: Имя файла на SMB серверах
+            destinations: Ключи назначений
+            on_result: Callback (destination, success, size), вызывается
+                из потока зеркала после проверки целостности
+            
+        Returns:
+            Количество зеркал, в очередь которых поставлен файл
+        """
+        with open(local_path, 'rb') as f:
+            data = f.read()
+        return self.upload_data_to_destinations(data, remote_filename, destinations, on_result)
+    
+    def upload_data_to_destinations(
+        self,
+        data: bytes,
+        remote_filename: str,
+        destinations: List[str],
+        on_result: Optional[Callable[[str, bool, int], None]] = None
+    ) -> int:
+        """
+        Ставит в очередь загрузки на указанные зеркала данные из памяти
+        
+        Если очередь зеркала заполнена, метод ждет, пока зеркало не загрузит
+        один из файлов: медленное зеркало притормаживает загрузку новых
+        треков, но не теряет их.
+        
+        Returns:
+            Количество зеркал, в очередь которых поставлен файл
+        """
+        size = len(data)
+        # Хеш нужен только зеркалам с проверкой "hash"; он вычисляется в пуле
+        # хеширования параллельно с записью и ожидается только при проверке
+        needs_hash = any(
+            self._mirrors[destination].current_config['performance']['verify'] == "hash"
+            for destination in destinations if destination in self._mirrors
+        )
+        expected_hash = submit_hash_bytes(data, self.hash_algorithm) if needs_hash else ""
+        
+        queued = 0
+        for destination in destinations:
+            if destination not in self._mirrors:
+                continue
+            if not self.resilience.is_available(self._mirrors[destination].current_config['server']):
+                self.logger.warning(f"Зеркало {destination} отключено после ошибок, файл будет загружен при следующем запуске: {remote_filename}")
+                continue
+            # Место в очереди зеркала освобождается после загрузки (см. _upload_to_mirror)
+            slots = self._slots[destination]
+            if not slots.acquire(blocking=False):
+                waiting_since = time.perf_counter()
+                slots.acquire()
+                self.metrics.trace_interval("mirror backlog", waiting_since, time.perf_counter(), destination=destination)
+            with self._lock:
+                self._pending[destination] += 1
+                self.metrics.set_queue_depth(f"mirror:{destination}", self._pending[destination])
+            
+            # Контекст трассировки (плейлист, видео) передается в поток зеркала
+            future = self._executors[destination].submit(
+                contextvars.copy_context().run, self._upload_to_mirror,
+                destination, data, remote_filename, expected_hash, size, on_result, time.perf_counter()
+            )
+            self._futures.append(future)
+            queued += 1
+        
+        return queued
+
+    def wait_for_uploads(self) -> None:
+        """Дождаться завершения всех поставленных в очередь загрузок"""
+        futures, self._futures = self._futures, []
+        for future in futures:
+            future.result()
+
+    def rename_file(self, destination: str, old_name: str, new_name: str) -> bool:
+        """Переименовать файл на зеркале (текущее подключение назначения)"""
+        uploader = self._mirrors.get(destination)
+        return bool(uploader) and uploader.rename_remote_file(old_name, new_name)
+
+    def remove_files(self, destination: str, names: List[str], trash_folder: Optional[str] = None) -> List[str]:
+        """Удалить файлы на зеркале или перенести их в папку корзины"""
+        uploader = self._mirrors.get(destination)
+        return uploader.remove_remote_files(names, trash_folder) if uploader else []
+
+    def disconnect(self) -> None:
+        """Дожидается загрузок и отключается от всех зеркал"""
+        self.wait_for_uploads()
+        for executor in self._executors.values():
+            executor.shutdown(wait=True)
+        for uploader in self._mirrors.values():
+            uploader.disconnect()
+        self._mirrors.clear()
+        self._executors.clear()
+        self._pending.clear()
+        self._slots.clear()
+
+    def _upload_to_mirror(
+        self,
+        destination: str,
+        data: bytes,
+        remote_filename: str,
+        expected_hash: Union[str, Future],
+        size: int,
+        on_result: Optional[Callable[[str, bool, int], None]],
+        queued_at: float
+    ) -> None:
+        """Загрузить содержимое на одно зеркало и сообщить результат"""
+        self.metrics.trace_interval("mirror queue", queued_at, time.perf_counter(), destination=destination)
+        try:
+            success = self._mirrors[destination].upload_buffer(data, remote_filename, expected_hash)
+        except Exception as e:
+            self.logger.error(f"Ошибка при загрузке на зеркало {destination}: {e}")
+            success = False
+        finally:
+            with self._lock:
+                self._pending[destination] -= 1
+                self.metrics.set_queue_depth(f"mirror:{destination}", self._pending[destination])
+            self._slots[destination].release()
+        
+        if on_result:
+            try:
+                on_result(destination, success, size)
+            except Exception as e:
+                self.logger.error(f"Ошибка при обработке результата загрузки на {destination}: {e}")
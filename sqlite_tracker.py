@@ -0,0 +1,364 @@
+"""
+Реализация отслеживания загруженных файлов на SQLite
+"""
+import json
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+from interfaces import IDownloadTracker, ILogger
+
+
+class SqliteDownloadTracker(IDownloadTracker):
+    """
+    Отслеживание загруженных файлов в базе SQLite.
+
+    База работает в режиме WAL, поиск выполняется по первичным ключам,
+    а изменения фиксируются пакетами (по количеству записей или по времени),
+    поэтому отметка файла не перезаписывает весь архив. Незафиксированный
+    пакет фиксируется таймером не позже чем через commit_interval, даже
+    если новых записей нет: блокировка записи не удерживается на время
+    загрузок. Одно соединение защищено блокировкой и может использоваться
+    из нескольких потоков; параллельные процессы синхронизируются
+    средствами SQLite (busy_timeout).
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS videos (
+            video_id TEXT PRIMARY KEY,
+            file_path TEXT NOT NULL,
+            download_date TEXT NOT NULL,
+            legacy INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS deliveries (
+            video_id TEXT NOT NULL,
+            destination TEXT NOT NULL,
+            file TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            PRIMARY KEY (video_id, destination)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_deliveries_destination ON deliveries (destination);
+        CREATE TABLE IF NOT EXISTS failures (
+            video_id TEXT PRIMARY KEY,
+            state TEXT NOT NULL,
+            attempts INTEGER NOT NULL,
+            next_retry REAL,
+            error TEXT NOT NULL
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS audio_hashes (
+            video_id TEXT PRIMARY KEY,
+            hash TEXT NOT NULL
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_audio_hashes_hash ON audio_hashes (hash);
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        ) WITHOUT ROWID;
+        -- Счетчик изменений набора ID (используется компактным индексом)
+        INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', '0');
+        CREATE TRIGGER IF NOT EXISTS videos_generation_insert AFTER INSERT ON videos BEGIN
+            UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'generation';
+        END;
+        CREATE TRIGGER IF NOT EXISTS videos_generation_delete AFTER DELETE ON videos BEGIN
+            UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'generation';
+        END;
+    """
+
+    def __init__(
+        self,
+        db_file: str,
+        logger: ILogger,
+        commit_batch_size: int = 50,
+        commit_interval: float = 5.0,
+        import_json_file: Optional[str] = None,
+        read_only: bool = False
+    ):
+        """
+        Args:
+            db_file: Путь к файлу базы SQLite
+            logger: Логгер
+            commit_batch_size: Фиксировать транзакцию после N изменений
+            commit_interval: Фиксировать транзакцию не реже чем раз в N секунд
+            import_json_file: Архив JsonDownloadTracker для однократного импорта
+            read_only: Только чтение существующей базы (схема не создается,
+                импорт не выполняется; файла нет - sqlite3.OperationalError)
+        """
+        self.db_file = db_file
+        self.logger = logger
+        self.commit_batch_size = commit_batch_size
+        self.commit_interval = commit_interval
+        self._lock = threading.RLock()
+        self._pending_writes = 0
+        self._last_commit = time.monotonic()
+        self._flush_timer: Optional[threading.Timer] = None
+
+        if read_only:
+            uri = f"{pathlib.Path(db_file).resolve().as_uri()}?mode=ro"
+            self._connection = sqlite3.connect(uri, uri=True, timeout=30, check_same_thread=False)
+        else:
+            self._connection = sqlite3.connect(db_file, timeout=30, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.executescript(self.SCHEMA)
+            self._connection.commit()
+
+        if import_json_file and not read_only:
+            self.import_json_archive(import_json_file)
+
+        count = self._connection.execute("SELECT COUNT(*) FROM videos").fetchone()[0]
+        self.logger.info(f"Загружена база {db_file} с {count} записями")
+
+    def import_json_archive(self, json_file: str) -> int:
+        """
+        Однократно импортировать архив JsonDownloadTracker
+
+        Повторный вызов ничего не делает: факт импорта сохраняется в базе.
+
+        Args:
+            json_file: Путь к downloaded.json
+
+        Returns:
+            Количество импортированных записей
+        """
+        with self._lock:
+            imported = self._connection.execute(
+                "SELECT value FROM meta WHERE key = 'json_imported'"
+            ).fetchone()
+            if imported or not os.path.exists(json_file):
+                return 0
+
+            try:
+                with open(json_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (json.JSONDecodeError, IOError) as e:
+                # Не отмечаем импорт выполненным, чтобы повторить после исправления файла
+                self.logger.error(f"Не удалось импортировать архив {json_file}: {e}")
+                return 0
+
+            downloaded = data.get("downloaded", {})
+            videos = []
+            deliveries = []
+            for video_id, record in downloaded.items():
+                destinations = record.get("destinations")
+                videos.append((
+                    video_id,
+                    record.get("file_path", ""),
+                    record.get("download_date", ""),
+                    int(destinations is None)
+                ))
+                for destination, delivery in (destinations or {}).items():
+                    deliveries.append((
+                        video_id, destination, delivery["file"], delivery.get("size", 0), delivery.get("date", "")
+                    ))
+
+            with self._connection:
+                self._connection.executemany(
+                    "INSERT OR IGNORE INTO videos (video_id, file_path, download_date, legacy) VALUES (?, ?, ?, ?)",
+                    videos
+                )
+                self._connection.executemany(
+                    "INSERT OR IGNORE INTO deliveries (video_id, destination, file, size, date) VALUES (?, ?, ?, ?, ?)",
+                    deliveries
+                )
+                self._connection.executemany(
+                    "INSERT OR IGNORE INTO failures (video_id, state, attempts, next_retry, error) VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (video_id, failure["state"], failure["attempts"], failure.get("next_retry"), failure.get("error", ""))
+                        for video_id, failure in data.get("failures", {}).items()
+                    ]
+                )
+                self._connection.executemany(
+                    "INSERT OR IGNORE INTO audio_hashes (video_id, hash) VALUES (?, ?)",
+                    list(data.get("content_hashes", {}).items())
+                )
+                self._connection.execute(
+                    "INSERT INTO meta (key, value) VALUES ('json_imported', ?)", (json_file,)
+                )
+
+            self.logger.info(f"Импортировано {len(videos)} записей из {json_file}")
+            return len(videos)
+
+    def _record_write(self) -> None:
+        """Учесть изменение и зафиксировать пакет при необходимости"""
+        self._pending_writes += 1
+        if (self._pending_writes >= self.commit_batch_size
+                or time.monotonic() - self._last_commit >= self.commit_interval):
+            self.flush()
+        elif self._flush_timer is None:
+            # Следующей записи может не быть долго (загрузка, отправка на сервер)
+            self._flush_timer = threading.Timer(self.commit_interval, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def flush(self) -> None:
+        """Зафиксировать накопленные изменения"""
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if self._pending_writes:
+                self._connection.commit()
+                self._pending_writes = 0
+            self._last_commit = time.monotonic()
+
+    def close(self) -> None:
+        """Зафиксировать изменения и закрыть базу"""
+        with self._lock:
+            self.flush()
+            self._connection.close()
+
+    def is_downloaded(self, video_id: str) -> bool:
+        """Проверить, был ли файл уже загружен"""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT 1 FROM videos WHERE video_id = ?", (video_id,)
+            ).fetchone()
+            return row is not None
+
+    def mark_as_downloaded(self, video_id: str, file_path: str) -> None:
+        """Отметить файл как загруженный"""
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO videos (video_id, file_path, download_date, legacy) VALUES (?, ?, ?, 1)",
+                (video_id, file_path, str(datetime.now()))
+            )
+            self._record_write()
+        self.logger.info(f"Файл {video_id} отмечен как загруженный")
+
+    def get_downloaded_list(self) -> List[str]:
+        """Получить список загруженных файлов"""
+        with self._lock:
+            return [row[0] for row in self._connection.execute("SELECT video_id FROM videos")]
+
+    def is_delivered(self, video_id: str, destination: str) -> bool:
+        """
+        Проверить, был ли файл доставлен в указанное назначение
+
+        Записи, импортированные из архива до учета назначений (legacy),
+        считаются доставленными во все назначения.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                """
+                SELECT 1 FROM deliveries WHERE video_id = ? AND destination = ?
+                UNION ALL
+                SELECT 1 FROM videos WHERE video_id = ? AND legacy = 1
+                LIMIT 1
+                """,
+                (video_id, destination, video_id)
+            ).fetchone()
+            return row is not None
+
+    def mark_delivered(self, video_id: str, destination: str, remote_filename: str, size: int) -> None:
+        """Отметить файл как доставленный в указанное назначение"""
+        now = str(datetime.now())
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR IGNORE INTO videos (video_id, file_path, download_date, legacy) VALUES (?, ?, ?, 0)",
+                (video_id, remote_filename, now)
+            )
+            self._connection.execute(
+                "UPDATE videos SET legacy = 0 WHERE video_id = ?", (video_id,)
+            )
+            self._connection.execute(
+                "INSERT OR REPLACE INTO deliveries (video_id, destination, file, size, date) VALUES (?, ?, ?, ?, ?)",
+                (video_id, destination, remote_filename, size, now)
+            )
+            # Успешная доставка завершает цикл повторных попыток
+            self._connection.execute("DELETE FROM failures WHERE video_id = ?", (video_id,))
+            self._record_write()
+        self.logger.info(f"Файл {video_id} отмечен как доставленный в {destination}")
+
+    def get_deliveries(self, destination: str) -> Dict[str, Dict[str, Any]]:
+        """Получить доставки в назначение: ID видео -> {file, size}"""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT video_id, file, size FROM deliveries WHERE destination = ?", (destination,)
+            )
+            return {video_id: {"file": file, "size": size} for video_id, file, size in rows}
+
+    def remove_delivery(self, video_id: str, destination: str) -> None:
+        """
+        Снять отметку о доставке в назначение
+
+        Старая (legacy) запись превращается в запись без доставок:
+        остальные назначения подтверждаются сверкой заново.
+        """
+        with self._lock:
+            self._connection.execute(
+                "DELETE FROM deliveries WHERE video_id = ? AND destination = ?", (video_id, destination)
+            )
+            self._connection.execute("UPDATE videos SET legacy = 0 WHERE video_id = ?", (video_id,))
+            self._record_write()
+        self.logger.info(f"Отметка о доставке {video_id} в {destination} снята")
+
+    def get_failure(self, video_id: str) -> Optional[Dict[str, Any]]:
+        """Получить запись об ошибке видео: {state, attempts, next_retry, error}"""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT state, attempts, next_retry, error FROM failures WHERE video_id = ?", (video_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            return {"state": row[0], "attempts": row[1], "next_retry": row[2], "error": row[3]}
+
+    def get_failures(self) -> Dict[str, Dict[str, Any]]:
+        """Получить все записи об ошибках: ID видео -> запись"""
+        with self._lock:
+            rows = self._connection.execute("SELECT video_id, state, attempts, next_retry, error FROM failures")
+            return {
+                video_id: {"state": state, "attempts": attempts, "next_retry": next_retry, "error": error}
+                for video_id, state, attempts, next_retry, error in rows
+            }
+
+    def record_failure(self, video_id: str, failure: Dict[str, Any]) -> None:
+        """Сохранить запись об ошибке видео"""
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO failures (video_id, state, attempts, next_retry, error) VALUES (?, ?, ?, ?, ?)",
+                (video_id, failure["state"], failure["attempts"], failure.get("next_retry"), failure.get("error", ""))
+            )
+            self._record_write()
+        self.logger.info(f"Видео {video_id}: {failure['state']}, попытка {failure['attempts']}")
+
+    def clear_failure(self, video_id: str) -> None:
+        """Удалить запись об ошибке видео"""
+        with self._lock:
+            self._connection.execute("DELETE FROM failures WHERE video_id = ?", (video_id,))
+            self._record_write()
+
+    def get_delivered_file(self, video_id: str, destination: str) -> Optional[str]:
+        """Получить имя доставленного в назначение файла"""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT file FROM deliveries WHERE video_id = ? AND destination = ?",
+                (video_id, destination)
+            ).fetchone()
+            if row:
+                return row[0]
+            row = self._connection.execute(
+                "SELECT file_path FROM videos WHERE video_id = ? AND legacy = 1", (video_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            return os.path.basename(row[0]) or None
+
+    def record_content_hash(self, video_id: str, content_hash: str) -> None:
+        """Сохранить хеш декодированного звука видео"""
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO audio_hashes (video_id, hash) VALUES (?, ?)", (video_id, content_hash)
+            )
+            self._record_write()
+
+    def find_by_content_hash(self, content_hash: str) -> List[str]:
+        """Получить ID видео с таким же хешем звука"""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT video_id FROM audio_hashes WHERE hash = ? ORDER BY video_id", (content_hash,)
+            )
+            return [row[0] for row in rows]
@@ -0,0 +1,202 @@
+"""
+Учет места во временной папке загрузок: резервирование, ожидание и очистка
+"""
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from interfaces import ILogger
+
+# Длительность, которая предполагается для видео без длительности (секунды)
+UNKNOWN_DURATION = 1200
+
+# Как часто перепроверять свободное место при ожидании (секунды)
+RECHECK_INTERVAL = 5.0
+
+
+class TempSpaceManager:
+    """
+    Резервирование места во временной папке перед каждой загрузкой.
+
+    Перед загрузкой резервируется оценка размера файлов видео (длительность ×
+    битрейт: исходный поток и MP3 на время конвертации). Если сумма резервов
+    превысит квоту или на диске останется меньше min_free_bytes, новая
+    загрузка ждет, пока завершатся текущие. Небольшие файлы можно размещать
+    в отдельной быстрой папке (например, tmpfs) с собственной квотой.
+    """
+
+    def __init__(
+        self,
+        logger: ILogger,
+        temp_dir: str,
+        quota_bytes: int = 0,
+        min_free_bytes: int = 0,
+        estimate_kbps: float = 400,
+        fast_dir: str = "",
+        fast_max_file_bytes: int = 0,
+        fast_quota_bytes: int = 0,
+        metrics=None
+    ):
+        """
+        Args:
+            logger: Логгер
+            temp_dir: Временная папка загрузок
+            quota_bytes: Квота резервов во временной папке (0 - без ограничения)
+            min_free_bytes: Сколько места оставлять свободным на диске временной папки
+            estimate_kbps: Битрейт для оценки размера (кбит/с, исходный поток и MP3 вместе)
+            fast_dir: Быстрая папка для небольших файлов (пусто - не использовать)
+            fast_max_file_bytes: Максимальная оценка размера файла для быстрой папки
+            fast_quota_bytes: Квота резервов в быстрой папке
+            metrics: Сборщик метрик (MetricsRecorder)
+        """
+        self.logger = logger
+        self.temp_dir = temp_dir
+        self.min_free_bytes = min_free_bytes
+        self.estimate_kbps = estimate_kbps
+        self.fast_dir = fast_dir
+        self.fast_max_file_bytes = fast_max_file_bytes
+        self.metrics = metrics
+        # Папка -> квота и текущая сумма резервов
+        self._quotas: Dict[str, int] = {temp_dir: quota_bytes}
+        self._reserved: Dict[str, int] = {temp_dir: 0}
+        self._active: Dict[str, int] = {temp_dir: 0}
+        self._condition = threading.Condition()
+
+        os.makedirs(temp_dir, exist_ok=True)
+        if fast_dir:
+            try:
+                os.makedirs(fast_dir, exist_ok=True)
+                self._quotas[fast_dir] = fast_quota_bytes
+                self._reserved[fast_dir] = 0
+                self._active[fast_dir] = 0
+            except OSError as e:
+                self.logger.warning(f"Быстрая временная папка недоступна, используется {temp_dir}: {e}")
+                self.fast_dir = ""
+
+    def estimate(self, duration: Optional[float]) -> int:
+        """Оценить место, нужное для загрузки видео (байты)"""
+        seconds = duration if duration and duration > 0 else UNKNOWN_DURATION
+        return int(seconds * self.estimate_kbps * 1000 / 8)
+
+    def _free_bytes(self, directory: str) -> Optional[int]:
+        try:
+            return shutil.disk_usage(directory).free
+        except OSError:
+            return None
+
+    def _fits(self, directory: str, size: int) -> bool:
+        """Помещается ли резерв в квоту и свободное место папки"""
+        quota = self._quotas[directory]
+        if quota and self._reserved[directory] + size > quota:
+            return False
+        # Быстрая папка ограничена только квотой (tmpfs занимает память)
+        return directory != self.temp_dir or self._fits_disk(size)
+
+    def _fits_disk(self, size: int) -> bool:
+        """Останется ли на диске временной папки min_free_bytes после резерва"""
+        if not self.min_free_bytes:
+            return True
+        free = self._free_bytes(self.temp_dir)
+        return free is None or free - size >= self.min_free_bytes
+
+    def _choose(self, size: int) -> Optional[str]:
+        """Папка для резерва или None, если ни одна сейчас не подходит"""
+        if self.fast_dir and size <= self.fast_max_file_bytes and self._fits(self.fast_dir, size):
+            return self.fast_dir
+        if self._fits(self.temp_dir, size):
+            return self.temp_dir
+        return None
+
+    def _update_metrics(self) -> None:
+        if self.metrics:
+            for directory, reserved in self._reserved.items():
+                self.metrics.set_gauge("temp_reserved_bytes", reserved, directory=directory)
+
+    @contextmanager
+    def reserve(self, duration: Optional[float]) -> Iterator[Optional[str]]:
+        """
+        Зарезервировать место для загрузки видео на время блока
+
+        Пока место не освободится, вызов ждет завершения других загрузок.
+        Если ждать нечего (других резервов нет), а места все равно не
+        хватает, блок получает None и загрузку нужно пропустить.
+
+        Args:
+            duration: Длительность видео в секундах (None - неизвестна)
+
+        Yields:
+            Папка для временных файлов загрузки или None
+        """
+        size = self.estimate(duration)
+        waited = False
+        with self._condition:
+            while True:
+                directory = self._choose(size)
+                if directory is not None or not any(self._active.values()):
+                    break
+                if not waited:
+                    waited = True
+                    self.logger.info(f"Ожидаем освобождения места во временной папке ({size // (1024 * 1024)} МБ)")
+                    if self.metrics:
+                        self.metrics.inc("temp_space_waits_total")
+                self._condition.wait(RECHECK_INTERVAL)
+            # Квоту превышает единственная загрузка: пропускать ее не нужно, если хватает диска
+            if directory is None and self._fits_disk(size):
+                directory = self.temp_dir
+            if directory is not None:
+                self._reserved[directory] += size
+                self._active[directory] += 1
+                self._update_metrics()
+
+        if directory is None:
+            self.logger.error(
+                f"Недостаточно места во временной папке {self.temp_dir}: нужно {size // (1024 * 1024)} МБ"
+            )
+            yield None
+            return
+        try:
+            yield directory
+        finally:
+            with self._condition:
+                self._reserved[directory] -= size
+                self._active[directory] -= 1
+                self._update_metrics()
+                self._condition.notify_all()
+
+    def sweep_orphans(self, max_age: float = 3600) -> int:
+        """
+        Удалить файлы, оставшиеся от прерванных запусков
+
+        Удаляются файлы, не изменявшиеся дольше max_age секунд: так не
+        затрагиваются загрузки других процессов, работающих с той же папкой.
+
+        Returns:
+            Количество удаленных файлов
+        """
+        removed = 0
+        freed = 0
+        cutoff = time.time() - max_age
+        for directory in self._quotas:
+            try:
+                entries = list(os.scandir(directory))
+            except OSError as e:
+                self.logger.warning(f"Не удалось просмотреть временную папку {directory}: {e}")
+                continue
+            for entry in entries:
+                try:
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    stat = entry.stat(follow_symlinks=False)
+                    if stat.st_mtime > cutoff:
+                        continue
+                    os.remove(entry.path)
+                    removed += 1
+                    freed += stat.st_size
+                except OSError as e:
+                    self.logger.warning(f"Не удалось удалить временный файл {entry.path}: {e}")
+        if removed:
+            self.logger.info(f"Удалено оставшихся временных файлов: {removed} ({freed // (1024 * 1024)} МБ)")
+        return removed
@@ -5,8 +5,8 @@ Script for testing local MP3 file
 
 import os
 import subprocess
-import hashlib
 from config import TEMP_DOWNLOAD_DIR
+from hashing import hash_file
 
 def test_mp3_file(file_path):
     """Tests MP3 file"""
@@ -21,11 +21,7 @@ def test_mp3_file(file_path):
     print(f"File size: {file_size:,} bytes ({file_size / (1024*1024):.2f} MB)")
     
     # Calculate hash
-    hash_md5 = hashlib.md5()
-    with open(file_path, 'rb') as f:
-        for chunk in iter(lambda: f.read(8192), b""):
-            hash_md5.update(chunk)
-    print(f"MD5 hash: {hash_md5.hexdigest()}")
+    print(f"MD5 hash: {hash_file(file_path, 'md5')}")
     
     # Check file header (first bytes)
     with open(file_path, 'rb') as f:
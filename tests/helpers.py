@@ -0,0 +1,22 @@
+"""
+Общие вспомогательные классы тестов
+"""
+from typing import List, Tuple
+
+from interfaces import ILogger
+
+
+class ListLogger(ILogger):
+    """Логгер, сохраняющий сообщения в список"""
+
+    def __init__(self):
+        self.messages: List[Tuple[str, str]] = []
+
+    def info(self, message: str) -> None:
+        self.messages.append(("info", message))
+
+    def error(self, message: str) -> None:
+        self.messages.append(("error", message))
+
+    def warning(self, message: str) -> None:
+        self.messages.append(("warning", message))
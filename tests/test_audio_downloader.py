@@ -0,0 +1,139 @@
+"""
+Тесты загрузчика: ошибки YouTube доходят до повторов и предохранителя
+"""
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from yt_dlp.extractor.youtube import YoutubeIE
+from yt_dlp.utils import ExtractorError
+
+from audio_downloader import YouTubeAudioDownloader
+from download_tracker import JsonDownloadTracker
+from resilience import CIRCUIT_OPEN, ResilientCaller, YOUTUBE_HOST
+from tests.helpers import ListLogger
+from throttle import AdaptiveThrottle, EmptyResultError
+from video_state import STATE_FAILED_PERMANENT
+from youtube_mp3_sync import YouTubeMP3Synchronizer, download_track
+
+VIDEO_URL = "https://www.youtube.com/watch?v=aaaaaaaaaaa"
+
+# Опции как в config (без ffmpeg); файловые URL заменяют серверы YouTube
+DOWNLOAD_OPTIONS = {
+    'format': 'bestaudio[ext=m4a]/bestaudio',
+    'outtmpl': '%(title)s.%(ext)s',
+    'ignoreerrors': True,
+    'quiet': True,
+    'noprogress': True,
+    'enable_file_urls': True,
+}
+
+
+class DownloaderTestCase(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        source = os.path.join(self.directory, "source.m4a")
+        with open(source, "wb") as f:
+            f.write(b"\0" * 1000)
+        self.info = {
+            "id": "aaaaaaaaaaa", "title": "Song", "ext": "m4a", "vcodec": "none", "acodec": "mp4a",
+            "url": f"file://{source}",
+        }
+        self.logger = ListLogger()
+        self.resilience = ResilientCaller(self.logger, sleep=lambda delay: None)
+        # Частота выше максимума по умолчанию: тесты не ждут очереди запросов
+        self.throttle = AdaptiveThrottle(self.logger, initial_rate=6000, max_rate=12000)
+        self.downloader = YouTubeAudioDownloader(
+            DOWNLOAD_OPTIONS, self.logger, resilience=self.resilience, throttle=self.throttle
+        )
+        self.extractions = 0
+        self.responses = []
+
+    def extract(self, url):
+        """Подмена YoutubeIE._real_extract: ответы из self.responses, затем информация о видео"""
+        self.extractions += 1
+        if self.responses:
+            response = self.responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+        return dict(self.info)
+
+    def download(self):
+        with mock.patch.object(YoutubeIE, "_real_extract", lambda extractor, url: self.extract(url)):
+            return self.downloader.download_audio(VIDEO_URL, os.path.join(self.directory, "out", "%(title)s.mp3"))
+
+
+class ResilienceTest(DownloaderTestCase):
+    def test_transient_error_is_retried(self):
+        self.responses = [ExtractorError("Connection reset by peer", expected=True)]
+
+        self.assertEqual(self.download(), os.path.join(self.directory, "out", "Song.mp3"))
+        self.assertEqual(self.extractions, 2)
+
+    def test_repeated_failures_open_the_breaker(self):
+        self.responses = [ExtractorError("Connection reset by peer", expected=True)] * 10
+
+        self.assertIsNone(self.download())
+        self.assertIsNone(self.download())
+        self.assertEqual(self.resilience.breaker(YOUTUBE_HOST).state, CIRCUIT_OPEN)
+
+        # Отключенный хост больше не запрашивается
+        extractions = self.extractions
+        self.assertIsNone(self.download())
+        self.assertEqual(self.extractions, extractions)
+
+
+class ThrottleTest(DownloaderTestCase):
+    def test_rate_limit_lowers_the_rate(self):
+        self.responses = [ExtractorError("HTTP Error 429: Too Many Requests", expected=True)] * 10
+
+        self.assertIsNone(self.download())
+        self.assertLess(self.throttle.rate, 6000)
+        self.assertTrue(any("ограничивает" in message for level, message in self.logger.messages if level == "warning"))
+
+    def test_empty_result_is_not_a_success(self):
+        with self.assertRaises(EmptyResultError):
+            self.throttle.call(lambda: None)
+        self.assertEqual(self.throttle.rate, 6000)
+
+
+class PermanentErrorTest(DownloaderTestCase):
+    def test_unavailable_video_is_not_requested_again(self):
+        self.responses = [ExtractorError("Video unavailable. This video has been removed", expected=True)]
+        self.assertIsNone(self.download())
+        self.assertIn("Video unavailable", self.downloader.get_last_error()["error"])
+        self.assertEqual(self.extractions, 1)
+
+        tracker = JsonDownloadTracker(os.path.join(self.directory, "downloaded.json"), self.logger)
+        synchronizer = YouTubeMP3Synchronizer(
+            mock.Mock(), tracker, self.downloader, mock.Mock(), self.logger,
+            temp_dir=os.path.join(self.directory, "temp"), m3u_manifest=mock.Mock()
+        )
+        synchronizer._record_download_failure("aaaaaaaaaaa", None)
+        failures = tracker.get_failures()
+        self.assertEqual(failures["aaaaaaaaaaa"]["state"], STATE_FAILED_PERMANENT)
+
+        # Следующий запуск пропускает видео без запроса к YouTube
+        video = {"id": "aaaaaaaaaaa", "title": "Song", "url": VIDEO_URL}
+        self.assertEqual(synchronizer._build_work_queue([video], ["NAS/music/Rock"], failures), [])
+
+
+class DiskFallbackTest(DownloaderTestCase):
+    def test_fallback_to_disk_reuses_extracted_info(self):
+        video = {"id": "aaaaaaaaaaa", "title": "Song", "url": VIDEO_URL}
+        output_path = os.path.join(self.directory, "out", "%(title)s.mp3")
+
+        # Файловый URL нельзя загрузить в память: трек идет на диск
+        with mock.patch.object(YoutubeIE, "_real_extract", lambda extractor, url: self.extract(url)):
+            data, local_path, _ = download_track(self.downloader, video, output_path, None, 10 ** 6, self.directory)
+
+        self.assertIsNone(data)
+        self.assertEqual(local_path, os.path.join(self.directory, "out", "Song.mp3"))
+        self.assertEqual(self.extractions, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+"""
+Тесты аренды заданий общей очереди
+"""
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from job_queue import JOB_LEASED, JOB_PENDING, MemoryJobQueue, SqliteJobQueue
+from tests.helpers import ListLogger
+
+JOBS = [{"video": {"id": "aaaaaaaaaaa", "title": "Song A"}, "destination": "NAS/music/Rock", "name": "Song A"}]
+
+
+class LeaseOwnershipMixin:
+    """Общие проверки для реализаций очереди"""
+
+    def make_queue(self):
+        raise NotImplementedError
+
+    def test_stale_worker_cannot_touch_reclaimed_lease(self):
+        queue = self.make_queue()
+        queue.enqueue(JOBS)
+        # Аренда узла A сразу истекает, и задание получает узел B
+        stale = queue.claim("node-a", 1, -1)
+        fresh = queue.claim("node-b", 1, 600)
+        self.assertEqual([job["job_id"] for job in fresh], [stale[0]["job_id"]])
+        job_id = stale[0]["job_id"]
+
+        self.assertFalse(queue.fail("node-a", job_id, "Файл не был отправлен на сервер"))
+        self.assertFalse(queue.complete("node-a", job_id, "Song A.mp3", 100))
+        self.assertEqual(queue.renew("node-a", [job_id], 600), 0)
+        self.assertEqual(queue.counts()[JOB_LEASED], 1)
+        self.assertEqual(queue.claim("node-c", 1, 600), [])
+
+        self.assertTrue(queue.complete("node-b", job_id, "Song A.mp3", 100))
+        self.assertEqual([job["remote_file"] for job in queue.collect_results()], ["Song A.mp3"])
+
+    def test_expired_lease_is_not_failed_by_its_worker(self):
+        queue = self.make_queue()
+        queue.enqueue(JOBS)
+        job_id = queue.claim("node-a", 1, -1)[0]["job_id"]
+
+        self.assertFalse(queue.fail("node-a", job_id, "Ошибка"))
+        self.assertEqual(queue.counts()[JOB_LEASED], 1)
+
+    def test_worker_fails_its_own_lease(self):
+        queue = self.make_queue()
+        queue.enqueue(JOBS)
+        job_id = queue.claim("node-a", 1, 600)[0]["job_id"]
+
+        self.assertTrue(queue.fail("node-a", job_id, "Ошибка"))
+        self.assertEqual(queue.counts()[JOB_PENDING], 1)
+
+
+class MemoryJobQueueTest(LeaseOwnershipMixin, unittest.TestCase):
+    def make_queue(self):
+        return MemoryJobQueue()
+
+
+class SqliteJobQueueTest(LeaseOwnershipMixin, unittest.TestCase):
+    def make_queue(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        queue = SqliteJobQueue(os.path.join(directory.name, "jobs.db"), ListLogger())
+        self.addCleanup(queue.close)
+        return queue
+
+
+class ReadOnlyQueueTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.db_file = os.path.join(directory.name, "jobs.db")
+
+    def test_status_reader_does_not_change_the_database(self):
+        queue = SqliteJobQueue(self.db_file, ListLogger())
+        queue.enqueue(JOBS)
+        queue.close()
+        with open(self.db_file, "rb") as f:
+            content = f.read()
+
+        reader = SqliteJobQueue(self.db_file, ListLogger(), read_only=True)
+        self.addCleanup(reader.close)
+        self.assertEqual(reader.counts()[JOB_PENDING], 1)
+        with self.assertRaises(sqlite3.OperationalError):
+            reader.claim("node-a", 1, 600)
+        with open(self.db_file, "rb") as f:
+            self.assertEqual(f.read(), content)
+
+    def test_missing_database_is_not_created(self):
+        with self.assertRaises(sqlite3.OperationalError):
+            SqliteJobQueue(self.db_file, ListLogger(), read_only=True)
+        self.assertFalse(os.path.exists(self.db_file))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,34 @@
+"""
+Тесты неблокирующего логгера QueueLogger
+"""
+import json
+import os
+import tempfile
+import unittest
+
+from logger import QueueLogger
+
+
+class QueueLoggerExceptionTest(unittest.TestCase):
+    def test_traceback_reaches_file_handler(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        log_file = os.path.join(directory.name, "sync.jsonl")
+        logger = QueueLogger("QueueLoggerExceptionTest", log_file=log_file)
+        self.addCleanup(logger.close)
+
+        try:
+            raise ValueError("сбой загрузки")
+        except ValueError:
+            logger.logger.error("Ошибка %s", "видео", exc_info=True)
+        logger.close()
+
+        with open(log_file, encoding="utf-8") as f:
+            entry = json.loads(f.readline())
+        self.assertEqual(entry["message"], "Ошибка видео")
+        self.assertIn("Traceback", entry["exception"])
+        self.assertIn("ValueError: сбой загрузки", entry["exception"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+"""
+Тесты сверки манифеста M3U с папкой на сервере
+"""
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from m3u_manager import M3UPlaylistManager
+from m3u_manifest import M3UManifest
+from tests.helpers import ListLogger
+
+DESTINATION = "NAS/music/Rock"
+SMB_CONFIG = {"server": "NAS", "share": "music", "username": "user", "password": "secret"}
+
+
+class ReconcileTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.logger = ListLogger()
+        self.manifest = M3UManifest(os.path.join(self.directory.name, "m3u_manifest.json"), self.logger)
+        self.manifest.record_track(DESTINATION, {"id": "aaaaaaaaaaa", "title": "Song A"}, "Song A.mp3")
+        self.manifest.record_track(DESTINATION, {"id": "bbbbbbbbbbb", "title": "Song B"}, "Song B.mp3")
+
+    def test_listing_error_is_reported_as_none(self):
+        manager = M3UPlaylistManager(self.logger)
+        with mock.patch("m3u_manager.smbclient") as smbclient:
+            smbclient.listdir.side_effect = OSError("STATUS_CONNECTION_RESET")
+            self.assertIsNone(manager.list_mp3_files(SMB_CONFIG, "Rock"))
+            smbclient.listdir.side_effect = None
+            smbclient.listdir.return_value = []
+            self.assertEqual(manager.list_mp3_files(SMB_CONFIG, "Rock"), [])
+
+    def test_failed_listing_keeps_tracks_and_schedule(self):
+        self.assertFalse(self.manifest.reconcile(DESTINATION, None, {}))
+
+        files = [track["file"] for track in self.manifest.get_entries(DESTINATION)]
+        self.assertEqual(files, ["Song A.mp3", "Song B.mp3"])
+        self.assertTrue(self.manifest.needs_reconcile(DESTINATION, 7))
+
+    def test_listing_removes_missing_files(self):
+        self.assertTrue(self.manifest.reconcile(DESTINATION, ["Song B.mp3"], {}))
+
+        files = [track["file"] for track in self.manifest.get_entries(DESTINATION)]
+        self.assertEqual(files, ["Song B.mp3"])
+        self.assertFalse(self.manifest.needs_reconcile(DESTINATION, 7))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,31 @@
+"""
+Тесты команды status
+"""
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+import main
+
+
+class StatusCommandTest(unittest.TestCase):
+    def test_status_does_not_create_tracker_database(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        db_file = os.path.join(directory.name, "downloaded.db")
+        output = io.StringIO()
+        with mock.patch.multiple(
+            main, TRACKER_BACKEND="sqlite", SQLITE_ARCHIVE_FILE=db_file,
+            JOB_QUEUE_FILE=os.path.join(directory.name, "jobs.db"), LOG_FILE=None
+        ), redirect_stdout(output):
+            self.assertEqual(main.main(["status", "--status-file", os.path.join(directory.name, "status.json")]), 0)
+
+        self.assertIn("Downloaded videos: no data yet", output.getvalue())
+        self.assertEqual(os.listdir(directory.name), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
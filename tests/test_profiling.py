@@ -0,0 +1,74 @@
+"""
+Тесты профилировщика этапов
+"""
+import cProfile
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from profiling import StageProfiler
+
+
+class SingleProfile(cProfile.Profile):
+    """Профиль с ограничением Python 3.12+: один активный профилировщик на процесс"""
+
+    active = None
+    lock = threading.Lock()
+
+    def enable(self, *args, **kwargs):
+        with SingleProfile.lock:
+            if SingleProfile.active not in (None, self):
+                raise ValueError("Another profiling tool is already active")
+            SingleProfile.active = self
+        super().enable(*args, **kwargs)
+
+    def disable(self):
+        super().disable()
+        with SingleProfile.lock:
+            if SingleProfile.active is self:
+                SingleProfile.active = None
+
+
+class ConcurrentStagesTest(unittest.TestCase):
+    def test_concurrent_stages_never_fail_the_work(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        profiler = StageProfiler(directory.name)
+        barrier = threading.Barrier(2)
+        done, errors = [], []
+
+        def upload():
+            try:
+                with profiler.stage("upload"):
+                    barrier.wait(5)
+                    done.append(sum(range(1000)))
+            except Exception as e:
+                errors.append(e)
+
+        def run():
+            threads = [threading.Thread(target=upload) for _ in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(10)
+            # Стек профилей главного потока не поврежден: этап и после него работают
+            with profiler.stage("m3u"):
+                done.append(0)
+
+        with mock.patch("profiling.cProfile.Profile", SingleProfile):
+            profiler.run(run)
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(done), 3)
+        with open(os.path.join(profiler.run_dir, "summary.txt"), encoding="utf-8") as f:
+            upload_line = next(line for line in f if line.startswith("upload"))
+        calls, _, unprofiled = upload_line.split()[1:]
+        self.assertEqual((calls, unprofiled), ("2", "2"))
+        self.assertTrue(os.path.exists(os.path.join(profiler.run_dir, "m3u.prof")))
+        self.assertTrue(os.path.exists(os.path.join(profiler.run_dir, "other.prof")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+"""
+Тесты группировки смарт-плейлистов
+"""
+import unittest
+from unittest import mock
+
+from smart_playlists import SmartPlaylistGenerator
+from tests.helpers import ListLogger
+
+SMB_CONFIG = {"server": "NAS", "share": "music"}
+
+
+def entry(video_id):
+    return {"id": video_id, "file": f"{video_id}.mp3", "title": video_id, "duration": 200}
+
+
+class GroupByFolderTest(unittest.TestCase):
+    def generate(self, entries_by_destination, name="By {group}.m3u8"):
+        manifest = mock.Mock()
+        manifest.get_all_entries.return_value = entries_by_destination
+        manifest.get_smart_hash.return_value = None
+        m3u_manager = mock.Mock()
+        m3u_manager.write_m3u_playlist.side_effect = lambda config, folder, name, entries, *args, **kwargs: name
+        self.logger = ListLogger()
+        generator = SmartPlaylistGenerator(m3u_manager, manifest, self.logger)
+        generator.generate([{"name": name, "smb_config": SMB_CONFIG, "folder": "Smart", "group_by": "folder"}])
+        return {
+            call.args[2]: [item["file"] for item in call.args[3]]
+            for call in m3u_manager.write_m3u_playlist.call_args_list
+        }
+
+    def test_same_basename_in_different_folders_stays_separate(self):
+        playlists = self.generate({
+            "NAS/music/Rock/Live": [entry("a")],
+            "NAS/music/Jazz/Live": [entry("b")],
+            "NAS/music/Pop [2020]": [entry("c")],
+        })
+        self.assertEqual(playlists, {
+            "By Rock_Live.m3u8": ["../Rock/Live/a.mp3"],
+            "By Jazz_Live.m3u8": ["../Jazz/Live/b.mp3"],
+            "By Pop [2020].m3u8": ["../Pop [2020]/c.mp3"],
+        })
+
+    def test_name_collision_is_reported_instead_of_overwriting(self):
+        playlists = self.generate({
+            "NAS/music/Rock/Live": [entry("a")],
+            "NAS/music/Jazz/Live": [entry("b")],
+        }, name="Live.m3u8")
+        self.assertEqual(playlists, {})
+        self.assertEqual([level for level, _ in self.logger.messages if level == "error"], ["error"])
+
+
+if __name__ == "__main__":
+    unittest.main()
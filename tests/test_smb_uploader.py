@@ -0,0 +1,74 @@
+"""
+Тесты очередей зеркал MirroredSMBUploader
+"""
+import threading
+import time
+import unittest
+from unittest import mock
+
+from destinations import destination_key
+from smb_uploader import MirroredSMBUploader
+from tests.helpers import ListLogger
+
+
+class FakeMirror:
+    """Зеркало, которое подключается по флагу конфигурации и загружает по сигналу"""
+
+    def __init__(self, *args):
+        self.current_config = None
+        self.uploaded = []
+        self.release = threading.Event()
+
+    def connect(self, smb_config, folder_path):
+        self.current_config = dict(smb_config, performance={"verify": "size"})
+        return smb_config["online"]
+
+    def upload_buffer(self, data, remote_filename, expected_hash):
+        self.release.wait(5)
+        self.uploaded.append(remote_filename)
+        return True
+
+    def disconnect(self):
+        pass
+
+
+class MirroredUploaderTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch("smb_uploader.SMBFileUploader", FakeMirror)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.uploader = MirroredSMBUploader(ListLogger(), max_backlog=1)
+        self.addCleanup(self.uploader.disconnect)
+
+    def test_duplicate_config_does_not_shift_mirrors(self):
+        nas = {"server": "NAS", "share": "music", "online": True}
+        backup = {"server": "BACKUP", "share": "music", "online": True}
+        self.assertTrue(self.uploader.connect([nas, dict(nas), backup], "Rock"))
+        mirror = self.uploader._mirrors[destination_key(backup, "Rock")]
+        self.assertEqual(mirror.current_config["server"], "BACKUP")
+
+    def test_full_backlog_blocks_instead_of_skipping(self):
+        config = {"server": "NAS", "share": "music", "online": True}
+        self.uploader.connect([config], "Rock")
+        destination = destination_key(config, "Rock")
+        mirror = self.uploader._mirrors[destination]
+        self.uploader.upload_data_to_destinations(b"a", "A.mp3", [destination])
+
+        # Очередь зеркала занята первым файлом: второй ждет места, а не пропускается
+        queued = []
+        producer = threading.Thread(
+            target=lambda: queued.append(self.uploader.upload_data_to_destinations(b"b", "B.mp3", [destination]))
+        )
+        producer.start()
+        time.sleep(0.2)
+        self.assertEqual(queued, [])
+
+        mirror.release.set()
+        producer.join(5)
+        self.uploader.wait_for_uploads()
+        self.assertEqual(queued, [1])
+        self.assertEqual(mirror.uploaded, ["A.mp3", "B.mp3"])
+
+
+if __name__ == "__main__":
+    unittest.main()
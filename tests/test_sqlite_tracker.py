@@ -0,0 +1,58 @@
+"""
+Тесты пакетной фиксации SqliteDownloadTracker
+"""
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+
+from sqlite_tracker import SqliteDownloadTracker
+from tests.helpers import ListLogger
+
+
+class CommitTimerTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.db_file = os.path.join(directory.name, "downloaded.db")
+
+    def test_pending_batch_is_committed_without_further_writes(self):
+        tracker = SqliteDownloadTracker(self.db_file, ListLogger(), commit_batch_size=50, commit_interval=0.2)
+        self.addCleanup(tracker.close)
+        tracker.mark_delivered("aaaaaaaaaaa", "NAS/music/Rock", "Song A.mp3", 100)
+
+        # Пока пакет открыт, другой процесс не может писать; после таймера - может
+        time.sleep(0.5)
+        other = sqlite3.connect(self.db_file, timeout=0)
+        self.addCleanup(other.close)
+        with other:
+            other.execute("INSERT INTO meta (key, value) VALUES ('probe', '1')")
+        self.assertEqual(other.execute("SELECT COUNT(*) FROM deliveries").fetchone()[0], 1)
+
+
+class ReadOnlyTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.db_file = os.path.join(directory.name, "downloaded.db")
+
+    def test_missing_database_is_not_created(self):
+        with self.assertRaises(sqlite3.OperationalError):
+            SqliteDownloadTracker(self.db_file, ListLogger(), read_only=True)
+        self.assertFalse(os.path.exists(self.db_file))
+
+    def test_existing_database_is_readable_but_not_writable(self):
+        tracker = SqliteDownloadTracker(self.db_file, ListLogger())
+        tracker.mark_as_downloaded("aaaaaaaaaaa", "Song A.mp3")
+        tracker.close()
+
+        reader = SqliteDownloadTracker(self.db_file, ListLogger(), read_only=True)
+        self.addCleanup(reader.close)
+        self.assertEqual(reader.get_downloaded_list(), ["aaaaaaaaaaa"])
+        with self.assertRaises(sqlite3.OperationalError):
+            reader._connection.execute("INSERT INTO meta (key, value) VALUES ('probe', '1')")
+
+
+if __name__ == "__main__":
+    unittest.main()
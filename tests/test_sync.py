@@ -0,0 +1,51 @@
+"""
+Тесты синхронизации плейлиста на фиктивных бэкендах (см. benchmarks/fakes.py)
+"""
+import os
+import tempfile
+import unittest
+
+from benchmarks.fakes import (
+    FakeAudioDownloader, FakePlaylistExtractor, LatencyRecorder, LatencyShim, LocalMirrorUploader
+)
+from destinations import destination_key
+from m3u_manifest import M3UManifest
+from sqlite_tracker import SqliteDownloadTracker
+from tests.helpers import ListLogger
+from youtube_mp3_sync import YouTubeMP3Synchronizer
+
+SMB_CONFIG = {"server": "NAS", "share": "music", "username": "", "password": "", "domain": ""}
+
+
+class ManifestSaveTest(unittest.TestCase):
+    def test_folder_only_playlist_saves_the_manifest(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        logger = ListLogger()
+        tracker = SqliteDownloadTracker(os.path.join(directory.name, "downloaded.db"), logger)
+        self.addCleanup(tracker.close)
+        recorder = LatencyRecorder()
+        manifest_file = os.path.join(directory.name, "m3u_manifest.json")
+        # Плейлист без ключа "playlist": M3U не создается
+        playlist = {
+            "url": "https://www.youtube.com/playlist?list=TEST", "folder": "Music/Rock", "smb_config": SMB_CONFIG
+        }
+        synchronizer = YouTubeMP3Synchronizer(
+            playlist_extractor=FakePlaylistExtractor(3),
+            download_tracker=tracker,
+            audio_downloader=FakeAudioDownloader(1000, 0.0, recorder),
+            file_uploader=LocalMirrorUploader(os.path.join(directory.name, "mirrors"), LatencyShim(), recorder, 4),
+            logger=logger,
+            temp_dir=os.path.join(directory.name, "temp"),
+            m3u_manifest=M3UManifest(manifest_file, logger),
+            playlists=[playlist]
+        )
+
+        synchronizer.sync()
+
+        entries = M3UManifest(manifest_file, logger).get_entries(destination_key(SMB_CONFIG, "Music/Rock"))
+        self.assertEqual(len(entries), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,195 @@
+"""
+Адаптивное ограничение частоты запросов к YouTube (AIMD)
+"""
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Optional
+
+from interfaces import ILogger
+
+# Ответы YouTube, означающие превышение частоты запросов или проверку на бота
+RATE_LIMIT_PATTERNS = re.compile(
+    r"HTTP Error 429|Too Many Requests|rate[- ]limit|confirm you.re not a bot|unusual traffic",
+    re.IGNORECASE
+)
+
+# Сколько успешных запросов подряд нужно для увеличения параллельности на 1
+CONCURRENCY_INCREASE_AFTER = 20
+
+
+class EmptyResultError(Exception):
+    """Запрос к YouTube не вернул результат (yt-dlp с ignoreerrors проглотил ошибку)"""
+
+
+def is_rate_limited(error: Exception) -> bool:
+    """Является ли ошибка ответом об ограничении частоты запросов"""
+    return bool(RATE_LIMIT_PATTERNS.search(str(error)))
+
+
+class AdaptiveThrottle:
+    """
+    Общий регулятор частоты и параллельности запросов к YouTube.
+
+    Запросы выполняются не чаще rate в минуту и не более concurrency
+    одновременно. Каждый успешный запрос немного увеличивает частоту
+    (аддитивно), ответ 429 или проверка на бота уменьшает частоту вдвое
+    и параллельность вдвое (мультипликативно) и дает паузу. Так частота
+    держится чуть ниже порога, после которого YouTube начинает ограничивать.
+
+    Найденная безопасная частота сохраняется в state_file и используется
+    как начальная при следующем запуске.
+    """
+
+    def __init__(
+        self,
+        logger: ILogger,
+        state_file: Optional[str] = None,
+        initial_rate: float = 30.0,
+        min_rate: float = 2.0,
+        max_rate: float = 120.0,
+        max_concurrency: int = 4,
+        increase_step: float = 0.5,
+        decrease_factor: float = 0.5,
+        metrics=None
+    ):
+        """
+        Args:
+            logger: Логгер
+            state_file: JSON файл для сохранения найденной частоты (None - не сохранять)
+            initial_rate: Начальная частота (запросов в минуту), если сохраненной нет
+            min_rate: Минимальная частота
+            max_rate: Максимальная частота
+            max_concurrency: Максимум одновременных запросов
+            increase_step: Прибавка частоты после успешного запроса (запросов в минуту)
+            decrease_factor: Множитель частоты при ограничении
+            metrics: Сборщик метрик (частота, параллельность, число ограничений)
+        """
+        self.logger = logger
+        self.state_file = state_file
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.max_concurrency = max_concurrency
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.metrics = metrics
+        self.rate = initial_rate
+        self.concurrency = max_concurrency
+        self._active = 0
+        self._successes = 0
+        self._next_slot = 0.0
+        self._changed = False
+        self._condition = threading.Condition()
+        self._load()
+
+    def _load(self) -> None:
+        """Загрузить сохраненную частоту и параллельность"""
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            self.rate = min(self.max_rate, max(self.min_rate, float(state["rate"])))
+            self.concurrency = min(self.max_concurrency, max(1, int(state["concurrency"])))
+            self.logger.info(
+                f"Частота запросов к YouTube из прошлого запуска: {self.rate:.1f}/мин, параллельно {self.concurrency}"
+            )
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            self.logger.warning(f"Не удалось прочитать состояние ограничителя {self.state_file}: {e}")
+
+    def save(self) -> None:
+        """Сохранить найденную частоту (если она менялась)"""
+        if not self.state_file or not self._changed:
+            return
+        with self._condition:
+            state = {
+                "rate": round(self.rate, 2),
+                "concurrency": self.concurrency,
+                "updated": datetime.now().isoformat(timespec="seconds"),
+            }
+            self._changed = False
+        tmp_file = f"{self.state_file}.tmp"
+        try:
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(state, f, indent=2)
+            os.replace(tmp_file, self.state_file)
+        except OSError as e:
+            self.logger.warning(f"Не удалось сохранить состояние ограничителя: {e}")
+
+    def _acquire(self) -> None:
+        """Дождаться свободного слота параллельности и очереди по частоте"""
+        with self._condition:
+            while self._active >= self.concurrency:
+                self._condition.wait()
+            self._active += 1
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + 60.0 / self.rate
+        if slot > now:
+            time.sleep(slot - now)
+
+    def _release(self) -> None:
+        with self._condition:
+            self._active -= 1
+            self._condition.notify()
+
+    def _on_success(self) -> None:
+        """Аддитивное увеличение частоты (и параллельности после серии успехов)"""
+        with self._condition:
+            self.rate = min(self.max_rate, self.rate + self.increase_step)
+            self._successes += 1
+            if self._successes >= CONCURRENCY_INCREASE_AFTER and self.concurrency < self.max_concurrency:
+                self.concurrency += 1
+                self._successes = 0
+                self._condition.notify()
+            self._changed = True
+        self._update_metrics()
+
+    def _on_rate_limited(self, error: Exception) -> None:
+        """Мультипликативное уменьшение частоты и параллельности с паузой"""
+        with self._condition:
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+            self.concurrency = max(1, self.concurrency // 2)
+            self._successes = 0
+            # Пауза перед следующим запросом - два интервала новой частоты
+            self._next_slot = max(self._next_slot, time.monotonic() + 2 * 60.0 / self.rate)
+            self._changed = True
+        self.logger.warning(
+            f"YouTube ограничивает запросы ({error}); частота снижена до {self.rate:.1f}/мин, "
+            f"параллельно {self.concurrency}"
+        )
+        if self.metrics:
+            self.metrics.inc("rate_limited_total")
+        self._update_metrics()
+        self.save()
+
+    def _update_metrics(self) -> None:
+        if self.metrics:
+            self.metrics.set_gauge("youtube_request_rate", self.rate)
+            self.metrics.set_gauge("youtube_concurrency", self.concurrency)
+
+    def call(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Выполнить запрос к YouTube с учетом ограничений
+
+        Ошибка ограничения частоты передается дальше (например, для повтора
+        в resilience.ResilientCaller) после снижения частоты. Результат None
+        (так yt-dlp с ignoreerrors сообщает об ошибке) не считается успехом:
+        частота не растет, выбрасывается EmptyResultError.
+        """
+        self._acquire()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            if is_rate_limited(e):
+                self._on_rate_limited(e)
+            raise
+        finally:
+            self._release()
+        if result is None:
+            raise EmptyResultError(f"{getattr(func, '__name__', 'Запрос')}: YouTube не вернул результат")
+        self._on_success()
+        return result
@@ -0,0 +1,130 @@
+"""
+Запись временной шкалы обработки видео в формате Chrome Trace Event (Perfetto)
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+# Теги текущего контекста (плейлист, видео, сервер), наследуются спанами
+_trace_tags: contextvars.ContextVar = contextvars.ContextVar("trace_tags", default={})
+
+
+class TraceRecorder:
+    """
+    Запись спанов этапов для просмотра в Perfetto / chrome://tracing.
+
+    Каждый этап записывается как событие "X" на дорожке потока, в котором он
+    выполнялся, с тегами текущего контекста (плейлист, видео, сервер, поток).
+    Ожидание в очередях записывается асинхронными событиями, поэтому видно,
+    сколько файл простоял за медленным зеркалом.
+
+    Контекст хранится в contextvars: чтобы теги попали в спаны рабочих
+    потоков, задачи запускаются через contextvars.copy_context().run.
+    """
+
+    def __init__(self, trace_file: str):
+        """
+        Args:
+            trace_file: Путь к JSON файлу трассировки
+        """
+        self.trace_file = trace_file
+        self._lock = threading.Lock()
+        self._events: List[Dict[str, Any]] = []
+        self._threads: Dict[int, str] = {}
+        self._origin = time.perf_counter()
+        self._pid = os.getpid()
+        self._next_id = 0
+
+    def _timestamp(self, perf_time: float) -> float:
+        """Перевести perf_counter в микросекунды от начала записи"""
+        return round((perf_time - self._origin) * 1_000_000, 1)
+
+    def _thread_id(self) -> int:
+        """ID текущего потока (имя потока запоминается для дорожки)"""
+        thread = threading.current_thread()
+        if thread.ident not in self._threads:
+            with self._lock:
+                self._threads[thread.ident] = thread.name
+        return thread.ident
+
+    @contextmanager
+    def context(self, span: Optional[str] = None, **tags):
+        """
+        Добавить теги ко всем спанам внутри блока (в том числе в других потоках)
+
+        Args:
+            span: Имя спана, охватывающего весь блок (None - без спана)
+        """
+        token = _trace_tags.set({**_trace_tags.get(), **tags})
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            if span:
+                self.add_span(span, started, time.perf_counter(), "video")
+            _trace_tags.reset(token)
+
+    @contextmanager
+    def span(self, name: str, category: str = "stage", **tags):
+        """Записать спан блока на дорожке текущего потока"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, started, time.perf_counter(), category, **tags)
+
+    def add_span(self, name: str, started: float, ended: float, category: str = "stage", **tags) -> None:
+        """Записать завершенный спан (времена по time.perf_counter)"""
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": self._timestamp(started),
+            "dur": round((ended - started) * 1_000_000, 1),
+            "pid": self._pid,
+            "tid": self._thread_id(),
+            "args": {**_trace_tags.get(), **tags, "worker": threading.current_thread().name},
+        }
+        with self._lock:
+            self._events.append(event)
+
+    def add_interval(self, name: str, started: float, ended: float, category: str = "queue", **tags) -> None:
+        """Записать интервал ожидания отдельной асинхронной дорожкой"""
+        args = {**_trace_tags.get(), **tags}
+        with self._lock:
+            self._next_id += 1
+            event_id = self._next_id
+            for phase, timestamp in (("b", started), ("e", ended)):
+                self._events.append({
+                    "name": name, "cat": category, "ph": phase, "id": event_id,
+                    "ts": self._timestamp(timestamp), "pid": self._pid, "tid": 0, "args": args,
+                })
+
+    def write(self) -> bool:
+        """
+        Записать трассировку в файл (атомарная замена)
+
+        Returns:
+            True если файл записан
+        """
+        with self._lock:
+            metadata = [
+                {"name": "thread_name", "ph": "M", "pid": self._pid, "tid": tid, "args": {"name": name}}
+                for tid, name in self._threads.items()
+            ]
+            metadata.append({"name": "process_name", "ph": "M", "pid": self._pid, "args": {"name": "youtube_mp3_sync"}})
+            events = metadata + list(self._events)
+
+        tmp_file = f"{self.trace_file}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.trace_file) or ".", exist_ok=True)
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+            os.replace(tmp_file, self.trace_file)
+        except OSError:
+            return False
+        return True
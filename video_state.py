@@ -0,0 +1,78 @@
+"""
+Состояния обработки видео и политика повторных попыток
+"""
+import re
+import time
+from typing import Dict, Any, Optional
+from interfaces import STATE_FAILED_TRANSIENT, STATE_FAILED_PERMANENT
+
+# Ошибки yt-dlp, которые не исчезнут при повторной попытке
+PERMANENT_ERROR_PATTERNS = re.compile(
+    r"video unavailable|private video|has been removed|been terminated|"
+    r"no longer available|copyright|members[- ]only|join this channel|"
+    r"not available in your country|blocked it in your country|"
+    r"sign in to confirm your age|inappropriate for some users|"
+    r"premieres in|is not a valid url|unsupported url",
+    re.IGNORECASE
+)
+
+
+def is_permanent_error(message: str) -> bool:
+    """Проверить, является ли ошибка загрузки постоянной (видео недоступно)"""
+    return bool(PERMANENT_ERROR_PATTERNS.search(message or ""))
+
+
+class RetryPolicy:
+    """
+    Экспоненциальная задержка повторных попыток загрузки.
+
+    После каждой временной ошибки задержка удваивается (от base_delay до
+    max_delay). Постоянные ошибки и исчерпание max_attempts переводят видео
+    в состояние failed-permanent: такие видео больше не запрашиваются.
+    """
+
+    def __init__(self, base_delay: float = 3600, max_delay: float = 7 * 86400, max_attempts: int = 8):
+        """
+        Args:
+            base_delay: Задержка после первой ошибки (секунды)
+            max_delay: Максимальная задержка (секунды)
+            max_attempts: Количество попыток до перевода в failed-permanent
+        """
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+
+    def next_failure(
+        self,
+        previous: Optional[Dict[str, Any]],
+        error: str,
+        permanent: bool,
+        now: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Сформировать новую запись об ошибке видео
+
+        Args:
+            previous: Предыдущая запись об ошибке (или None)
+            error: Текст ошибки
+            permanent: Ошибка постоянная
+            now: Текущее время (timestamp)
+
+        Returns:
+            Запись {state, attempts, next_retry, error}
+        """
+        now = time.time() if now is None else now
+        attempts = (previous or {}).get("attempts", 0) + 1
+        if permanent or attempts >= self.max_attempts:
+            return {"state": STATE_FAILED_PERMANENT, "attempts": attempts, "next_retry": None, "error": error}
+
+        delay = min(self.base_delay * 2 ** (attempts - 1), self.max_delay)
+        return {"state": STATE_FAILED_TRANSIENT, "attempts": attempts, "next_retry": now + delay, "error": error}
+
+    @staticmethod
+    def is_due(failure: Dict[str, Any], now: Optional[float] = None) -> bool:
+        """Проверить, пора ли повторить попытку для видео с ошибкой"""
+        if failure["state"] == STATE_FAILED_PERMANENT:
+            return False
+        now = time.time() if now is None else now
+        return not failure.get("next_retry") or failure["next_retry"] <= now
@@ -0,0 +1,434 @@
+"""
+Режим нескольких узлов: координатор заполняет общую очередь заданий, узлы-исполнители
+скачивают видео и загружают их в назначения
+"""
+import os
+import socket
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+from interfaces import IAudioDownloader, IDownloadTracker, IJobQueue, ILogger, IMirroredFileUploader, IPlaylistExtractor
+from destinations import destination_key, get_smb_configs
+from m3u_manager import M3UPlaylistManager
+from m3u_manifest import M3UManifest
+from metrics import MetricsRecorder
+from naming import NamingIndex
+from temp_space import TempSpaceManager
+from video_state import RetryPolicy, STATE_FAILED_PERMANENT
+from youtube_mp3_sync import download_track
+
+# Этапы, на которых задание завершилось ошибкой
+STAGE_DOWNLOAD_FAILED = "download"
+STAGE_UPLOAD_FAILED = "upload"
+
+
+def default_worker_id() -> str:
+    """Идентификатор узла: имя хоста и PID процесса"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class QueueWorker:
+    """
+    Исполнитель заданий общей очереди
+
+    Берет в аренду все задания нескольких видео, скачивает каждое видео один
+    раз и отправляет его во все назначения из заданий. Пока задания в работе,
+    фоновый поток продлевает аренду; если узел упадет, аренда истечет и
+    задания получит другой узел.
+    """
+
+    def __init__(
+        self,
+        job_queue: IJobQueue,
+        audio_downloader: IAudioDownloader,
+        file_uploader: IMirroredFileUploader,
+        logger: ILogger,
+        playlists: List[Dict[str, Any]],
+        worker_id: Optional[str] = None,
+        lease_seconds: float = 600,
+        batch_size: int = 2,
+        temp_dir: str = "temp_downloads",
+        poll_interval: float = 30,
+        metrics: Optional[MetricsRecorder] = None,
+        temp_space: Optional[TempSpaceManager] = None,
+        spool_max_bytes: int = 0
+    ):
+        """
+        Args:
+            job_queue: Общая очередь заданий
+            audio_downloader: Загрузчик аудио
+            file_uploader: Загрузчик файлов на сервер (с поддержкой зеркал)
+            logger: Логгер
+            playlists: Плейлисты (по ним назначение задания сопоставляется с настройками SMB)
+            worker_id: Идентификатор узла (по умолчанию хост и PID)
+            lease_seconds: Срок аренды заданий; продлевается каждую треть срока
+            batch_size: Сколько видео брать из очереди за раз
+            temp_dir: Временная директория для загрузок
+            poll_interval: Пауза между опросами пустой очереди в режиме ожидания (секунды)
+            metrics: Сборщик метрик
+            temp_space: Учет места во временной папке (резерв перед каждой загрузкой)
+            spool_max_bytes: Треки до этого размера обрабатываются в памяти (0 - всегда через диск)
+        """
+        self.job_queue = job_queue
+        self.audio_downloader = audio_downloader
+        self.file_uploader = file_uploader
+        self.logger = logger
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_seconds = lease_seconds
+        self.batch_size = batch_size
+        self.temp_dir = temp_dir
+        self.poll_interval = poll_interval
+        self.metrics = metrics or MetricsRecorder()
+        self.temp_space = temp_space or TempSpaceManager(logger, temp_dir)
+        self.spool_max_bytes = spool_max_bytes
+        # Назначение -> (плейлист, настройки SMB)
+        self.destinations = {
+            destination_key(smb_config, playlist_config["folder"]): (playlist_config, smb_config)
+            for playlist_config in playlists for smb_config in get_smb_configs(playlist_config)
+        }
+        self._held: Dict[str, Dict[str, Any]] = {}
+        self._held_lock = threading.Lock()
+        self._stop = threading.Event()
+
+        os.makedirs(self.temp_dir, exist_ok=True)
+
+    def run(self, follow: bool = False) -> int:
+        """
+        Обрабатывать задания, пока очередь не опустеет
+
+        Args:
+            follow: Не завершаться на пустой очереди, а ждать новых заданий
+
+        Returns:
+            Количество обработанных видео
+        """
+        self.logger.info(f"Узел {self.worker_id} начинает обработку очереди")
+        self._stop.clear()
+        heartbeat = threading.Thread(target=self._heartbeat, name="lease-heartbeat", daemon=True)
+        heartbeat.start()
+        processed = 0
+        try:
+            while True:
+                jobs = self.job_queue.claim(self.worker_id, self.batch_size, self.lease_seconds)
+                if not jobs:
+                    if not follow:
+                        break
+                    self._stop.wait(self.poll_interval)
+                    continue
+                processed += len({job["video_id"] for job in jobs})
+                self._process_batch(jobs)
+        finally:
+            self._stop.set()
+            heartbeat.join()
+        self.logger.info(f"Узел {self.worker_id} завершил работу. Обработано видео: {processed}")
+        return processed
+
+    def _heartbeat(self) -> None:
+        """Продлевать аренду заданий, пока они в работе"""
+        while not self._stop.wait(self.lease_seconds / 3):
+            with self._held_lock:
+                job_ids = list(self._held)
+            if not job_ids:
+                continue
+            try:
+                renewed = self.job_queue.renew(self.worker_id, job_ids, self.lease_seconds)
+            except Exception as e:
+                self.logger.warning(f"Не удалось продлить аренду заданий: {e}")
+                continue
+            if renewed < len(job_ids):
+                self.logger.warning(
+                    f"Аренда {len(job_ids) - renewed} из {len(job_ids)} заданий потеряна "
+                    f"(истекла и передана другому узлу)"
+                )
+
+    def _hold(self, jobs: List[Dict[str, Any]]) -> None:
+        with self._held_lock:
+            for job in jobs:
+                self._held[job["job_id"]] = job
+
+    def _release(self, job: Dict[str, Any]) -> bool:
+        """Снять задание с учета; False - результат по нему уже отправлен"""
+        with self._held_lock:
+            return self._held.pop(job["job_id"], None) is not None
+
+    def _complete(self, job: Dict[str, Any], remote_file: str, size: int) -> None:
+        if self._release(job) and not self.job_queue.complete(self.worker_id, job["job_id"], remote_file, size):
+            self.logger.warning(f"Аренда задания {job['job_id']} истекла, результат не принят")
+
+    def _fail(self, job: Dict[str, Any], error: str, permanent: bool = False,
+              stage: str = STAGE_UPLOAD_FAILED) -> None:
+        # Задание, аренда которого истекла и передана другому узлу, очередь не изменит
+        if self._release(job):
+            self.job_queue.fail(self.worker_id, job["job_id"], error, permanent, stage)
+
+    def _process_batch(self, jobs: List[Dict[str, Any]]) -> None:
+        """Обработать задания, сгруппировав их по папкам назначения"""
+        self._hold(jobs)
+        by_folder = defaultdict(list)
+        for job in jobs:
+            target = self.destinations.get(job["destination"])
+            if target is None:
+                self.logger.error(f"Назначение задания отсутствует в настройках узла: {job['destination']}")
+                self._fail(job, "Назначение не настроено на узле")
+                continue
+            by_folder[target[0]["folder"]].append(job)
+
+        for target_folder, folder_jobs in by_folder.items():
+            smb_configs = []
+            for job in folder_jobs:
+                smb_config = self.destinations[job["destination"]][1]
+                if smb_config not in smb_configs:
+                    smb_configs.append(smb_config)
+
+            if not self.file_uploader.connect(smb_configs, target_folder):
+                servers = ", ".join(config['server'] for config in smb_configs)
+                self.logger.error(f"Не удалось подключиться ни к одному SMB серверу: {servers}")
+                for job in folder_jobs:
+                    self._fail(job, "Нет подключения к серверу")
+                continue
+
+            try:
+                by_video = defaultdict(list)
+                for job in folder_jobs:
+                    by_video[job["video_id"]].append(job)
+                for video_jobs in by_video.values():
+                    self._process_video(video_jobs)
+                self.file_uploader.wait_for_uploads()
+            except Exception as e:
+                self.logger.error(f"Ошибка при обработке заданий папки '{target_folder}': {e}")
+            finally:
+                self.file_uploader.disconnect()
+                # Задания без результата (зеркало пропустило файл или отключилось) возвращаются в очередь
+                for job in folder_jobs:
+                    self._fail(job, "Файл не был отправлен на сервер")
+
+    def _process_video(self, video_jobs: List[Dict[str, Any]]) -> None:
+        """Скачать видео один раз и отправить его во все назначения заданий"""
+        video = video_jobs[0]["video"]
+        video_title = video.get('title', 'Неизвестное название')
+        playlist_config = self.destinations[video_jobs[0]["destination"]][0]
+        connected = set(self.file_uploader.get_destinations())
+        jobs_by_destination = {}
+        for job in video_jobs:
+            if job["destination"] in connected:
+                jobs_by_destination[job["destination"]] = job
+            else:
+                self._fail(job, "Назначение недоступно")
+        if not jobs_by_destination:
+            return
+
+        with self.metrics.trace_context("video", worker=self.worker_id, video=video["id"], title=video_title), \
+                self.temp_space.reserve(video.get("duration")) as temp_dir:
+            self.logger.info(f"Обрабатываем видео: {video_title}")
+            if temp_dir is None:
+                # Задания вернутся в очередь и достанутся узлу со свободным местом
+                for job in jobs_by_destination.values():
+                    self._fail(job, "Недостаточно места во временной папке")
+                return
+            data, local_path, _ = download_track(
+                self.audio_downloader, video, os.path.join(temp_dir, f"{video_jobs[0]['name']}.mp3"),
+                playlist_config.get("performance"), self.spool_max_bytes, temp_dir
+            )
+            if data is None and not local_path:
+                self.logger.error(f"Не удалось скачать аудио: {video_title}")
+                last_error = self.audio_downloader.get_last_error() or {"error": "Неизвестная ошибка", "permanent": False}
+                for job in jobs_by_destination.values():
+                    self._fail(job, last_error["error"], last_error["permanent"], STAGE_DOWNLOAD_FAILED)
+                self.metrics.inc("videos_total", result="failed")
+                return
+
+            extension = os.path.splitext(local_path)[1] or ".mp3"
+            remote_filename = video_jobs[0]["name"] + extension
+
+            def on_result(destination: str, success: bool, size: int) -> None:
+                job = jobs_by_destination.get(destination)
+                if job is None:
+                    return
+                if success:
+                    self._complete(job, remote_filename, size)
+                    self.logger.info(f"Успешно обработано: {video_title} -> {destination}")
+                else:
+                    self.logger.error(f"Не удалось загрузить файл на {destination}: {video_title}")
+                    self._fail(job, "Ошибка загрузки на сервер")
+
+            try:
+                if data is not None:
+                    self.file_uploader.upload_data_to_destinations(
+                        data, remote_filename, list(jobs_by_destination), on_result
+                    )
+                else:
+                    self.file_uploader.upload_to_destinations(
+                        local_path, remote_filename, list(jobs_by_destination), on_result
+                    )
+            except Exception as e:
+                self.logger.error(f"Ошибка при отправке файла на SMB: {video_title}: {e}")
+            finally:
+                if data is None:
+                    try:
+                        os.remove(local_path)
+                    except OSError as e:
+                        self.logger.warning(f"Не удалось удалить временный файл {local_path}: {e}")
+            self.metrics.inc("videos_total", result="downloaded")
+
+
+class JobCoordinator:
+    """
+    Координатор общей очереди
+
+    Ставит в очередь недоставленные видео плейлистов (видео × назначение),
+    переносит результаты узлов в трекер и манифест M3U и обновляет M3U
+    плейлисты. Трекер и манифест ведет только координатор.
+    """
+
+    def __init__(
+        self,
+        job_queue: IJobQueue,
+        playlist_extractor: IPlaylistExtractor,
+        download_tracker: IDownloadTracker,
+        m3u_manifest: M3UManifest,
+        logger: ILogger,
+        retry_policy: Optional[RetryPolicy] = None,
+        m3u_manager: Optional[M3UPlaylistManager] = None
+    ):
+        """
+        Args:
+            job_queue: Общая очередь заданий
+            playlist_extractor: Экстрактор плейлиста
+            download_tracker: Трекер загруженных файлов
+            m3u_manifest: Манифест доставленных треков
+            logger: Логгер
+            retry_policy: Политика повторных попыток для видео с ошибками загрузки
+            m3u_manager: Менеджер M3U плейлистов на серверах
+        """
+        self.job_queue = job_queue
+        self.playlist_extractor = playlist_extractor
+        self.download_tracker = download_tracker
+        self.m3u_manifest = m3u_manifest
+        self.logger = logger
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.m3u_manager = m3u_manager or M3UPlaylistManager(logger)
+
+    def import_results(self) -> int:
+        """
+        Перенести завершенные задания в трекер и манифест
+
+        Returns:
+            Количество доставок
+        """
+        delivered = 0
+        failed_videos = {}
+        for job in self.job_queue.collect_results():
+            if job["state"] == "done":
+                self.download_tracker.mark_delivered(job["video_id"], job["destination"], job["remote_file"], job["size"])
+                self.m3u_manifest.record_track(job["destination"], job["video"], job["remote_file"])
+                delivered += 1
+            elif job["stage"] == STAGE_DOWNLOAD_FAILED:
+                # Ошибка загрузки видео учитывается один раз, а не по каждому назначению
+                failed_videos[job["video_id"]] = job
+            else:
+                self.logger.warning(f"Задание не выполнено: {job['job_id']}: {job['error']}")
+
+        failures = self.download_tracker.get_failures() if failed_videos else {}
+        for video_id, job in failed_videos.items():
+            failure = self.retry_policy.next_failure(failures.get(video_id), job["error"], job["permanent"])
+            self.download_tracker.record_failure(video_id, failure)
+            if failure["state"] == STATE_FAILED_PERMANENT:
+                self.logger.warning(f"Видео {video_id} недоступно, больше не запрашиваем: {failure['error']}")
+
+        if delivered or failed_videos:
+            self.download_tracker.flush()
+            self.m3u_manifest.save()
+            self.logger.info(f"Учтены результаты узлов: доставок {delivered}, ошибок загрузки {len(failed_videos)}")
+        return delivered
+
+    def enqueue_playlists(self, playlists: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Поставить в очередь недоставленные видео всех плейлистов
+
+        Returns:
+            Списки видео по URL плейлиста (для порядка треков в M3U)
+        """
+        failures = self.download_tracker.get_failures()
+        now = time.time()
+        videos_by_url = {}
+        jobs = []
+        skipped = 0
+        for playlist_config in playlists:
+            videos = self.playlist_extractor.get_video_list(playlist_config["url"])
+            if not videos:
+                self.logger.warning(f"Плейлист пуст или недоступен: {playlist_config['url']}")
+                continue
+            videos_by_url[playlist_config["url"]] = videos
+            destinations = [
+                destination_key(smb_config, playlist_config["folder"])
+                for smb_config in get_smb_configs(playlist_config)
+            ]
+            naming = NamingIndex(self.download_tracker, destinations)
+            for video in videos:
+                if not video.get('id') or not video.get('url'):
+                    continue
+                pending = [
+                    destination for destination in destinations
+                    if not self.download_tracker.is_delivered(video['id'], destination)
+                ]
+                if not pending:
+                    continue
+                failure = failures.get(video['id'])
+                if failure and (failure["state"] == STATE_FAILED_PERMANENT or not self.retry_policy.is_due(failure, now)):
+                    skipped += 1
+                    continue
+                # Узел добавит к имени расширение скачанного файла
+                name = os.path.splitext(naming.assign(video, pending, ".mp3"))[0]
+                video_data = {key: video.get(key) for key in ("id", "title", "url", "duration", "uploader")}
+                jobs.extend({"video": video_data, "destination": destination, "name": name} for destination in pending)
+
+        added = self.job_queue.enqueue(jobs) if jobs else 0
+        self.logger.info(
+            f"В очередь добавлено заданий: {added} (недоставлено {len(jobs)}, ожидают повтора: {skipped})"
+        )
+        return videos_by_url
+
+    def update_m3u(self, playlists: List[Dict[str, Any]], videos_by_url: Dict[str, List[Dict[str, Any]]]) -> None:
+        """Обновить M3U плейлисты по манифесту"""
+        for playlist_config in playlists:
+            playlist_name = playlist_config.get("playlist", "")
+            videos = videos_by_url.get(playlist_config["url"])
+            if not playlist_name or not playlist_name.strip() or not videos:
+                continue
+            for smb_config in get_smb_configs(playlist_config):
+                destination = destination_key(smb_config, playlist_config["folder"])
+                self.m3u_manifest.update_order(destination, videos)
+                tracks = self.m3u_manifest.get_entries(destination)
+                if not tracks:
+                    continue
+                content_hash = self.m3u_manager.write_m3u_playlist(
+                    smb_config, playlist_config["folder"], playlist_name, tracks,
+                    self.m3u_manifest.get_m3u_hash(destination)
+                )
+                if content_hash:
+                    self.m3u_manifest.set_m3u_hash(destination, content_hash)
+                else:
+                    self.logger.warning(f"Не удалось обновить M3U плейлист: {playlist_name} ({destination})")
+        self.m3u_manifest.save()
+
+    def run(self, playlists: List[Dict[str, Any]], wait: bool = False, poll_interval: float = 30) -> None:
+        """
+        Один проход координатора: учесть результаты, поставить задания, обновить M3U
+
+        Args:
+            playlists: Плейлисты
+            wait: Дождаться выполнения всех заданий, учитывая результаты по мере готовности
+            poll_interval: Пауза между проверками очереди при ожидании (секунды)
+        """
+        self.import_results()
+        videos_by_url = self.enqueue_playlists(playlists)
+        while wait:
+            counts = self.job_queue.counts()
+            self.import_results()
+            if not counts["pending"] and not counts["leased"]:
+                break
+            self.logger.info(f"Ожидаем узлы: в очереди {counts['pending']}, в работе {counts['leased']}")
+            time.sleep(poll_interval)
+        self.update_m3u(playlists, videos_by_url)
@@ -2,12 +2,57 @@
 Основной класс приложения для синхронизации MP3 из YouTube плейлиста на SMB диск
 """
 import os
-from typing import List, Dict, Any
+import threading
+import time
+from collections import Counter
+from typing import List, Dict, Any, Optional, Tuple
 from interfaces import (
     IPlaylistExtractor, IDownloadTracker, IAudioDownloader, 
-    IFileUploader, ILogger
+    IMirroredFileUploader, ILogger
 )
 from m3u_manager import M3UPlaylistManager
+from m3u_manifest import M3UManifest
+from smart_playlists import SmartPlaylistGenerator
+from destinations import get_smb_configs, destination_key
+from naming import sanitize_filename, NamingIndex
+from logger import is_debug_enabled
+from video_state import RetryPolicy, STATE_FAILED_PERMANENT
+from metrics import MetricsRecorder, STAGE_ENUMERATION, STAGE_M3U
+from temp_space import TempSpaceManager
+
+
+def download_track(
+    audio_downloader: IAudioDownloader,
+    video: Dict[str, Any],
+    output_path: str,
+    performance: Optional[Dict[str, Any]],
+    spool_max_bytes: int = 0,
+    spool_dir: Optional[str] = None
+) -> Tuple[Optional[bytes], str, Optional[str]]:
+    """
+    Скачать аудио видео
+    
+    Треки не больше spool_max_bytes загружаются в память, без записи на
+    диск; остальные (и те, что нельзя получить одним потоком) - в файл.
+    
+    Returns:
+        (данные, путь с расширением, хеш звука) для трека в памяти, (None,
+        путь к файлу, хеш звука) для трека на диске или (None, "", None) при
+        ошибке (см. get_last_error). Хеш None, если он не вычислялся
+    """
+    if spool_max_bytes:
+        audio = audio_downloader.download_audio_data(
+            video['url'], spool_max_bytes, performance, video.get('duration'), spool_dir
+        )
+        if audio is not None:
+            data, extension = audio
+            return data, os.path.splitext(output_path)[0] + extension, audio_downloader.get_content_hash()
+        if audio_downloader.get_last_error() is not None:
+            return None, "", None
+    local_path = audio_downloader.download_audio(video['url'], output_path, performance)
+    if not local_path:
+        return None, "", None
+    return None, local_path, audio_downloader.get_content_hash()
 
 
 class YouTubeMP3Synchronizer:
@@ -22,9 +67,19 @@ class YouTubeMP3Synchronizer:
         playlist_extractor: IPlaylistExtractor,
         download_tracker: IDownloadTracker,
         audio_downloader: IAudioDownloader,
-        file_uploader: IFileUploader,
+        file_uploader: IMirroredFileUploader,
         logger: ILogger,
-        temp_dir: str = "temp_downloads"
+        temp_dir: str = "temp_downloads",
+        m3u_manifest: Optional[M3UManifest] = None,
+        m3u_reconcile_days: float = 7,
+        smart_playlists: Optional[List[Dict[str, Any]]] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        metrics: Optional[MetricsRecorder] = None,
+        playlists: Optional[List[Dict[str, Any]]] = None,
+        trash_folder: str = ".trash",
+        removal_max_fraction: float = 0.25,
+        temp_space: Optional[TempSpaceManager] = None,
+        spool_max_bytes: int = 0
     ):
         """
         Инициализация синхронизатора с внедрением зависимостей
@@ -33,9 +88,23 @@ class YouTubeMP3Synchronizer:
             playlist_extractor: Экстрактор плейлиста
             download_tracker: Трекер загруженных файлов
             audio_downloader: Загрузчик аудио
-            file_uploader: Загрузчик файлов на сервер
+            file_uploader: Загрузчик файлов на сервер (с поддержкой зеркал)
             logger: Логгер
             temp_dir: Временная директория для загрузок
+            m3u_manifest: Манифест доставленных треков для построения M3U
+            m3u_reconcile_days: Период сверки манифеста с папкой на сервере (дни)
+            smart_playlists: Конфигурация смарт-плейлистов по всей библиотеке
+            retry_policy: Политика повторных попыток для видео с ошибками загрузки
+            metrics: Сборщик метрик этапов (экспорт для Prometheus)
+            playlists: Плейлисты с профилями производительности
+                (см. profiles.load_playlists; None - PLAYLISTS_CONFIG)
+            trash_folder: Подпапка корзины для треков, удаленных из плейлиста
+                (плейлисты с "remove_missing": "trash")
+            removal_max_fraction: Максимальная доля доставленных треков, которую
+                можно удалить за один запуск (защита от неполного списка плейлиста)
+            temp_space: Учет места во временной папке (резерв перед каждой загрузкой)
+            spool_max_bytes: Треки до этого размера загружаются и конвертируются
+                в памяти, без временных файлов (0 - всегда через диск)
         """
         self.playlist_extractor = playlist_extractor
         self.download_tracker = download_tracker
@@ -44,6 +113,16 @@ class YouTubeMP3Synchronizer:
         self.logger = logger
         self.temp_dir = temp_dir
         self.m3u_manager = M3UPlaylistManager(logger)
+        self.m3u_manifest = m3u_manifest or M3UManifest("m3u_manifest.json", logger)
+        self.m3u_reconcile_days = m3u_reconcile_days
+        self.smart_playlists = smart_playlists or []
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.metrics = metrics or MetricsRecorder()
+        self.playlists = playlists
+        self.trash_folder = trash_folder
+        self.removal_max_fraction = removal_max_fraction
+        self.temp_space = temp_space or TempSpaceManager(logger, temp_dir)
+        self.spool_max_bytes = spool_max_bytes
         
         # Создаем временную директорию если она не существует
         os.makedirs(self.temp_dir, exist_ok=True)
@@ -51,102 +130,182 @@ class YouTubeMP3Synchronizer:
     def sync(self) -> None:
         """Выполнить синхронизацию всех плейлистов"""
         from config import PLAYLISTS_CONFIG
+        playlists = self.playlists if self.playlists is not None else PLAYLISTS_CONFIG
         
         total_processed = 0
         total_successful = 0
         
-        self.logger.info(f"Начинаем синхронизацию {len(PLAYLISTS_CONFIG)} плейлистов")
+        self.logger.info(f"Начинаем синхронизацию {len(playlists)} плейлистов")
         
-        for i, playlist_config in enumerate(PLAYLISTS_CONFIG, 1):
+        # Папки, общие для нескольких плейлистов: из них ничего не удаляется
+        folder_usage = Counter(
+            destination_key(smb_config, playlist_config["folder"])
+            for playlist_config in playlists for smb_config in get_smb_configs(playlist_config)
+        )
+        
+        for i, playlist_config in enumerate(playlists, 1):
             playlist_url = playlist_config["url"]
             target_folder = playlist_config["folder"]
             description = playlist_config.get("description", "")
-            smb_config = playlist_config["smb_config"]
+            smb_configs = get_smb_configs(playlist_config)
             
-            self.logger.info(f"[{i}/{len(PLAYLISTS_CONFIG)}] Обрабатываем плейлист: {description}")
+            self.logger.info(f"[{i}/{len(playlists)}] Обрабатываем плейлист: {description}")
             self.logger.info(f"URL: {playlist_url}")
             self.logger.info(f"Папка назначения: {target_folder}")
             
-            # Подключаемся к SMB серверу для этого плейлиста
-            if not self.file_uploader.connect(smb_config, target_folder):
-                self.logger.error(f"Не удалось подключиться к SMB серверу {smb_config['server']}")
+            # Подключаемся ко всем SMB назначениям этого плейлиста
+            if not self.file_uploader.connect(smb_configs, target_folder):
+                servers = ", ".join(config['server'] for config in smb_configs)
+                self.logger.error(f"Не удалось подключиться ни к одному SMB серверу: {servers}")
                 continue
             
             try:
                 # Получаем список видео из плейлиста
-                videos = self.playlist_extractor.get_video_list(playlist_url)
+                with self.metrics.stage(STAGE_ENUMERATION, playlist=description):
+                    videos = self.playlist_extractor.get_video_list(playlist_url)
                 if not videos:
                     self.logger.warning(f"Плейлист пуст или недоступен: {playlist_url}")
                     continue
                 
                 self.logger.info(f"Найдено {len(videos)} видео в плейлисте")
                 
+                destinations = self.file_uploader.get_destinations()
+                # Имена файлов в назначениях: без перезаписи одноименных треков,
+                # с переименованием на сервере при смене названия видео
+                naming = NamingIndex(self.download_tracker, destinations)
+                self._rename_retitled(videos, destinations, naming)
+                if playlist_config.get("remove_missing"):
+                    self._remove_missing(playlist_config, videos, destinations, naming, folder_usage)
                 playlist_processed = 0
-                playlist_successful = 0
+                delivered_counts = {destination: 0 for destination in destinations}
+                counts_lock = threading.Lock()
                 
-                for video in videos:
-                    video_id = video.get('id', '')
+                failures = self.download_tracker.get_failures()
+                work_queue = self._build_work_queue(videos, destinations, failures)
+                self.metrics.progress.set_playlist(i, len(playlists), description, len(work_queue))
+                
+                for index, (video, pending) in enumerate(work_queue):
+                    self.metrics.set_queue_depth("videos", len(work_queue) - index)
+                    self.metrics.maybe_write()
+                    video_id = video['id']
                     video_title = video.get('title', 'Неизвестное название')
-                    video_url = video.get('url', '')
-                    
-                    if not video_id or not video_url:
-                        self.logger.warning(f"Пропускаем видео с неполными данными: {video_title}")
-                        continue
-                    
-                    # Проверяем, не загружено ли уже это видео
-                    if self.download_tracker.is_downloaded(video_id):
-                        self.logger.info(f"Видео уже загружено, пропускаем: {video_title}")
-                        continue
-                    
-                    self.logger.info(f"Обрабатываем видео: {video_title}")
-                    playlist_processed += 1
-                    
-                    # Скачиваем аудио
-                    self.logger.info(f"Начинаем загрузку: {video_url}")
-                    local_path = self.audio_downloader.download_audio(video_url, f"{self.temp_dir}/{video_title}.mp3")
                     
-                    if not local_path:
-                        self.logger.error(f"Не удалось скачать аудио: {video_title}")
-                        continue
-                    
-                    # Загружаем файл на SMB сервер
-                    remote_filename = os.path.basename(local_path)
-                    if self.file_uploader.upload_file(local_path, remote_filename):
-                        # Отмечаем как загруженный
-                        self.download_tracker.mark_as_downloaded(video_id, local_path)
+                    # Все этапы видео (в том числе загрузки в потоках зеркал) помечаются в трассировке
+                    # Место под файлы загрузки резервируется до удаления временного файла
+                    with self.metrics.trace_context("video", playlist=description, video=video_id, title=video_title), \
+                            self.temp_space.reserve(video.get('duration')) as temp_dir:
+                        self.logger.info(f"Обрабатываем видео: {video_title}")
+                        playlist_processed += 1
                         
-                        # Удаляем временный файл
-                        self._cleanup_temp_file(local_path)
+                        if temp_dir is None:
+                            self.metrics.inc("videos_total", result="failed")
+                            self.metrics.progress.track_done()
+                            continue
                         
-                        self.logger.info(f"Успешно обработано: {video_title}")
-                        playlist_successful += 1
-                    else:
-                        self.logger.error(f"Не удалось загрузить файл на SMB сервер: {video_title}")
-                    
-                    # Удаляем временный файл
-                    self._cleanup_temp_file(local_path)
-                    
+                        # Скачиваем аудио (загрузчик сам сообщает о начале загрузки):
+                        # небольшие треки - в память, остальные - во временную папку
+                        data, local_path, content_hash = download_track(
+                            self.audio_downloader, video, f"{temp_dir}/{video_title}.mp3",
+                            playlist_config.get("performance"), self.spool_max_bytes, temp_dir
+                        )
+                        
+                        if data is None and not local_path:
+                            self.logger.error(f"Не удалось скачать аудио: {video_title}")
+                            self._record_download_failure(video_id, failures.get(video_id))
+                            self.metrics.inc("videos_total", result="failed")
+                            self.metrics.progress.track_done()
+                            continue
+                        
+                        # Тот же звук уже доставлен под другим ID видео: ссылаемся на его файл
+                        if content_hash:
+                            self.download_tracker.record_content_hash(video_id, content_hash)
+                            linked = self._link_duplicate(video, content_hash, pending, naming)
+                            with counts_lock:
+                                for destination in linked:
+                                    delivered_counts[destination] += 1
+                            pending = [destination for destination in pending if destination not in linked]
+                            if not pending:
+                                if data is None:
+                                    self._cleanup_temp_file(local_path)
+                                self.metrics.inc("videos_total", result="duplicate")
+                                self.metrics.progress.track_done()
+                                continue
+                        
+                        extension = os.path.splitext(local_path)[1] or ".mp3"
+                        remote_filename = naming.assign(video, pending, extension)
+                        
+                        def on_result(destination: str, success: bool, size: int,
+                                      video=video, video_title=video_title, remote_filename=remote_filename) -> None:
+                            if success:
+                                # Отмечаем доставку в конкретное зеркало
+                                self.download_tracker.mark_delivered(video['id'], destination, remote_filename, size)
+                                self.m3u_manifest.record_track(destination, video, remote_filename)
+                                with counts_lock:
+                                    delivered_counts[destination] += 1
+                                self.logger.info(f"Успешно обработано: {video_title} -> {destination}")
+                            else:
+                                self.logger.error(f"Не удалось загрузить файл на {destination}: {video_title}")
+                        
+                        # Файл читается один раз и параллельно отправляется на все зеркала
+                        try:
+                            if data is not None:
+                                self.file_uploader.upload_data_to_destinations(data, remote_filename, pending, on_result)
+                            else:
+                                self.file_uploader.upload_to_destinations(local_path, remote_filename, pending, on_result)
+                        except Exception as e:
+                            self.logger.error(f"Ошибка при отправке файла на SMB: {video_title}: {e}")
+                        
+                        # Удаляем временный файл
+                        if data is None:
+                            self._cleanup_temp_file(local_path)
+                        self.metrics.inc("videos_total", result="downloaded")
+                        self.metrics.progress.track_done()
+                
+                self.metrics.set_queue_depth("videos", 0)
+                
+                # Дожидаемся всех зеркал перед созданием M3U
+                self.file_uploader.wait_for_uploads()
+                self.download_tracker.flush()
+                
+                playlist_successful = max(delivered_counts.values(), default=0)
                 total_processed += playlist_processed
                 total_successful += playlist_successful
                 
                 self.logger.info(f"Плейлист '{description}' завершен. Обработано новых видео: {playlist_processed}, успешно: {playlist_successful}")
+                for destination, count in delivered_counts.items():
+                    self.logger.info(f"  {destination}: доставлено {count}")
                 
-                # Создаем M3U плейлист если указан параметр playlist
+                # Обновляем M3U плейлист на каждом подключенном назначении
                 playlist_name = playlist_config.get("playlist", "")
                 if playlist_name and playlist_name.strip():
-                    self.logger.info(f"Создаем M3U плейлист: {playlist_name}")
-                    if self.m3u_manager.create_m3u_playlist(smb_config, target_folder, playlist_name):
-                        self.logger.info(f"M3U плейлист успешно создан: {playlist_name}")
-                    else:
-                        self.logger.warning(f"Не удалось создать M3U плейлист: {playlist_name}")
+                    with self.metrics.stage(STAGE_M3U, playlist=description):
+                        for smb_config in smb_configs:
+                            destination = destination_key(smb_config, target_folder)
+                            if destination in destinations:
+                                self._update_m3u_playlist(smb_config, target_folder, playlist_name, destination, videos)
                 else:
-                    self.logger.debug("Параметр playlist не указан, пропускаем создание M3U плейлиста")
+                    if is_debug_enabled(self.logger):
+                        self.logger.debug("Параметр playlist не указан, пропускаем создание M3U плейлиста")
                 
             except Exception as e:
                 self.logger.error(f"Ошибка при обработке плейлиста '{description}': {e}")
             finally:
-                # Отключаемся от SMB сервера
+                # Отключаемся от SMB серверов
                 self.file_uploader.disconnect()
+                # Манифест сохраняется и без M3U (и после ошибки): доставки, переименования
+                # и удаления в нем нужны следующему запуску и смарт-плейлистам
+                self.m3u_manifest.save()
+        
+        # Генерируем смарт-плейлисты по всем папкам за один проход
+        if self.smart_playlists:
+            with self.metrics.stage(STAGE_M3U):
+                SmartPlaylistGenerator(self.m3u_manager, self.m3u_manifest, self.logger).generate(self.smart_playlists)
+        
+        if self.metrics.textfile:
+            if self.metrics.write():
+                self.logger.info(f"Метрики записаны в {self.metrics.textfile}")
+            else:
+                self.logger.warning(f"Не удалось записать метрики в {self.metrics.textfile}")
         
         self.logger.info(f"Синхронизация завершена. Всего обработано новых видео: {total_processed}, успешно: {total_successful}")
         
@@ -155,6 +314,239 @@ class YouTubeMP3Synchronizer:
         
         self.logger.info("[SUCCESS] Synchronization completed successfully!")
     
+    def _build_work_queue(
+        self,
+        videos: List[Dict[str, Any]],
+        destinations: List[str],
+        failures: Dict[str, Dict[str, Any]]
+    ) -> List[tuple]:
+        """
+        Составить очередь обработки плейлиста: (видео, недоставленные назначения)
+        
+        Видео, для которых подошел срок повторной попытки, идут первыми.
+        Видео с постоянной ошибкой и видео, чей срок повтора еще не наступил,
+        пропускаются без обращения к YouTube.
+        """
+        now = time.time()
+        retries, new_videos = [], []
+        skipped_permanent = skipped_waiting = 0
+        
+        for video in videos:
+            video_id = video.get('id', '')
+            video_title = video.get('title', 'Неизвестное название')
+            
+            if not video_id or not video.get('url', ''):
+                self.logger.warning(f"Пропускаем видео с неполными данными: {video_title}")
+                continue
+            
+            # Определяем назначения, в которые видео еще не доставлено
+            pending = [
+                destination for destination in destinations
+                if not self.download_tracker.is_delivered(video_id, destination)
+            ]
+            if not pending:
+                self.logger.info(f"Видео уже загружено, пропускаем: {video_title}")
+                continue
+            
+            failure = failures.get(video_id)
+            if failure is None:
+                new_videos.append((video, pending))
+            elif failure["state"] == STATE_FAILED_PERMANENT:
+                skipped_permanent += 1
+            elif self.retry_policy.is_due(failure, now):
+                retries.append((video, pending))
+            else:
+                skipped_waiting += 1
+        
+        if retries or skipped_permanent or skipped_waiting:
+            self.logger.info(
+                f"Повторные попытки: {len(retries)}, ожидают срока: {skipped_waiting}, "
+                f"недоступны навсегда: {skipped_permanent}"
+            )
+        return retries + new_videos
+    
+    def _rename_retitled(self, videos: List[Dict[str, Any]], destinations: List[str], naming: NamingIndex) -> int:
+        """
+        Переименовать на серверах файлы видео, у которых изменилось название
+        
+        Файл переименовывается на месте, без повторной загрузки; трекер и
+        манифест M3U получают новое имя. При ошибке остается старое имя.
+        
+        Returns:
+            Количество переименованных файлов
+        """
+        renamed = 0
+        for destination in destinations:
+            for video in videos:
+                delivery = naming.get_delivery(video.get('id', ''), destination)
+                if not delivery or naming.matches_title(video, delivery["file"]):
+                    continue
+                # Файл с тем же звуком у нескольких видео называется по первому из них
+                if naming.is_shared(video['id'], destination):
+                    continue
+                old_name = delivery["file"]
+                new_name = naming.name_for(video, [destination], os.path.splitext(old_name)[1])
+                if not self.file_uploader.rename_file(destination, old_name, new_name):
+                    continue
+                naming.move(video['id'], destination, old_name, new_name)
+                self.download_tracker.mark_delivered(video['id'], destination, new_name, delivery["size"])
+                self.m3u_manifest.record_track(destination, video, new_name)
+                renamed += 1
+        if renamed:
+            self.logger.info(f"Переименовано файлов после смены названий видео: {renamed}")
+        return renamed
+    
+    def _link_duplicate(
+        self,
+        video: Dict[str, Any],
+        content_hash: str,
+        destinations: List[str],
+        naming: NamingIndex
+    ) -> List[str]:
+        """
+        Сослаться на уже доставленный файл с тем же звуком
+        
+        Если видео с таким же хешем декодированного звука (перезалив, видео
+        с текстом песни) уже доставлено в назначение, новое видео отмечается
+        доставленным с файлом этого видео, без отправки на сервер; M3U
+        получает ссылку на существующий файл.
+        
+        Returns:
+            Назначения, в которых видео сослалось на существующий файл
+        """
+        others = [other_id for other_id in self.download_tracker.find_by_content_hash(content_hash)
+                  if other_id != video['id']]
+        linked = []
+        for destination in destinations:
+            for other_id in others:
+                delivery = naming.get_delivery(other_id, destination)
+                if delivery is None:
+                    # Доставлено в этом запуске: размер не известен индексу, сверка примет любой
+                    remote_file = self.download_tracker.get_delivered_file(other_id, destination)
+                    delivery = {"file": remote_file, "size": 0} if remote_file else None
+                if delivery is None:
+                    continue
+                self.download_tracker.mark_delivered(video['id'], destination, delivery["file"], delivery["size"])
+                self.m3u_manifest.record_track(destination, video, delivery["file"])
+                self.logger.info(f"Тот же звук, что у {other_id}: {destination}/{delivery['file']}")
+                linked.append(destination)
+                break
+        return linked
+    
+    def _remove_missing(
+        self,
+        playlist_config: Dict[str, Any],
+        videos: List[Dict[str, Any]],
+        destinations: List[str],
+        naming: NamingIndex,
+        folder_usage: Counter
+    ) -> int:
+        """
+        Удалить из назначений треки, которых больше нет в плейлисте
+        
+        Файлы переносятся в папку корзины ("remove_missing": "trash") или
+        удаляются ("delete") одной серией операций на сервере. Если пропала
+        слишком большая доля доставленных треков, удаление в назначении
+        отменяется: скорее всего, список плейлиста получен не полностью.
+        
+        Returns:
+            Количество удаленных файлов
+        """
+        mode = playlist_config["remove_missing"]
+        if mode not in ("trash", "delete"):
+            self.logger.warning(f"Неизвестный режим remove_missing: {mode!r} (ожидается trash или delete)")
+            return 0
+        
+        current_ids = {video.get('id', '') for video in videos}
+        total_removed = 0
+        for destination in destinations:
+            if folder_usage[destination] > 1:
+                self.logger.warning(f"{destination}: папка используется несколькими плейлистами, удаление пропущено")
+                continue
+            deliveries = naming.get_deliveries(destination)
+            # Файлы, на которые ссылаются оставшиеся в плейлисте видео (дубликаты по звуку), не удаляются:
+            # снимается только доставка, а трек M3U переходит к оставшемуся видео
+            kept = {deliveries[video['id']]["file"]: video for video in videos if video.get('id') in deliveries}
+            for video_id, delivery in deliveries.items():
+                if video_id not in current_ids and delivery["file"] in kept:
+                    self.download_tracker.remove_delivery(video_id, destination)
+                    self.m3u_manifest.remove_track(destination, video_id)
+                    self.m3u_manifest.record_track(destination, kept[delivery["file"]], delivery["file"])
+                    naming.forget(video_id, destination)
+            missing = {delivery["file"]: video_id for video_id, delivery in deliveries.items()
+                       if video_id not in current_ids and delivery["file"] not in kept}
+            if not missing:
+                continue
+            fraction = len(missing) / len(deliveries)
+            if len(missing) > 1 and fraction > self.removal_max_fraction:
+                self.logger.warning(
+                    f"{destination}: из плейлиста пропало {len(missing)} из {len(deliveries)} треков "
+                    f"({fraction:.0%}, порог {self.removal_max_fraction:.0%}) - удаление отменено"
+                )
+                continue
+            
+            trash_folder = self.trash_folder if mode == "trash" else None
+            removed = self.file_uploader.remove_files(destination, list(missing), trash_folder)
+            for name in removed:
+                video_id = missing[name]
+                self.download_tracker.remove_delivery(video_id, destination)
+                self.m3u_manifest.remove_track(destination, video_id)
+                naming.forget(video_id, destination)
+            total_removed += len(removed)
+            action = f"перенесено в {trash_folder}" if trash_folder else "удалено"
+            self.logger.info(f"{destination}: треков, удаленных из плейлиста, {action}: {len(removed)} из {len(missing)}")
+        return total_removed
+    
+    def _record_download_failure(self, video_id: str, previous: Optional[Dict[str, Any]]) -> None:
+        """Сохранить ошибку загрузки и назначить срок следующей попытки"""
+        last_error = self.audio_downloader.get_last_error() or {"error": "Неизвестная ошибка", "permanent": False}
+        failure = self.retry_policy.next_failure(previous, last_error["error"], last_error["permanent"])
+        self.download_tracker.record_failure(video_id, failure)
+        if failure["state"] == STATE_FAILED_PERMANENT:
+            self.logger.warning(f"Видео {video_id} недоступно, больше не запрашиваем: {failure['error']}")
+        else:
+            retry_at = time.strftime('%Y-%m-%d %H:%M', time.localtime(failure['next_retry']))
+            self.logger.info(f"Следующая попытка для {video_id}: {retry_at}")
+    
+    def _update_m3u_playlist(
+        self,
+        smb_config: dict,
+        target_folder: str,
+        playlist_name: str,
+        destination: str,
+        videos: List[Dict[str, Any]]
+    ) -> None:
+        """
+        Обновить M3U плейлист назначения по локальному манифесту
+        
+        Папка на сервере сканируется только при периодической сверке,
+        а сам плейлист перезаписывается лишь при изменении содержимого.
+        """
+        if self.m3u_manifest.needs_reconcile(destination, self.m3u_reconcile_days):
+            self.logger.info(f"Сверяем манифест M3U с папкой на сервере: {destination}")
+            remote_files = self.m3u_manager.list_mp3_files(smb_config, target_folder)
+            known_files = {}
+            for video in videos:
+                remote_file = self.download_tracker.get_delivered_file(video.get('id', ''), destination)
+                if remote_file:
+                    known_files[remote_file] = video
+            self.m3u_manifest.reconcile(destination, remote_files, known_files)
+        
+        self.m3u_manifest.update_order(destination, videos)
+        tracks = self.m3u_manifest.get_entries(destination)
+        if not tracks:
+            self.logger.warning(f"Нет доставленных треков для M3U плейлиста: {playlist_name}")
+            return
+        
+        content_hash = self.m3u_manager.write_m3u_playlist(
+            smb_config, target_folder, playlist_name, tracks,
+            self.m3u_manifest.get_m3u_hash(destination)
+        )
+        if content_hash:
+            self.m3u_manifest.set_m3u_hash(destination, content_hash)
+        else:
+            self.logger.warning(f"Не удалось обновить M3U плейлист: {playlist_name}")
+    
     def synchronize_playlist(self, playlist_url: str) -> bool:
         """
         Синхронизировать плейлист: загрузить новые MP3 и отправить на SMB
@@ -263,24 +655,15 @@ class YouTubeMP3Synchronizer:
     
     def _create_safe_filename(self, title: str) -> str:
         """Создать безопасное имя файла"""
-        # Заменяем недопустимые символы
-        invalid_chars = '<>:"/\\|?*'
-        safe_title = title
-        for char in invalid_chars:
-            safe_title = safe_title.replace(char, '_')
-        
-        # Ограничиваем длину
-        if len(safe_title) > 100:
-            safe_title = safe_title[:100]
-        
-        return safe_title.strip()
+        return sanitize_filename(title)
     
     def _cleanup_temp_file(self, file_path: str) -> None:
         """Удалить временный файл"""
         try:
             if os.path.exists(file_path):
                 os.remove(file_path)
-                self.logger.info(f"Временный файл удален: {file_path}")
+                if is_debug_enabled(self.logger):
+                    self.logger.debug(f"Временный файл удален: {file_path}")
         except Exception as e:
             self.logger.warning(f"Не удалось удалить временный файл {file_path}: {e}")
     
@@ -0,0 +1,118 @@
+"""
+Постоянный кеш yt-dlp и учет попаданий в него
+"""
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from interfaces import ILogger
+
+# Экстрактор, который загружается при прогреве
+WARM_UP_EXTRACTOR = "Youtube"
+
+
+class YtDlpCache:
+    """
+    Постоянная папка кеша yt-dlp.
+
+    yt-dlp сохраняет в кеш разобранные функции подписи плеера YouTube и
+    похожие данные; с постоянной папкой они не загружаются и не разбираются
+    заново при каждом запуске. Обращения экземпляров YoutubeDL к кешу
+    подсчитываются (попадания и промахи по разделам), устаревшие записи
+    (плееры, которые YouTube уже не использует) удаляются при прогреве.
+    """
+
+    def __init__(self, cache_dir: str, logger: ILogger, metrics=None, max_age_days: float = 30):
+        """
+        Args:
+            cache_dir: Папка кеша
+            logger: Логгер
+            metrics: Сборщик метрик (MetricsRecorder)
+            max_age_days: Записи, не изменявшиеся дольше, удаляются при прогреве
+        """
+        self.cache_dir = cache_dir
+        self.logger = logger
+        self.metrics = metrics
+        self.max_age_days = max_age_days
+        self._counts: Dict[str, int] = {"hit": 0, "miss": 0}
+        self._pruned = False
+        self._lock = threading.Lock()
+
+    def options(self, base_options: Dict[str, Any]) -> Dict[str, Any]:
+        """Опции yt-dlp с постоянной папкой кеша"""
+        options = dict(base_options)
+        options["cachedir"] = self.cache_dir
+        return options
+
+    def instrument(self, ydl):
+        """Подсчитывать обращения экземпляра YoutubeDL к кешу"""
+        cache = getattr(ydl, "cache", None)
+        load: Optional[Callable] = getattr(cache, "load", None)
+        if load is None:
+            return ydl
+
+        def counted_load(section, key, *args, **kwargs):
+            value = load(section, key, *args, **kwargs)
+            self._record(section, value is not None)
+            return value
+
+        cache.load = counted_load
+        return ydl
+
+    def _record(self, section: str, hit: bool) -> None:
+        result = "hit" if hit else "miss"
+        with self._lock:
+            self._counts[result] += 1
+            ratio = self._counts["hit"] / (self._counts["hit"] + self._counts["miss"])
+        if self.metrics:
+            self.metrics.inc("ytdlp_cache_lookups_total", section=section, result=result)
+            self.metrics.set_gauge("ytdlp_cache_hit_ratio", ratio)
+
+    def warm_up(self, *ydls) -> None:
+        """
+        Подготовить кеш и экземпляры YoutubeDL к первой загрузке
+
+        Удаляет устаревшие записи и заранее загружает экстрактор YouTube,
+        чтобы первое видео не ждало инициализации.
+        """
+        for ydl in ydls:
+            try:
+                ydl.get_info_extractor(WARM_UP_EXTRACTOR)
+            except Exception as e:
+                self.logger.warning(f"Не удалось прогреть экстрактор yt-dlp: {e}")
+        if self._pruned:
+            return
+        self._pruned = True
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entries, removed = self._prune()
+        message = f"Кеш yt-dlp: {entries} записей в {self.cache_dir}"
+        if removed:
+            message += f", удалено устаревших: {removed}"
+        self.logger.info(message)
+
+    def _prune(self) -> Tuple[int, int]:
+        """Удалить записи, не обновлявшиеся max_age_days; возвращает (осталось, удалено)"""
+        cutoff = time.time() - self.max_age_days * 86400
+        entries = removed = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    if self.max_age_days and os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                        removed += 1
+                    else:
+                        entries += 1
+                except OSError as e:
+                    self.logger.warning(f"Не удалось проверить запись кеша {path}: {e}")
+        return entries, removed
+
+    def log_summary(self) -> None:
+        """Записать в лог долю попаданий в кеш за запуск"""
+        with self._lock:
+            hits, misses = self._counts["hit"], self._counts["miss"]
+        if hits or misses:
+            self.logger.info(
+                f"Кеш yt-dlp: попаданий {hits}, промахов {misses} ({hits / (hits + misses):.0%})"
+            )